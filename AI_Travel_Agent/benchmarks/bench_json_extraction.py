@@ -0,0 +1,85 @@
+# bench_json_extraction.py
+# Compares the single-pass extract_json_string against the previous regex-based version
+# on large, nested and malformed LLM responses.
+# Run from the AI_Travel_Agent folder: python benchmarks/bench_json_extraction.py
+import json
+import logging
+import os
+import re
+import sys
+import timeit
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.core.decision_making import extract_json_string
+
+logging.disable(logging.CRITICAL) # Extraction logs would dominate the timings
+
+
+def legacy_extract_json_string(text: str) -> str | None:
+    """ The previous three-regex implementation, kept here for comparison only. """
+    match_fence = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', text, re.DOTALL | re.IGNORECASE)
+    if match_fence: return match_fence.group(1).strip()
+    match_raw = re.search(r'^\s*(\{.*?\})\s*$', text, re.DOTALL)
+    if match_raw: return match_raw.group(1).strip()
+    match_fallback = re.search(r'(\{.*\})', text, re.DOTALL)
+    if match_fallback: return match_fallback.group(1).strip()
+    raise ValueError("No valid JSON structure found in LLM output.")
+
+
+def make_destination(idx: int) -> dict:
+    return {
+        "name": f"City {idx}, Country",
+        "why_it_fits": [f"Reason {n} with {{braces}} and \"quotes\"" for n in range(5)],
+        "suggested_activities": [f"Activity {n}" for n in range(5)],
+        "food_highlights": [f"Dish {n}" for n in range(3)],
+        "transportation_notes": ["Walkable center", "Tram network"],
+        "sample_daily_focus": [f"Day {n}: Explore" for n in range(1, 6)],
+        "estimated_cost_level": "Medium",
+        "suggested_duration_days": "5 days",
+        "suggested_accommodation_type": "Boutique hotels",
+        "potential_day_trip": None,
+    }
+
+def make_response(destination_count: int, fenced: bool = True) -> str:
+    payload = json.dumps({"destinations": [make_destination(i) for i in range(destination_count)], "overall_reasoning": "Balanced picks."}, indent=2)
+    return f"Here is your plan:\n```json\n{payload}\n```\nEnjoy!" if fenced else payload
+
+CASES = {
+    "fenced, 3 destinations": make_response(3),
+    "fenced, 300 destinations": make_response(300),
+    "raw, 300 destinations": make_response(300, fenced=False),
+    "truncated (no closing brace)": make_response(300, fenced=False)[:-40],
+    "raw JSON + trailing prose '}'": make_response(3, fenced=False) + "\nTip: replace {city} before booking.",
+    "prose '{' before raw JSON": "Fill the {placeholders} below.\n" + make_response(3, fenced=False),
+    "prose with many stray '}'": "{" + "x} " * 20000,
+    "unclosed '{' run (truncated)": '{"a": ' * 4000 + "and then the stream stopped",
+}
+
+
+def bench(func, text: str, number: int) -> tuple[float, str]:
+    outcome = "ok"
+    try:
+        json.loads(func(text))
+    except json.JSONDecodeError:
+        outcome = "json error"
+    except ValueError:
+        outcome = "not found"
+    seconds = timeit.timeit(lambda: _safe_call(func, text), number=number) / number
+    return seconds * 1000, outcome
+
+def _safe_call(func, text: str):
+    try: func(text)
+    except ValueError: pass
+
+
+if __name__ == "__main__":
+    print(f"{'case':32} {'size':>9} | {'regex ms':>9} {'result':>10} | {'scanner ms':>10} {'result':>10}")
+    print("-" * 92)
+    for name, text in CASES.items():
+        number = 20 if len(text) > 10000 else 200
+        legacy_ms, legacy_outcome = bench(legacy_extract_json_string, text, number)
+        scanner_ms, scanner_outcome = bench(extract_json_string, text, number)
+        print(f"{name:32} {len(text):>9} | {legacy_ms:>9.3f} {legacy_outcome:>10} | {scanner_ms:>10.3f} {scanner_outcome:>10}")
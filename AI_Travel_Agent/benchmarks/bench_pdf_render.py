@@ -0,0 +1,70 @@
+# bench_pdf_render.py
+# PDF throughput of the render service on large multi-destination itineraries: one render inline,
+# then batches of distinct itineraries through thread and process pools, then repeat requests
+# (cache hits). Text mixes accented Latin, Greek and Cyrillic so the Unicode font is exercised.
+# Run from the AI_Travel_Agent folder: python benchmarks/bench_pdf_render.py [--destinations 10 40] [--font path/to/DejaVuSans.ttf]
+import argparse
+import logging
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+logging.disable(logging.CRITICAL)
+
+SAMPLE_TEXT = ["Crème brûlée at a café near the Hôtel de Ville", "Ελληνική ταβέρνα by the harbour", "Прогулка по старому городу", "Naïve art museum & Zürich Kunsthaus"]
+
+
+def make_itinerary(destinations: int, variant: int):
+    from src.core.decision_making import DestinationDetail, Itinerary
+    def items(label: str, count: int) -> list[str]:
+        return [f"{label} {n} ({variant}): {SAMPLE_TEXT[n % len(SAMPLE_TEXT)]}, with enough detail to wrap across several lines of the page" for n in range(count)]
+    return Itinerary(destinations=[DestinationDetail(
+        name=f"City {idx}-{variant}, Country", why_it_fits=items("Reason", 4), suggested_activities=items("Activity", 5),
+        food_highlights=items("Dish", 3), transportation_notes=items("Transport", 3), sample_daily_focus=items("Day", 5),
+        estimated_cost_level="medium", suggested_duration_days="4-5 days", suggested_accommodation_type="Boutique hotels",
+        potential_day_trip=SAMPLE_TEXT[idx % len(SAMPLE_TEXT)]) for idx in range(destinations)],
+        overall_reasoning=" ".join(SAMPLE_TEXT) * 5)
+
+def run(destinations: int, batch: int, workers: int):
+    from src.core.perception import UserPreferences
+    from src.core.render import emit_pdf, get_default_renderer
+    from src.core.pdf_service import PdfRenderService
+    prefs = UserPreferences(name="Zoë", location="Ljubljana", climate_preference="moderate", activity_preferences=["food", "art"], budget="medium", travel_pace="relaxed")
+    docs = [get_default_renderer().document(make_itinerary(destinations, v), prefs) for v in range(batch)]
+
+    start = time.perf_counter(); size = len(emit_pdf(docs[0])); inline = time.perf_counter() - start
+    print(f"{destinations:>3} destinations | {size / 1024:7.1f} KB | inline {inline * 1000:7.1f} ms/pdf")
+
+    for use_processes in (False, True):
+        service = PdfRenderService(max_workers=workers, max_entries=batch, use_processes=use_processes)
+        service.render(make_itinerary(1, -1), prefs) # Start the workers before timing
+        start = time.perf_counter()
+        for future in [service.submit(doc) for doc in docs]: future.result()
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        for doc in docs: service.render(doc)
+        cached = time.perf_counter() - start
+        print(f"    {workers} {'processes' if use_processes else 'threads  '} | {batch / cold:6.1f} pdf/s cold | {cached / batch * 1e6:6.1f} µs/pdf cached")
+        service.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF render service throughput benchmark")
+    parser.add_argument("--destinations", type=int, nargs="+", default=[10, 40])
+    parser.add_argument("--batch", type=int, default=16, help="Distinct itineraries rendered per pool")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--font", help="Unicode TTF to embed (sets PDF_FONT_PATH)")
+    args = parser.parse_args()
+    if args.font: os.environ["PDF_FONT_PATH"] = args.font # Before the first render resolves the font
+
+    from src.core.render import pdf_unicode_fonts
+    fonts = pdf_unicode_fonts()
+    print(f"Font: {fonts[0] if fonts else 'Helvetica (Latin-1 fallback)'}, {args.batch} itineraries per pool\n")
+    for destinations in args.destinations: run(destinations, args.batch, args.workers)
+
+if __name__ == "__main__":
+    main()
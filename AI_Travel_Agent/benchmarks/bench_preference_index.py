@@ -0,0 +1,90 @@
+# bench_preference_index.py
+# Recall and latency of the near-duplicate PreferenceIndex at increasing numbers of stored profiles.
+# Queries are re-worded copies of stored profiles (reordered activities, synonyms, plurals, casing)
+# that should hit; control queries change the budget or add an activity and should miss.
+# Run from the AI_Travel_Agent folder: python benchmarks/bench_preference_index.py [--sizes 10000 100000 1000000]
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.core.perception import UserPreferences
+from src.core.preference_index import ACTIVITY_SYNONYMS, PreferenceIndex, _activity_tokens
+
+logging.disable(logging.CRITICAL)
+
+CITIES = [f"City{n}" for n in range(500)]
+CLIMATES = ["cold", "moderate", "tropical"]
+BUDGETS = ["low", "medium", "high"]
+PACES = ["relaxed", "moderate", "fast"]
+ACTIVITIES = ["hiking", "food", "art", "museum", "beach", "nightlife", "shopping", "history", "ski", "dive", "nature", "music", "photography", "yoga", "wine", "cycling", "surfing", "architecture", "festivals", "temples"]
+REWORDINGS = {}
+for word, canonical in ACTIVITY_SYNONYMS.items(): REWORDINGS.setdefault(canonical, []).append(word)
+
+
+def random_profile(rng: random.Random) -> UserPreferences:
+    return UserPreferences(name="bench", location=rng.choice(CITIES), climate_preference=rng.choice(CLIMATES),
+                           activity_preferences=rng.sample(ACTIVITIES, rng.randint(1, 4)), budget=rng.choice(BUDGETS), travel_pace=rng.choice(PACES))
+
+def reword(prefs: UserPreferences, rng: random.Random) -> UserPreferences:
+    activities = [rng.choice(REWORDINGS.get(a, [a])) if rng.random() < 0.5 else a for a in prefs.activity_preferences]
+    activities = [a.title() if rng.random() < 0.3 else a for a in activities]
+    rng.shuffle(activities)
+    return prefs.model_copy(update={"activity_preferences": activities, "location": f"  {prefs.location.upper()} "})
+
+def change_profile(prefs: UserPreferences, rng: random.Random) -> UserPreferences:
+    if rng.random() < 0.5:
+        return prefs.model_copy(update={"budget": rng.choice([b for b in BUDGETS if b != prefs.budget])})
+    extra = rng.choice([a for a in ACTIVITIES if a not in prefs.activity_preferences])
+    return prefs.model_copy(update={"activity_preferences": prefs.activity_preferences + [extra]})
+
+def canonical(prefs: UserPreferences) -> tuple:
+    return (prefs.location.strip().lower(), prefs.climate_preference, prefs.budget, prefs.travel_pace, tuple(_activity_tokens(prefs.activity_preferences)))
+
+
+def run(size: int, queries: int, rng: random.Random):
+    index = PreferenceIndex(max_entries=size)
+    profiles = [random_profile(rng) for _ in range(size)]
+    canonical_by_key = {}
+    start = time.perf_counter()
+    for n, prefs in enumerate(profiles):
+        index.add(prefs, None, key=str(n)); canonical_by_key[str(n)] = canonical(prefs)
+    build_seconds = time.perf_counter() - start
+
+    found, latencies = 0, []
+    for prefs in rng.sample(profiles, queries):
+        query = reword(prefs, rng)
+        start = time.perf_counter(); matches = index.search(query, k=1); latencies.append(time.perf_counter() - start)
+        if matches and matches[0][0] >= index.threshold and canonical_by_key[matches[0][1]] == canonical(prefs): found += 1
+
+    false_hits = 0
+    for prefs in rng.sample(profiles, queries):
+        query = change_profile(prefs, rng)
+        matches = index.search(query, k=1)
+        if matches and matches[0][0] >= index.threshold and canonical_by_key[matches[0][1]] != canonical(query): false_hits += 1
+
+    latencies_ms = np.array(latencies) * 1000
+    print(f"{size:>9,} profiles | build {build_seconds:6.2f}s | matrix {index.nbytes() / 1e6:7.1f} MB | "
+          f"recall {found / queries:6.1%} | false hits {false_hits / queries:5.1%} | "
+          f"search p50 {np.percentile(latencies_ms, 50):7.3f} ms  p95 {np.percentile(latencies_ms, 95):7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PreferenceIndex recall/latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+    rng = random.Random(7)
+    print(f"Threshold {PreferenceIndex().threshold}, {args.queries} re-worded and {args.queries} changed-profile queries per size\n")
+    for size in args.sizes: run(size, args.queries, rng)
+
+if __name__ == "__main__":
+    main()
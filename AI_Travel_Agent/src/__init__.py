@@ -1 +1,8 @@
+# The Gemini gateway and record/replay cache are shared with the repository's other projects,
+# which are not packaged together: make ../../shared importable for every `src.` module.
+import os
+import sys
 
+shared_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared"))
+if os.path.isdir(shared_dir) and shared_dir not in sys.path:
+    sys.path.insert(0, shared_dir)
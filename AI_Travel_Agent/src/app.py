@@ -8,9 +8,9 @@ import logging
 import copy
 import io
 import sys
-from fpdf import FPDF
-import requests
-import subprocess # Import subprocess
+import time
+import uuid
+from collections import deque
 
 import sys
 import os
@@ -24,11 +24,19 @@ project_root = os.path.dirname(src_dir)
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 # --- END PATH MODIFICATION ---
+_rerun_started = time.perf_counter() # Server time of this script run, shown in the sidebar's rerun panel
 # --- Import components from project modules ---
 try:
     from src.core.perception import UserPreferences
-    from src.core.memory import UserMemory
-    from src.core.decision_making import Itinerary, DestinationDetail, make_decision
+    from src.core.memory import UserMemory, store_user_preferences, get_user_preferences, list_recent_users
+    from src.core.decision_making import Itinerary, DestinationDetail, get_model_cascade
+    from src.core.render import build_destination, destination_markdown, document_key, render_itinerary
+    from src.core.pdf_service import get_default_pdf_service
+    from src.core.telegram_delivery import PENDING_STATES, get_telegram_delivery
+    from src.core.email_delivery import get_gmail_sender
+    from src.core.itinerary_cache import get_default_cache, get_in_flight, make_decision_for_user
+    from src.core.speculation import get_speculator
+    from gemini_gateway import get_gateway # On sys.path once src is imported
     # Import from NEW config module
     from src.config import load_environment, initialize_client, get_telegram_credentials
 except ImportError as e:
@@ -36,10 +44,10 @@ except ImportError as e:
     st.stop()
 
 # --- Logger Setup (Once per session) ---
-log_format = '%(asctime)s - %(levelname)s - %(message)s'; formatter = logging.Formatter(log_format)
 if 'log_stream' not in st.session_state: st.session_state.log_stream = io.StringIO()
 if 'logging_configured' not in st.session_state: st.session_state.logging_configured = False
-if not st.session_state.logging_configured:
+if not st.session_state.logging_configured: # Skipped entirely on reruns
+    log_format = '%(asctime)s - %(levelname)s - %(message)s'; formatter = logging.Formatter(log_format)
     root_logger = logging.getLogger();
     if not root_logger.hasHandlers(): root_logger.setLevel(logging.INFO)
     ui_h_exists = any(isinstance(h, logging.StreamHandler) and getattr(h,'stream',None) == st.session_state.log_stream for h in root_logger.handlers)
@@ -52,125 +60,89 @@ if not st.session_state.logging_configured:
 
 
 # --- Configuration via config.py ---
-load_environment()
-client = initialize_client()
-TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID = get_telegram_credentials()
-if client is None: st.error("❌ Gemini client init failed."); logging.error("Client is None."); st.stop()
+# Built once per server process and shared by all sessions instead of on every rerun
+@st.cache_resource(show_spinner=False)
+def get_client():
+    load_environment()
+    return initialize_client()
+
+@st.cache_resource(show_spinner=False)
+def get_telegram_config() -> tuple[str | None, str | None]:
+    load_environment()
+    return get_telegram_credentials()
+
+client = get_client()
+TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID = get_telegram_config()
+if client is None: get_client.clear(); st.error("❌ Gemini client init failed."); logging.error("Client is None."); st.stop() # Don't cache the failure
 
 # --- Session State ---
 if 'user_id' not in st.session_state: st.session_state.user_id = None
 if 'preferences' not in st.session_state: st.session_state.preferences = None
 if 'itinerary' not in st.session_state: st.session_state.itinerary = None
-if 'memory_store' not in st.session_state: st.session_state.memory_store = {}; logging.info("Initialized memory store.")
 if 'app_state' not in st.session_state: st.session_state.app_state = 'login'
 if 'error_message' not in st.session_state: st.session_state.error_message = None
 if 'show_modify_form' not in st.session_state: st.session_state.show_modify_form = False
+if 'suggest_new' not in st.session_state: st.session_state.suggest_new = False
+if 'regen_base' not in st.session_state: st.session_state.regen_base = None # (old prefs, old itinerary) for incremental regeneration
+if 'session_id' not in st.session_state: st.session_state.session_id = uuid.uuid4().hex # Keys this session's speculative generations
+if 'rerun_timings' not in st.session_state: st.session_state.rerun_timings = deque(maxlen=50) # Server ms of recent reruns
 
 
 # --- Memory Functions ---
+# Backed by the shared store in core/memory.py, so users persist across sessions and restarts
 def store_prefs_in_session(user_id: str, prefs: UserPreferences):
     if not user_id or not prefs or not isinstance(prefs, UserPreferences): return
     logging.info(f"Storing prefs for {user_id}.")
-    st.session_state.memory_store[user_id] = UserMemory(preferences=prefs)
+    store_user_preferences(user_id, prefs)
 
 def get_prefs_from_session(user_id: str) -> UserPreferences | None:
     if not user_id: return None
     logging.info(f"Retrieving prefs for {user_id}.")
-    memory_entry = st.session_state.memory_store.get(user_id)
-    if isinstance(memory_entry, UserMemory) and hasattr(memory_entry, 'preferences') and isinstance(memory_entry.preferences, UserPreferences):
-        logging.info(f"Prefs found for {user_id}."); return memory_entry.preferences
-    logging.warning(f"No valid prefs found for {user_id}."); return None
-
-# --- PDF Generation Function ---
-# (Keep PDF function as before, it formats correctly for PDF)
-def create_itinerary_pdf(itinerary: Itinerary, preferences: UserPreferences) -> bytes:
-    pdf = FPDF(); pdf.add_page(); pdf.set_auto_page_break(auto=True, margin=15); pdf.set_font("Helvetica", size=12)
-    pdf.set_font("Helvetica", "B", 16); pdf.multi_cell(0, 10, f"Itinerary for {preferences.name}", align='C'); pdf.ln(5)
-    pdf.set_font("Helvetica", "B", 12); pdf.write(6, "Preferences:\n"); pdf.set_font("Helvetica", size=10)
-    prefs_text = (f"- Climate: {preferences.climate_preference.title()}\n- Activities: {', '.join(preferences.activity_preferences)}\n- Budget: {preferences.budget.title()}\n- Pace: {preferences.travel_pace.title()}"); pdf.multi_cell(0, 5, prefs_text.encode('latin-1', 'replace').decode('latin-1')); pdf.ln(5)
-    for idx, dest in enumerate(itinerary.destinations):
-        pdf.set_font("Helvetica", "B", 14); pdf.write(7, f"Dest {idx+1}: {getattr(dest, 'name', 'N/A')}\n"); pdf.set_font("Helvetica", size=10); pdf.ln(1)
-        def write_pdf_section(title, content):
-             if content or isinstance(content, list):
-                pdf.set_font("Helvetica", "B", 10); pdf.write(5, f"{title}:\n"); pdf.set_font("Helvetica", size=10); encoded_content = None
-                if isinstance(content, list): encoded_content = "".join([f"- {item}\n" for item in content]).encode('latin-1', 'replace').decode('latin-1') if content else "- N/A"
-                elif content is not None: encoded_content = str(content).encode('latin-1', 'replace').decode('latin-1')
-                else: encoded_content = "N/A"
-                pdf.multi_cell(0, 5, encoded_content); pdf.ln(2)
-        write_pdf_section("Duration", getattr(dest, 'suggested_duration_days', None)); write_pdf_section("Accommodation", getattr(dest, 'suggested_accommodation_type', None)); write_pdf_section("Cost Level", getattr(dest, 'estimated_cost_level', 'N/A').title()); write_pdf_section("Why it Fits", getattr(dest, 'why_it_fits', [])); write_pdf_section("Activities", getattr(dest, 'suggested_activities', [])); write_pdf_section("Food", getattr(dest, 'food_highlights', [])); write_pdf_section("Transport", getattr(dest, 'transportation_notes', [])); write_pdf_section("Daily Focus", getattr(dest, 'sample_daily_focus', [])); write_pdf_section("Day Trip", getattr(dest, 'potential_day_trip', None))
-        pdf.ln(5)
-    pdf.set_font("Helvetica", "B", 12); pdf.write(6, "Reasoning:\n"); pdf.set_font("Helvetica", size=10); reasoning_text = getattr(itinerary, 'overall_reasoning', 'N/A'); pdf.multi_cell(0, 5, reasoning_text.encode('latin-1', 'replace').decode('latin-1')); pdf.ln(5)
-    return bytes(pdf.output()) # Explicitly convert to bytes
-
-
-# --- Telegram Function ---
-def send_pdf_to_telegram(pdf_bytes: bytes, user_name: str, bot_token: str, chat_id: str) -> bool:
-    # (Keep Telegram function as before)
-    if not bot_token or not chat_id: logging.error("Telegram creds missing."); st.error("Telegram creds missing."); return False
-    url = f"https://api.telegram.org/bot{bot_token}/sendDocument"; caption = f"Itinerary for {user_name}."
-    files = {'document': ('itinerary.pdf', pdf_bytes, 'application/pdf')}; payload = {'chat_id': chat_id, 'caption': caption}
-    try:
-        logging.info(f"Sending PDF to Telegram: {chat_id}"); response = requests.post(url, data=payload, files=files, timeout=30); response.raise_for_status()
-        if response.json().get("ok"): logging.info("Sent PDF to Telegram."); return True
-        else: logging.error(f"Telegram API error: {response.json().get('description')}"); st.error(f"Telegram error: {response.json().get('description')}"); return False
-    except requests.exceptions.RequestException as e: logging.error(f"Telegram network error: {e}"); st.error(f"Network error: {e}"); return False
-    except Exception as e: logging.exception("Telegram unexpected error."); st.error(f"Unexpected error: {e}"); return False
-
-
-# --- Email Body Formatting Function (MODIFIED) ---
-def format_itinerary_for_email(itinerary: Itinerary, preferences: UserPreferences) -> str:
-    if not itinerary or not preferences: return "Error: Missing itinerary/preference data."
-    lines = []
-    lines.append(f"Itinerary for {preferences.name}")
-    lines.append("="*40)
-    lines.append("\nPreferences:")
-    lines.append(f"- Climate: {preferences.climate_preference.title()}")
-    lines.append(f"- Activities: {', '.join(preferences.activity_preferences)}")
-    lines.append(f"- Budget: {preferences.budget.title()}")
-    lines.append(f"- Pace: {preferences.travel_pace.title()}")
-    lines.append("\n" + "="*40 + "\n")
-
-    for idx, dest in enumerate(itinerary.destinations):
-        if not isinstance(dest, DestinationDetail): continue
-        lines.append(f"Destination {idx+1}: {getattr(dest, 'name', 'N/A')}")
-        lines.append("-" * len(f"Destination {idx+1}: {getattr(dest, 'name', 'N/A')}"))
-
-        # --- Nested Function Modification ---
-        def format_section_simplified(title, content):
-            lines.append(f"\n{title}:")
-            formatted_content = "N/A" # Default if content is empty or None
-            if isinstance(content, list):
-                if content:
-                    # Join list items into a single comma-separated string
-                    formatted_content = ", ".join(str(item).replace('\n', ' ').strip() for item in content) # Added replace newline
-            elif content is not None:
-                 formatted_content = str(content).replace('\n', ' ').strip() # Added replace newline
-            lines.append(formatted_content) # Append the (potentially simplified) content
-        # --- End Nested Function Modification ---
-
-        format_section_simplified("Duration", getattr(dest, 'suggested_duration_days', None))
-        format_section_simplified("Accommodation", getattr(dest, 'suggested_accommodation_type', None))
-        format_section_simplified("Cost Level", getattr(dest, 'estimated_cost_level', 'N/A').title())
-        format_section_simplified("Why it Fits", getattr(dest, 'why_it_fits', [])) # Uses simplified format
-        format_section_simplified("Activities", getattr(dest, 'suggested_activities', [])) # Uses simplified format
-        format_section_simplified("Food", getattr(dest, 'food_highlights', [])) # Uses simplified format
-        format_section_simplified("Transport", getattr(dest, 'transportation_notes', [])) # Uses simplified format
-        format_section_simplified("Daily Focus", getattr(dest, 'sample_daily_focus', [])) # Uses simplified format
-
-        day_trip = getattr(dest, 'potential_day_trip', None)
-        if day_trip: format_section_simplified("Day Trip", day_trip)
-        lines.append("\n" + "="*40 + "\n")
-
-    lines.append("Overall Reasoning:")
-    # Simplify reasoning too, just in case
-    reasoning = getattr(itinerary, 'overall_reasoning', 'N/A')
-    lines.append(reasoning.replace('\n', ' ').strip() if reasoning else 'N/A')
-
-    body_text = "\n".join(lines)
-    # Log the exact body being generated for debugging
-    logging.info(f"Formatted email body (simplified):\n------\n{body_text}\n------")
-    return body_text
-# --- End Email Body Formatting Function ---
+    return get_user_preferences(user_id)
+
+# --- Cached Exports ---
+# Rendered from the shared document model (core/render.py); PDFs come from the background
+# render service (core/pdf_service.py). Keyed by document_key(); underscored arguments are not hashed.
+@st.cache_data(max_entries=128, show_spinner=False)
+def cached_email_body(key: str, _itinerary: Itinerary, _preferences: UserPreferences) -> str:
+    return render_itinerary(_itinerary, _preferences, "email_text")
+
+
+# --- Telegram Delivery Status ---
+TELEGRAM_STATUS_TEXT = {"queued": "⏳ Queued for Telegram...", "sending": "📤 Sending to Telegram...", "retrying": "🔁 Telegram busy, retrying", "sent": "✅ Sent to Telegram!"}
+
+def _render_telegram_status(status: dict):
+    if status["state"] == "failed": st.error(f"Telegram send failed: {status['error']}"); return
+    text = TELEGRAM_STATUS_TEXT[status["state"]]
+    if status["state"] == "retrying" and status["retry_at"]: text += f" in {max(0, status['retry_at'] - time.time()):.0f}s (attempt {status['attempts']}: {status['error']})"
+    st.caption(text)
+
+def _poll_telegram_status(delivery_id: str):
+    status = get_telegram_delivery().status(delivery_id)
+    if status is None or status["state"] not in PENDING_STATES: st.rerun() # Settled: redraw the page once, without this polling fragment
+    _render_telegram_status(status)
+if hasattr(st, "fragment"): _poll_telegram_status = st.fragment(run_every=2)(_poll_telegram_status) # Polls without rerunning the page
+
+def show_telegram_status(delivery_id: str):
+    status = get_telegram_delivery().status(delivery_id)
+    if status is None: return
+    if status["state"] in PENDING_STATES: _poll_telegram_status(delivery_id) # Only in-flight deliveries keep polling
+    else: _render_telegram_status(status)
+
+
+# --- PDF Download ---
+def _render_pdf_download(pdf_future, file_name: str):
+    try: st.download_button(label="📄 Download PDF", data=pdf_future.result(), file_name=file_name, mime="application/pdf", key="pdf_dl")
+    except Exception as e: st.error(f"PDF failed: {e}"); logging.exception("PDF gen failed.")
+
+def _poll_pdf_download(pdf_future, file_name: str):
+    if pdf_future.done(): st.rerun() # Ready: redraw the page once with the real button
+    st.button("📄 Preparing PDF...", disabled=True, key="pdf_dl_pending")
+if hasattr(st, "fragment"): _poll_pdf_download = st.fragment(run_every=1)(_poll_pdf_download) # Polls without rerunning the page
+
+def show_pdf_download(pdf_future, file_name: str):
+    if pdf_future.done(): _render_pdf_download(pdf_future, file_name)
+    else: _poll_pdf_download(pdf_future, file_name) # A disabled button until the render finishes
 
 
 # --- UI Rendering Functions ---
@@ -199,34 +171,30 @@ def display_preference_form(existing_prefs: UserPreferences | None):
                 if not act_list: st.error("Enter activities.")
                 else:
                     prefs = UserPreferences(name=user_display_name, location=loc, climate_preference=clim, activity_preferences=act_list, budget=bud, travel_pace=pace); st.session_state.preferences = prefs; store_prefs_in_session(st.session_state.user_id, prefs)
-                    st.session_state.itinerary = None; st.session_state.error_message = None; st.session_state.show_modify_form = False; st.session_state.app_state = 'showing_itinerary'; logging.info(f"Prefs updated for {st.session_state.user_id}."); st.rerun()
+                    st.session_state.itinerary = None; st.session_state.telegram_delivery_id = None; st.session_state.error_message = None; st.session_state.show_modify_form = False; st.session_state.app_state = 'showing_itinerary'; logging.info(f"Prefs updated for {st.session_state.user_id}."); st.rerun()
+
+def display_destination(idx: int, dest: DestinationDetail):
+    # Renders one streamed destination while the itinerary is generated
+    if not isinstance(dest, DestinationDetail): logging.warning(f"Skip invalid dest {idx}"); return
+    with st.expander(f"📍 Dest {idx+1}: {dest.name}", expanded=(idx==0)): st.markdown(destination_markdown(build_destination(idx + 1, dest)))
 
 def display_itinerary(itinerary: Itinerary, prefs: UserPreferences):
-    # (Display itinerary should remain as before to show rich formatting in UI)
     st.header("✨ Your Itinerary ✨"); st.subheader("Based on Preferences:")
-    cols = st.columns(2);
-    with cols[0]: st.markdown(f"**Climate:** {prefs.climate_preference.title()}"); st.markdown(f"**Budget:** {prefs.budget.title()}")
-    with cols[1]: st.markdown(f"**Activities:** {', '.join(prefs.activity_preferences)}"); st.markdown(f"**Pace:** {prefs.travel_pace.title()}")
-    st.divider();
-    if not itinerary or not isinstance(itinerary, Itinerary) or not itinerary.destinations: st.error("Invalid itinerary."); logging.warning("Display invalid itinerary."); return
+    if not itinerary or not isinstance(itinerary, Itinerary) or not itinerary.destinations: st.divider(); st.error("Invalid itinerary."); logging.warning("Display invalid itinerary."); return
     try:
-        for idx, dest in enumerate(itinerary.destinations):
-            if not isinstance(dest, DestinationDetail): logging.warning(f"Skip invalid dest {idx}"); continue
-            with st.expander(f"📍 Dest {idx+1}: {getattr(dest, 'name', 'N/A')}", expanded=(idx==0)):
-                st.markdown(f"**Duration:** {getattr(dest, 'suggested_duration_days', 'N/A')}"); st.markdown(f"**Accommodation:** {getattr(dest, 'suggested_accommodation_type', 'N/A')}"); st.markdown(f"**Cost Level:** {getattr(dest, 'estimated_cost_level', 'N/A').title()}")
-                def display_list_items(title, attribute_name):
-                    st.markdown(f"**{title}:**"); items = getattr(dest, attribute_name, [])
-                    if isinstance(items, list) and items:
-                        for item in items: st.markdown(f"- {item}")
-                    else: st.caption("N/A")
-                display_list_items("Why it Fits", 'why_it_fits'); display_list_items("Activities", 'suggested_activities'); display_list_items("Food Highlights", 'food_highlights'); display_list_items("Transportation", 'transportation_notes'); display_list_items("Daily Focus", 'sample_daily_focus')
-                day_trip = getattr(dest, 'potential_day_trip', None);
-                if day_trip: st.markdown(f"**Day Trip:** {day_trip}")
-        st.divider(); st.subheader("💡 Overall Reasoning:"); st.markdown(getattr(itinerary, 'overall_reasoning', 'N/A'))
+        view = render_itinerary(itinerary, prefs, "streamlit") # Memoized: reruns reuse the same strings
+        cols = st.columns(2)
+        with cols[0]: st.markdown(view.preferences[0]); st.markdown(view.preferences[2])
+        with cols[1]: st.markdown(view.preferences[1]); st.markdown(view.preferences[3])
+        st.divider()
+        for idx, (label, body) in enumerate(view.destinations):
+            with st.expander(label, expanded=(idx==0)): st.markdown(body)
+        st.divider(); st.subheader("💡 Overall Reasoning:"); st.markdown(view.reasoning)
     except Exception as e: st.error(f"Display error: {e}"); logging.exception("Display itinerary error.")
 
 def display_modification_form(current_prefs: UserPreferences):
-    # (Keep as before)
+    # Pre-generate the likeliest edits in the background so "Regenerate" usually hits the cache
+    get_speculator().speculate(client, current_prefs, st.session_state.session_id)
     st.subheader("Modify Preferences");
     with st.form("modify_prefs_form"):
         st.write("Change & regenerate:"); clim_opts=["cold", "moderate", "tropical"]; bud_opts=["low", "medium", "high"]; pace_opts=["relaxed", "moderate", "fast"]
@@ -241,8 +209,10 @@ def display_modification_form(current_prefs: UserPreferences):
             else:
                 mod_prefs = UserPreferences(name=current_prefs.name, location=current_prefs.location, climate_preference=mod_clim, activity_preferences=act_list, budget=mod_bud, travel_pace=mod_pace)
                 if mod_prefs != current_prefs:
+                    get_speculator().resolve(st.session_state.session_id, mod_prefs)
+                    st.session_state.regen_base = (current_prefs, st.session_state.itinerary) if st.session_state.itinerary else None # Lets a pace/budget edit update only the affected fields
                     st.session_state.preferences = mod_prefs; store_prefs_in_session(st.session_state.user_id, mod_prefs); st.info("Prefs updated & saved. Regenerating..."); logging.info(f"Prefs modified for {st.session_state.user_id}.")
-                    st.session_state.itinerary = None; st.session_state.error_message = None; st.session_state.show_modify_form = False; st.session_state.app_state = 'showing_itinerary'; st.rerun()
+                    st.session_state.itinerary = None; st.session_state.telegram_delivery_id = None; st.session_state.error_message = None; st.session_state.show_modify_form = False; st.session_state.app_state = 'showing_itinerary'; st.rerun()
                 else: st.info("No changes.")
 
 
@@ -253,17 +223,30 @@ st.title("AI Travel Agent ✈️")
 # --- Sidebar ---
 # (Keep sidebar code exactly as before)
 st.sidebar.title("Controls & Info"); st.sidebar.divider(); st.sidebar.subheader("🧠 User Memory");
-if not st.session_state.get('memory_store'): st.sidebar.caption("No users stored.")
+recent_users = list_recent_users(limit=20)
+if not recent_users: st.sidebar.caption("No users stored.")
 else:
-    sorted_ids = sorted(st.session_state.memory_store.keys())
-    for uid in sorted_ids:
-        mem_data = st.session_state.memory_store[uid]
+    for uid, mem_data in recent_users:
         if isinstance(mem_data, UserMemory) and hasattr(mem_data, 'preferences'):
             prefs = mem_data.preferences; name = prefs.name if hasattr(prefs, 'name') else uid
             with st.sidebar.expander(f"User: {name} ({uid})"):
                 try: st.json(prefs.model_dump(), expanded=False)
                 except Exception as e: st.warning(f"Can't display: {e}")
+                if mem_data.recent_destinations: st.caption(f"Recent: {', '.join(mem_data.recent_destinations[:5])}")
         else: st.sidebar.warning(f"Invalid entry: {uid}")
+st.sidebar.divider(); st.sidebar.subheader("⚡ Itinerary Cache")
+cache_stats = get_default_cache().stats()
+st.sidebar.caption(f"Hits: {cache_stats['hits']} | Misses: {cache_stats['misses']} | Hit rate: {cache_stats['hit_rate']:.0%} | Cached: {cache_stats['size']} | Coalesced: {get_in_flight().coalesced}")
+spec_stats = get_speculator().stats()
+st.sidebar.caption(f"Speculative: {spec_stats['launched']} launched | {spec_stats['used']} used | {spec_stats['wasted']} wasted | Hit rate: {spec_stats['hit_rate']:.0%}")
+pdf_stats = get_default_pdf_service().stats()
+st.sidebar.caption(f"PDFs: {pdf_stats['renders']} rendered | {pdf_stats['hits'] + pdf_stats['joined']} reused | {pdf_stats['in_flight']} rendering | {pdf_stats['failures']} failed")
+if get_gateway().breaker.is_open(): st.sidebar.warning(f"Gemini unavailable: serving saved itineraries (retry in {get_gateway().breaker.retry_after():.0f}s).")
+with st.sidebar.expander("Gemini calls"): st.text(get_gateway().format_metrics())
+cascade = get_model_cascade()
+if cascade is not None:
+    with st.sidebar.expander("Model cascade"):
+        for tier, tier_stats in cascade.stats().items(): st.caption(f"{tier}: {tier_stats['accepted']}/{tier_stats['attempts']} accepted ({tier_stats['success_rate']:.0%}) | p50 {tier_stats['latency_p50']:.1f}s | escalations: {tier_stats['escalations'] or '-'}")
 st.sidebar.divider(); st.sidebar.subheader("📜 Log")
 log_content = st.session_state.log_stream.getvalue()
 if not log_content: st.sidebar.caption("No logs.")
@@ -288,16 +271,23 @@ elif current_state == 'showing_itinerary':
     # Generate itinerary if needed
     if st.session_state.itinerary is None and st.session_state.error_message is None:
         logging.info("Generating itinerary...")
+        stream_placeholder = st.empty() # Destinations render here as soon as each one is streamed
+        stream_container = stream_placeholder.container()
+        def on_destination(idx, dest):
+            with stream_container: display_destination(idx, dest)
         with st.spinner('🧠 Calling AI...'):
             try:
-                st.session_state.itinerary = make_decision(client, st.session_state.preferences) # Use client from config
+                st.session_state.itinerary = make_decision_for_user(client, st.session_state.user_id, st.session_state.preferences, on_destination=on_destination, suggest_new=st.session_state.suggest_new, base=st.session_state.regen_base) # History first, then the shared cache, then the LLM
+                st.session_state.suggest_new = False; st.session_state.regen_base = None
                 st.session_state.error_message = None
                 if st.session_state.itinerary: logging.info("Itinerary generated.")
                 elif not st.session_state.error_message: st.session_state.error_message = "Failed."; logging.error("make_decision None.")
             except Exception as e: st.session_state.error_message = f"Error: {e}"; st.session_state.itinerary = None; logging.exception("make_decision exc.")
+        stream_placeholder.empty() # The full itinerary view below replaces the streamed preview
 
     # Display Itinerary (if successful)
     if st.session_state.itinerary:
+        pdf_future = get_default_pdf_service().submit(st.session_state.itinerary, st.session_state.preferences) # Renders while the page is drawn
         display_itinerary(st.session_state.itinerary, st.session_state.preferences) # Display retains rich formatting
         st.divider()
 
@@ -307,18 +297,13 @@ elif current_state == 'showing_itinerary':
 
         with col1: # PDF Download
             if st.session_state.preferences:
-                try:
-                     pdf_bytes = create_itinerary_pdf(st.session_state.itinerary, st.session_state.preferences) # PDF uses original rich format
-                     st.download_button(label="📄 Download PDF", data=pdf_bytes, file_name=f"itinerary_{st.session_state.user_id}.pdf", mime="application/pdf", key="pdf_dl")
-                except Exception as e: st.error(f"PDF failed: {e}"); logging.exception("PDF gen failed.")
+                show_pdf_download(pdf_future, f"itinerary_{st.session_state.user_id}.pdf") # Never waits on the render
 
         with col2: # Telegram Send
              if TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
-                 if st.button("📲 Send to Telegram", key="telegram_btn"):
-                     pdf_bytes_tg = create_itinerary_pdf(st.session_state.itinerary, st.session_state.preferences) # PDF uses original rich format
-                     with st.spinner("Sending..."):
-                         success = send_pdf_to_telegram(pdf_bytes=pdf_bytes_tg, user_name=st.session_state.preferences.name, bot_token=TELEGRAM_BOT_TOKEN, chat_id=TELEGRAM_CHAT_ID)
-                         if success: st.success("Sent to Telegram!")
+                 if st.button("📲 Send to Telegram", key="telegram_btn"): # Queued: the worker waits for the PDF render and does the upload
+                     st.session_state.telegram_delivery_id = get_telegram_delivery().enqueue(pdf_future, caption=f"Itinerary for {st.session_state.preferences.name}.", file_name=f"itinerary_{st.session_state.user_id}.pdf")
+                 if st.session_state.get('telegram_delivery_id'): show_telegram_status(st.session_state.telegram_delivery_id)
              else: st.caption("Telegram not configured.")
 
         with col3: # Email Sending UI
@@ -328,52 +313,24 @@ elif current_state == 'showing_itinerary':
                 if not email_recipient or "@" not in email_recipient:
                     st.warning("Please enter a valid recipient email address.")
                 else:
-                    # Use the MODIFIED function to get a SIMPLIFIED body for the command line
-                    email_body = format_itinerary_for_email(st.session_state.itinerary, st.session_state.preferences)
+                    email_body = cached_email_body(document_key(st.session_state.itinerary, st.session_state.preferences), st.session_state.itinerary, st.session_state.preferences)
                     email_subject = "AI Travel Plan"
-                    # Construct the user query with the simplified body
-                    user_query = f"Send email to {email_recipient} subject {email_subject} body {email_body}"
-                    logging.info(f"Preparing email command for: {email_recipient}")
-                    # Log the query being sent (which includes the simplified body)
-                    logging.debug(f"Executing command with query: {user_query}")
-
-                    with st.spinner("Executing email command..."):
-                        process_result = None
-                        try:
-                            script_path = "src/gmail_mcp_server/gmail/client.py"
-                            if not os.path.exists(script_path):
-                                 st.error(f"Error: Script '{script_path}' not found.")
-                                 logging.error(f"MCP script not found: {script_path}")
-                            else:
-                                env = os.environ.copy(); env["PYTHONIOENCODING"] = "utf-8"
-                                # Using the previous fix for subprocess output handling (stdout=DEVNULL)
-                                process_result = subprocess.run(
-                                    ["python", script_path, user_query], # user_query now has simplified body
-                                    text=True,
-                                    stdout=subprocess.DEVNULL, # Keep suppressing stdout
-                                    stderr=subprocess.PIPE,    # Capture stderr for errors
-                                    check=True,
-                                    env=env,
-                                    timeout=60
-                                )
-                                st.success("Email command executed successfully!")
-                                if process_result and process_result.stderr:
-                                     logging.warning(f"MCP script stderr (on success):\n{process_result.stderr}")
-
-                        except subprocess.CalledProcessError as e:
-                            st.error(f"Email command failed (Code: {e.returncode}):")
-                            st.text("Error Output (from script):")
-                            st.code(e.stderr) # Display stderr ONLY on failure
-                            logging.error(f"MCP script failed:\n{e.stderr}")
-                        except subprocess.TimeoutExpired: st.error("Email command timed out."); logging.error("MCP script timed out.")
-                        except Exception as e: st.error(f"Error running script: {e}"); logging.exception("Subprocess error.")
+                    with st.spinner("Sending email..."): # One Gmail API call; the service is built on first use only
+                        result = get_gmail_sender().send(email_recipient, email_subject, email_body)
+                    if result.get("status") == "success": st.success(f"Email sent to {email_recipient}!")
+                    else: st.error(f"Email failed: {result.get('error_message')}")
         # --- End Action Buttons ---
         st.divider()
 
         # --- Modification Section Trigger ---
         if not st.session_state.get('show_modify_form', False):
-            if st.button("✏️ Modify Preferences?", key="show_modify_btn"):
-                 st.session_state.show_modify_form = True; st.rerun()
+            mod_col, new_col = st.columns(2)
+            with mod_col:
+                if st.button("✏️ Modify Preferences?", key="show_modify_btn"):
+                     st.session_state.show_modify_form = True; st.rerun()
+            with new_col: # Same preferences, but the prompt lists places already suggested so the model picks others
+                if st.button("🔀 Suggest Different Destinations", key="suggest_new_btn"):
+                     st.session_state.suggest_new = True; st.session_state.itinerary = None; st.session_state.telegram_delivery_id = None; st.session_state.error_message = None; st.rerun()
 
     # Display Error Message
     if st.session_state.error_message: st.error(st.session_state.error_message)
@@ -382,17 +339,29 @@ elif current_state == 'showing_itinerary':
     if st.session_state.get('show_modify_form', False) and st.session_state.preferences:
         display_modification_form(st.session_state.preferences)
         if st.button("Cancel Modification", key="cancel_mod_btn"):
-             st.session_state.show_modify_form = False; st.rerun()
+             get_speculator().resolve(st.session_state.session_id, None); st.session_state.show_modify_form = False; st.rerun()
 
     # Start Over Button
     st.divider()
     if st.button("Start Over / Change User", key="start_over"):
         logging.info("Start Over clicked.")
-        keys_to_reset = ['user_id', 'preferences', 'itinerary', 'error_message', 'show_modify_form']
+        get_speculator().resolve(st.session_state.session_id, None) # Whatever was pre-generated for the open form is wasted
+        keys_to_reset = ['user_id', 'preferences', 'itinerary', 'error_message', 'show_modify_form', 'suggest_new', 'regen_base', 'telegram_delivery_id']
         for key in keys_to_reset:
             if key in st.session_state: del st.session_state[key]
         st.session_state.app_state = 'login'; st.rerun()
 
 else: # Invalid state fallback
     st.error("Invalid app state."); logging.error(f"Invalid state: {current_state}. Resetting.")
-    st.session_state.app_state = 'login'; st.rerun()
\ No newline at end of file
+    st.session_state.app_state = 'login'; st.rerun()
+
+# --- Rerun Timing ---
+# Runs that end in st.rerun()/st.stop() are not recorded; the run they trigger is
+RERUN_BUDGET_MS = 50
+rerun_ms = (time.perf_counter() - _rerun_started) * 1000
+st.session_state.rerun_timings.append((current_state, rerun_ms))
+with st.sidebar.expander(f"⏱️ Rerun: {rerun_ms:.0f} ms", expanded=False):
+    recent = sorted(ms for _, ms in st.session_state.rerun_timings)
+    st.caption(f"Last {len(recent)} runs | p50 {recent[len(recent) // 2]:.0f} ms | max {recent[-1]:.0f} ms | budget {RERUN_BUDGET_MS} ms")
+    st.text("\n".join(f"{state:<18} {ms:7.1f} ms" for state, ms in list(st.session_state.rerun_timings)[-10:]))
+    if rerun_ms > RERUN_BUDGET_MS: st.caption("This run was over budget (an LLM call, first PDF build or cold cache is expected to be).")
\ No newline at end of file
@@ -0,0 +1,156 @@
+# batch.py
+# Offline bulk generation: reads many UserPreferences records (JSONL or CSV) and writes validated
+# itineraries as JSONL. Run from the project root:
+#   python src/batch.py preferences.jsonl -o itineraries.jsonl --concurrency 4 --rpm 60
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# --- BEGIN PATH MODIFICATION ---
+# Same as app.py: make `src.` imports work when run as `python src/batch.py`
+src_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(src_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+# --- END PATH MODIFICATION ---
+
+from src.core.perception import preferences_fingerprint, preferences_from_record
+from src.core.itinerary_cache import make_decision_cached
+from src.config import load_environment, initialize_client
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class RateLimiter:
+    """Client-side limiter that spaces calls evenly to stay under `requests_per_minute`."""
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until the caller may issue the next request."""
+        if not self.interval: return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0: time.sleep(wait)
+
+
+# --- Input / Checkpoint ---
+def load_preference_records(path: str) -> list[tuple[str, dict]]:
+    """Reads (record_id, raw record) pairs from a .jsonl or .csv file.
+
+    The record id is the `id` field when present, otherwise the 1-based line/row number, so
+    re-running the same file resumes against the same ids.
+    """
+    records = []
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row_number, row in enumerate(csv.DictReader(f), 1):
+                records.append((str(row.get("id") or row_number), row))
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip(): continue
+                try: record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logging.error(f"Skipping line {line_number}: invalid JSON ({e})."); continue
+                records.append((str(record.get("id") or line_number), record))
+    logging.info(f"Loaded {len(records)} preference records from {path}.")
+    return records
+
+def load_completed_ids(output_path: str) -> set[str]:
+    """Ids already written to the output file (the output doubles as the checkpoint)."""
+    completed = set()
+    if not os.path.exists(output_path): return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try: completed.add(str(json.loads(line)["id"]))
+            except (json.JSONDecodeError, KeyError, TypeError): continue # Torn last line from an interrupted run
+    return completed
+
+
+# --- Batch Run ---
+def run_batch(client, input_path: str, output_path: str, concurrency: int = 4, requests_per_minute: float = 60) -> dict:
+    """Generates itineraries for every record not yet in `output_path`, appending results as they finish."""
+    records = load_preference_records(input_path)
+    completed_ids = load_completed_ids(output_path)
+    pending = [(record_id, record) for record_id, record in records if record_id not in completed_ids]
+    stats = {"total": len(records), "skipped": len(records) - len(pending), "succeeded": 0, "failed": 0, "invalid": 0}
+    logging.info(f"Resuming: {stats['skipped']} already done, {len(pending)} to generate (concurrency={concurrency}, rpm={requests_per_minute}).")
+
+    limiter = RateLimiter(requests_per_minute)
+    write_lock = threading.Lock()
+    failures_path = f"{output_path}.failures.jsonl"
+    start_time = time.perf_counter()
+
+    def generate(record_id: str, record: dict):
+        prefs = preferences_from_record(record, record_id)
+        limiter.acquire()
+        return prefs, make_decision_cached(client, prefs)
+
+    with open(output_path, "a", encoding="utf-8") as out, open(failures_path, "a", encoding="utf-8") as failures, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(generate, record_id, record): record_id for record_id, record in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            record_id = futures[future]
+            try:
+                prefs, itinerary = future.result()
+                error = None if itinerary else "Generation returned no valid itinerary."
+            except ValueError as e: # Includes pydantic's ValidationError
+                prefs, itinerary, error = None, None, f"Invalid preference record: {e}"
+                stats["invalid"] += 1
+            except Exception as e:
+                prefs, itinerary, error = None, None, f"Unexpected error: {e}"
+
+            with write_lock:
+                if itinerary:
+                    out.write(json.dumps({"id": record_id, "name": prefs.name, "fingerprint": preferences_fingerprint(prefs), "preferences": prefs.model_dump(), "itinerary": itinerary.model_dump()}) + "\n")
+                    out.flush() # Each finished record is durable before the next one is counted
+                    stats["succeeded"] += 1
+                else:
+                    failures.write(json.dumps({"id": record_id, "error": error}) + "\n"); failures.flush()
+                    stats["failed"] += 1
+                    logging.error(f"Record {record_id} failed: {error}")
+
+            if done % 10 == 0 or done == len(pending):
+                elapsed = time.perf_counter() - start_time
+                logging.info(f"Progress: {done}/{len(pending)} ({stats['succeeded']} ok, {stats['failed']} failed), {done / elapsed * 60:.1f} records/min.")
+
+    elapsed = time.perf_counter() - start_time
+    stats["elapsed_seconds"] = round(elapsed, 2)
+    stats["itineraries_per_minute"] = round(stats["succeeded"] / elapsed * 60, 2) if elapsed > 0 else 0.0
+    logging.info(f"Batch finished: {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk itinerary generation from a JSONL or CSV preference file.")
+    parser.add_argument("input_path", help="Preferences file (.jsonl or .csv) with UserPreferences fields and an optional id")
+    parser.add_argument("-o", "--output", default="itineraries.jsonl", help="Output JSONL; also used as the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum parallel LLM calls")
+    parser.add_argument("--rpm", type=float, default=60, help="Client-side limit on LLM requests per minute (0 = unlimited)")
+    args = parser.parse_args()
+
+    load_environment()
+    client = initialize_client()
+    if not client:
+        print("❌ Gemini client failed to initialize. Please check API key and configuration. Exiting.")
+        sys.exit(1)
+
+    stats = run_batch(client, args.input_path, args.output, concurrency=max(1, args.concurrency), requests_per_minute=args.rpm)
+    print(f"\nDone: {stats['succeeded']} generated, {stats['failed']} failed ({stats['invalid']} invalid records), {stats['skipped']} skipped from checkpoint.")
+    print(f"Throughput: {stats['itineraries_per_minute']} itineraries/min over {stats['elapsed_seconds']}s.")
+    sys.exit(1 if stats["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
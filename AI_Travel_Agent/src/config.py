@@ -4,6 +4,7 @@ import google.generativeai as genai
 from google.generativeai import configure
 from dotenv import load_dotenv
 import logging
+from llm_replay import replay_settings, wrap_model # Shared with the other projects; put on sys.path by src/__init__.py
 
 def load_environment():
     """Loads environment variables from .env file."""
@@ -11,8 +12,15 @@ def load_environment():
     logging.info("Environment variables loaded (from config.py).")
 
 def initialize_client():
-    """Loads API key, configures, and returns the Gemini client."""
+    """Loads API key, configures, and returns the Gemini client.
+
+    With LLM_REPLAY_MODE set the client records to / replays from the on-disk response cache;
+    in "replay" mode no API key is needed.
+    """
     api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key and replay_settings()["mode"] == "replay":
+        logging.info("GEMINI_API_KEY not set; replaying recorded responses only.")
+        return create_model_client("gemini-2.0-flash")
     if not api_key:
         logging.error("GEMINI_API_KEY environment variable not set.")
         # In a Streamlit context, we might show an error, but here we return None
@@ -22,17 +30,134 @@ def initialize_client():
     try:
         configure(api_key=api_key)
         # Consider making the model name configurable if needed
-        client = genai.GenerativeModel(model_name="gemini-2.0-flash") # Changed model name
+        client = create_model_client("gemini-2.0-flash") # Changed model name
         logging.info("Gemini client configured successfully (from config.py).")
         return client
     except Exception as e:
         logging.error(f"Error configuring Gemini client (from config.py): {e}")
         return None
 
+def create_model_client(model_name: str):
+    """Builds a client for `model_name` (after initialize_client has configured the API key)."""
+    if not os.getenv("GEMINI_API_KEY") and replay_settings()["mode"] == "replay":
+        return wrap_model(None, model_name=model_name) # Offline: nothing is sent
+    return wrap_model(genai.GenerativeModel(model_name=model_name))
+
+def get_model_cascade_names():
+    """Returns the ITINERARY_MODEL_CASCADE models, cheapest first (fewer than two disables the cascade)."""
+    names = [name.strip().removeprefix("models/") for name in os.getenv("ITINERARY_MODEL_CASCADE", "").split(",") if name.strip()]
+    if len(names) == 1:
+        logging.warning(f"ITINERARY_MODEL_CASCADE lists only '{names[0]}'; a cascade needs at least two models. Disabled.")
+    return list(dict.fromkeys(names)) # Drop repeats, keep order
+
 def get_telegram_credentials():
     """Loads and returns Telegram credentials."""
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     chat_id = os.getenv("TELEGRAM_CHAT_ID")
     if not token or not chat_id:
         logging.warning("Telegram Bot Token or Chat ID is missing in .env file.")
-    return token, chat_id
\ No newline at end of file
+    return token, chat_id
+
+def get_telegram_delivery_settings():
+    """Loads Telegram delivery queue settings (workers and retry policy)."""
+    try:
+        workers = int(os.getenv("TELEGRAM_DELIVERY_WORKERS", "2"))
+        max_retries = int(os.getenv("TELEGRAM_MAX_RETRIES", "4"))
+        retry_base_seconds = float(os.getenv("TELEGRAM_RETRY_BASE_SECONDS", "1.0"))
+    except ValueError:
+        logging.warning("Invalid Telegram delivery settings in .env file. Using defaults.")
+        workers, max_retries, retry_base_seconds = 2, 4, 1.0
+    return {"workers": workers, "max_retries": max_retries, "retry_base_seconds": retry_base_seconds}
+
+def get_gmail_settings():
+    """Loads Gmail OAuth file paths (defaults: next to the Gmail MCP server)."""
+    gmail_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gmail_mcp_server", "gmail")
+    return {"creds_file_path": os.getenv("GMAIL_CREDS_FILE_PATH", os.path.join(gmail_dir, "client_secrets.json")),
+            "token_path": os.getenv("GMAIL_TOKEN_PATH", os.path.join(gmail_dir, "token.json"))}
+
+def get_itinerary_cache_settings():
+    """Loads itinerary cache settings (size, TTL and optional on-disk directory)."""
+    try:
+        max_entries = int(os.getenv("ITINERARY_CACHE_MAX_ENTRIES", "256"))
+        ttl_seconds = float(os.getenv("ITINERARY_CACHE_TTL_SECONDS", "21600"))
+    except ValueError:
+        logging.warning("Invalid itinerary cache settings in .env file. Using defaults.")
+        max_entries, ttl_seconds = 256, 21600.0
+    cache_dir = os.getenv("ITINERARY_CACHE_DIR") or None
+    return {"max_entries": max_entries, "ttl_seconds": ttl_seconds, "cache_dir": cache_dir}
+
+def get_usage_log_path():
+    """Path of the JSONL log of requested preference profiles (read by warm_cache.py), or None when disabled."""
+    return os.getenv("ITINERARY_USAGE_LOG") or None
+
+def get_user_memory_settings():
+    """Loads user memory store settings (backend, SQLite path, cache size/eviction, write-behind)."""
+    backend = os.getenv("USER_MEMORY_BACKEND", "sqlite").strip().lower()
+    if backend not in ("sqlite", "memory"):
+        logging.warning(f"Unknown USER_MEMORY_BACKEND '{backend}'. Using 'sqlite'.")
+        backend = "sqlite"
+    try:
+        cache_entries = int(os.getenv("USER_MEMORY_CACHE_ENTRIES", "10000"))
+        flush_interval = float(os.getenv("USER_MEMORY_FLUSH_INTERVAL_SECONDS", "2"))
+        flush_batch_size = int(os.getenv("USER_MEMORY_FLUSH_BATCH_SIZE", "500"))
+        max_users = int(os.getenv("USER_MEMORY_MAX_USERS", "0"))
+    except ValueError:
+        logging.warning("Invalid user memory settings in .env file. Using defaults.")
+        cache_entries, flush_interval, flush_batch_size, max_users = 10000, 2.0, 500, 0
+    return {
+        "backend": backend,
+        "db_path": os.getenv("USER_MEMORY_DB_PATH", "user_memory.db"),
+        "cache_entries": cache_entries,
+        "eviction": os.getenv("USER_MEMORY_EVICTION", "lru").strip().lower(),
+        "flush_interval": flush_interval,
+        "flush_batch_size": flush_batch_size,
+        "max_users": max_users,
+    }
+
+def get_similarity_settings():
+    """Loads settings for reusing itineraries of similar (not identical) preference profiles."""
+    try:
+        threshold = float(os.getenv("SIMILAR_PREFERENCES_THRESHOLD", "0.92"))
+        max_entries = int(os.getenv("SIMILAR_PREFERENCES_MAX_ENTRIES", "50000"))
+    except ValueError:
+        logging.warning("Invalid similar-preference settings in .env file. Using defaults.")
+        threshold, max_entries = 0.92, 50000
+    return {"threshold": threshold, "max_entries": max_entries}
+
+def get_speculation_settings():
+    """Loads limits for speculative pre-generation while the modification form is open."""
+    try:
+        max_workers = int(os.getenv("SPECULATION_MAX_WORKERS", "2"))
+        max_per_hour = int(os.getenv("SPECULATION_MAX_PER_HOUR", "60"))
+        variants = int(os.getenv("SPECULATION_VARIANTS", "4"))
+        session_ttl = float(os.getenv("SPECULATION_SESSION_TTL_SECONDS", "3600"))
+    except ValueError:
+        logging.warning("Invalid speculation settings in .env file. Using defaults.")
+        max_workers, max_per_hour, variants, session_ttl = 2, 60, 4, 3600.0
+    return {"max_workers": max_workers, "max_per_hour": max_per_hour, "variants": variants, "session_ttl": session_ttl}
+
+def get_pdf_render_settings():
+    """Loads PDF render service settings (worker count, pool type and cache size)."""
+    try:
+        max_workers = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+        max_entries = int(os.getenv("PDF_RENDER_CACHE_ENTRIES", "128"))
+    except ValueError:
+        logging.warning("Invalid PDF render settings in .env file. Using defaults.")
+        max_workers, max_entries = 2, 128
+    pool = os.getenv("PDF_RENDER_POOL", "process").strip().lower()
+    if pool not in ("process", "thread"):
+        logging.warning(f"Unknown PDF_RENDER_POOL '{pool}'. Using 'process'.")
+        pool = "process"
+    return {"max_workers": max_workers, "max_entries": max_entries, "use_processes": pool == "process"}
+
+def get_incremental_regeneration():
+    """Whether a pace/budget change updates only the affected fields of the current itinerary."""
+    return os.getenv("ITINERARY_INCREMENTAL", "true").strip().lower() not in ("0", "false", "no", "off")
+
+def get_generation_mode():
+    """Returns the itinerary generation mode: auto, single, stream, parallel or structured."""
+    mode = os.getenv("ITINERARY_GENERATION_MODE", "auto").strip().lower()
+    if mode not in ("auto", "single", "stream", "parallel", "structured"):
+        logging.warning(f"Unknown ITINERARY_GENERATION_MODE '{mode}'. Using 'auto'.")
+        mode = "auto"
+    return mode
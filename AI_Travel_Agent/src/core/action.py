@@ -3,6 +3,7 @@
 try:
     # This line imports the Pydantic models defined in decision_making.py
     from src.core.decision_making import Itinerary, DestinationDetail
+    from src.core.render import TERMINAL_HEADER, TERMINAL_RULE, build_destination, destination_terminal, get_default_renderer
 except ImportError:
     # Fallback or specific error handling if needed
     print("Error: Could not import Itinerary/DestinationDetail from decision_making. Check file location and imports.")
@@ -15,9 +16,25 @@ import logging
 # Configure basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def present_destination(idx: int, dest: DestinationDetail):
+    """Prints a single destination (1-based `idx`); the header is printed before the first one.
+
+    Used directly as the streaming callback so destinations appear as soon as they are generated.
+    """
+    if idx == 1: print(TERMINAL_HEADER)
+
+    # Check if 'dest' is actually a DestinationDetail object
+    if not isinstance(dest, DestinationDetail):
+         logging.warning(f"Item {idx} in destinations list is not a DestinationDetail object: {type(dest)}. Skipping.")
+         return
+    print(destination_terminal(build_destination(idx, dest)))
+
 # This function EXPECTS an Itinerary object (structured by Pydantic) as input
-def present_itinerary(itinerary: Itinerary | None):
-    """Displays the detailed itinerary (structured by Pydantic models) to the user."""
+def present_itinerary(itinerary: Itinerary | None, skip_destinations: int = 0):
+    """Displays the detailed itinerary (structured by Pydantic models) to the user.
+
+    `skip_destinations` is the number of destinations already printed while streaming.
+    """
     logging.info("Entering 'present_itinerary' function (v2 - detailed).")
 
     # Check if the received itinerary object is valid
@@ -27,33 +44,15 @@ def present_itinerary(itinerary: Itinerary | None):
          return
 
     try:
-        print("\n✨ Your Personalized Detailed Travel Itinerary ✨")
-        print("-" * 50) # Wider separator
-
-        # Loop through the list of DestinationDetail objects within the Itinerary
-        for idx, dest in enumerate(itinerary.destinations, 1):
-            # Check if 'dest' is actually a DestinationDetail object
-            if not isinstance(dest, DestinationDetail):
-                 logging.warning(f"Item {idx} in destinations list is not a DestinationDetail object: {type(dest)}. Skipping.")
-                 continue
-
-            # Access attributes defined in the DestinationDetail Pydantic model
-            print(f"\n📍 Destination {idx}: {getattr(dest, 'name', 'N/A')}")
-            print(f"   - Why it Fits: {getattr(dest, 'why_it_fits', 'N/A')}")
-
-            activities = getattr(dest, 'suggested_activities', [])
-            if isinstance(activities, list):
-                 print(f"   - Suggested Activities: {', '.join(activities) if activities else 'N/A'}")
-            else:
-                 logging.warning(f"Suggested activities for {getattr(dest, 'name', 'N/A')} is not a list: {type(activities)}")
-                 print(f"   - Suggested Activities: Invalid data format received")
-
-            print(f"   - Estimated Cost Level: {getattr(dest, 'estimated_cost_level', 'N/A')}")
+        # The document is built once per itinerary; streamed destinations were already printed
+        doc = get_default_renderer().document(itinerary)
+        if skip_destinations == 0: print(TERMINAL_HEADER)
+        for dest in doc.destinations:
+            if dest.number > skip_destinations: print(destination_terminal(dest))
 
-        print("-" * 50)
-        # Access the overall_reasoning attribute from the Itinerary Pydantic model
+        print(TERMINAL_RULE)
         print("\n💡 Overall Reasoning:")
-        print(getattr(itinerary, 'overall_reasoning', 'N/A'))
+        print(doc.reasoning)
         logging.info("Detailed itinerary displayed successfully.")
 
     except AttributeError as ae:
@@ -62,4 +61,4 @@ def present_itinerary(itinerary: Itinerary | None):
          print("\nSorry, there was an issue displaying parts of the itinerary due to unexpected data format.")
     except Exception as e:
         logging.error(f"Error displaying detailed itinerary: {e}")
-        print("\nSorry, an unexpected error occurred while trying to display the detailed itinerary.")
\ No newline at end of file
+        print("\nSorry, an unexpected error occurred while trying to display the detailed itinerary.")
@@ -1,7 +1,13 @@
 from pydantic import BaseModel, Field, ValidationError
-from typing import List, Optional
+from typing import Callable, List, Optional
 import re
 import json
+import asyncio
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 # Ensure UserPreferences is importable from perception.py
 # If perception.py is in the same directory, this should work:
 try:
@@ -14,6 +20,7 @@ except ImportError:
 
 import logging
 import google.generativeai as genai # Import library for potential type hinting
+from gemini_gateway import get_gateway # Shared with the other projects; put on sys.path by src/__init__.py
 
 # Configure basic logging
 # Note: Streamlit app handles its own logging config, this is fallback/module level
@@ -40,66 +47,81 @@ class Itinerary(BaseModel):
     destinations: List[DestinationDetail] = Field(..., description="List of detailed destination recommendations")
     overall_reasoning: str = Field(..., description="General reasoning for selecting these destinations as a group") # Can also ask for bullets here if desired
 
+# Linear-time token patterns: the string body uses the unrolled-loop form, which cannot backtrack
+_JSON_STRUCTURAL_CHARS = re.compile(r'[{}"]')
+_JSON_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+
+def find_json_object_spans(text: str) -> List[tuple[int, int]]:
+    """ Returns (start, end) spans of every complete top-level {...} block in a single O(n) pass.
+
+    Quotes are only treated as JSON strings inside an object, and string contents (including
+    escaped quotes) are skipped as a whole, so braces inside values never cut a block short.
+    """
+    spans = []
+    depth = 0
+    start = None
+    pos = 0
+    search = _JSON_STRUCTURAL_CHARS.search
+    while True:
+        match = search(text, pos)
+        if not match: break
+        i = match.start(); ch = text[i]; pos = i + 1
+        if ch == '{':
+            if depth == 0: start = i
+            depth += 1
+        elif depth == 0:
+            continue # Prose outside any object
+        elif ch == '"':
+            string_end = _JSON_STRING_REST.match(text, pos)
+            if not string_end: break # Unterminated string: the response was truncated
+            pos = string_end.end()
+        else: # '}'
+            depth -= 1
+            if depth == 0: spans.append((start, pos))
+    return spans
+
 def extract_json_string(text: str) -> str | None:
-    """ Extracts a JSON string block from text, handling markdown fences. """
+    """ Extracts the JSON object from LLM text (markdown fences and surrounding prose are ignored).
+
+    Picks the largest complete top-level object (the last one on ties), so stray braces in prose
+    or a truncated trailing object do not replace the real payload.
+    """
     logging.info("Attempting to extract JSON string from text.")
-    # Pattern 1: ```json ... ```
-    # Making regex non-greedy and handling optional json language tag
-    match_fence = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', text, re.DOTALL | re.IGNORECASE)
-    if match_fence:
-        extracted_json = match_fence.group(1).strip()
-        logging.info("Extracted JSON using ```json fence.")
-        return extracted_json
-    # Pattern 2: Raw JSON object (potentially with surrounding text/whitespace)
-    match_raw = re.search(r'^\s*(\{.*?\})\s*$', text, re.DOTALL)
-    if match_raw:
-         extracted_json = match_raw.group(1).strip()
-         logging.info("Extracted raw JSON object (entire string).")
-         return extracted_json
-    # Pattern 3: Fallback - find any structure starting with { and ending with }
-    # Be careful as this might grab unintended parts if LLM response is malformed
-    match_fallback = re.search(r'(\{.*\})', text, re.DOTALL)
-    if match_fallback:
-        extracted_json = match_fallback.group(1).strip()
-        # Basic validation: check if it starts/ends with braces
-        if extracted_json.startswith('{') and extracted_json.endswith('}'):
-            logging.warning("Extracted JSON using fallback pattern - validation needed.")
-            return extracted_json
-        else:
-             logging.error("Fallback pattern matched non-JSON-like structure.")
-             # Continue to raise error below
-             pass
+    spans = find_json_object_spans(text)
+    if not spans:
+        logging.error("❌ No valid JSON structure found in LLM output.")
+        raise ValueError("❌ No valid JSON structure found in LLM output.")
 
-    logging.error("❌ No valid JSON structure found in LLM output.")
-    raise ValueError("❌ No valid JSON structure found in LLM output.")
+    start, end = max(reversed(spans), key=lambda span: span[1] - span[0])
+    logging.info(f"Extracted JSON object ({end - start} chars, {len(spans)} candidate(s)).")
+    return text[start:end]
 
 
-# --- Updated make_decision function for bullet points & detail ---
-def make_decision(client: genai.GenerativeModel, preferences: UserPreferences) -> Itinerary | None:
-    """Generates a highly detailed, bulleted itinerary."""
-    logging.info("Entering 'make_decision' function (v4 - bullets & detail).")
-    if not isinstance(preferences, UserPreferences):
-        logging.error("Invalid preferences object received in make_decision.")
-        return None
+SAFETY_SETTINGS = [ {"category": c, "threshold": "BLOCK_MEDIUM_AND_ABOVE"} for c in ["HARM_CATEGORY_HARASSMENT", "HARM_CATEGORY_HATE_SPEECH", "HARM_CATEGORY_SEXUALLY_EXPLICIT", "HARM_CATEGORY_DANGEROUS_CONTENT"]]
 
-    activity_prefs_str = ", ".join(preferences.activity_preferences)
+_reports = threading.local()
 
-    # --- Updated Prompt for Bullet Points ---
-    prompt = f'''
-You are an exceptionally detailed and structured travel consultant AI. Your goal is to provide personalized, highly detailed, actionable, and easy-to-read travel recommendations using bullet points for clarity.
+def reports_quiet(quiet: bool = True):
+    """Marks the current thread as a background worker (or not): its reports are logged, never sent to Streamlit.
 
-**User Preferences:**
-- **Activities:** {activity_prefs_str}
-- **Climate:** {preferences.climate_preference}
-- **Budget:** {preferences.budget}
-- **Pace:** {preferences.travel_pace}
-- **Current Location:** {preferences.location}
+    Streamlit calls only work on the thread running the app script; pool threads that
+    generate speculatively or in bulk have no page to show a message on.
+    """
+    _reports.quiet = quiet
 
-**Your Task:**
-1.  **Analyze Preferences:** Deeply analyze the user's profile.
-2.  **Select Destinations:** Choose exactly 3 distinct destinations matching the profile.
-3.  **Provide Structured Details:** For *each* destination, provide comprehensive details. Crucially, use JSON lists of strings for fields marked with "(bullet points)" to represent distinct points.
-    * `name`: City/Region, Country
+def report_to_user(message: str, level: str = "error"):
+    """Shows a message in Streamlit when available, otherwise prints it; background workers only log it."""
+    if getattr(_reports, "quiet", False):
+        logging.info(f"Background {level} (not shown): {message}"); return
+    try: import streamlit as st
+    except ImportError: print(message); return
+    getattr(st, level)(message)
+
+def _report_error(message: str):
+    report_to_user(message)
+
+# --- Prompt pieces shared by every generation mode ---
+DESTINATION_FIELD_GUIDE = '''    * `name`: City/Region, Country
     * `why_it_fits` (bullet points): List explaining fit (climate, activities, pace, budget).
     * `suggested_activities` (bullet points): List of 3-5 specific activities.
     * `food_highlights` (bullet points): List of 2-3 specific food items/types.
@@ -108,7 +130,37 @@ You are an exceptionally detailed and structured travel consultant AI. Your goal
     * `estimated_cost_level`: Low, Medium, or High.
     * `suggested_duration_days`: Estimated duration (e.g., "4 days").
     * `suggested_accommodation_type`: Suitable types (e.g., "Boutique hotels").
-    * `potential_day_trip`: A nearby trip suggestion (or null).
+    * `potential_day_trip`: A nearby trip suggestion (or null).'''
+
+def format_preferences(preferences: UserPreferences, avoid_destinations: List[str] | None = None) -> str:
+    """Formats the user preference block embedded in the prompts.
+
+    `avoid_destinations` (places already suggested to this user) is added as one compact line.
+    """
+    activity_prefs_str = ", ".join(preferences.activity_preferences)
+    block = f'''**User Preferences:**
+- **Activities:** {activity_prefs_str}
+- **Climate:** {preferences.climate_preference}
+- **Budget:** {preferences.budget}
+- **Pace:** {preferences.travel_pace}
+- **Current Location:** {preferences.location}'''
+    if avoid_destinations:
+        block += f"\n- **Already Suggested (recommend different places):** {'; '.join(avoid_destinations)}"
+    return block
+
+def build_itinerary_prompt(preferences: UserPreferences, avoid_destinations: List[str] | None = None) -> str:
+    """Builds the detailed, bulleted itinerary prompt for the given preferences."""
+    # --- Updated Prompt for Bullet Points ---
+    prompt = f'''
+You are an exceptionally detailed and structured travel consultant AI. Your goal is to provide personalized, highly detailed, actionable, and easy-to-read travel recommendations using bullet points for clarity.
+
+{format_preferences(preferences, avoid_destinations)}
+
+**Your Task:**
+1.  **Analyze Preferences:** Deeply analyze the user's profile.
+2.  **Select Destinations:** Choose exactly 3 distinct destinations matching the profile.
+3.  **Provide Structured Details:** For *each* destination, provide comprehensive details. Crucially, use JSON lists of strings for fields marked with "(bullet points)" to represent distinct points.
+{DESTINATION_FIELD_GUIDE}
 4.  **Format Output:** Structure your *entire* response **only** as a single, valid JSON object following the format below. Ensure all requested fields are present, using JSON lists for bulleted items and null where appropriate. No extra text before or after the JSON.
 
 **Fallback:** If perfect matches aren't found, explain compromises in 'why_it_fits' bullets or 'overall_reasoning'.
@@ -158,16 +210,99 @@ You are an exceptionally detailed and structured travel consultant AI. Your goal
 }}
 ```
 '''
-    # Initialize variables for robust error logging
+    return prompt
+
+def parse_itinerary_response(response_text: str, client: genai.GenerativeModel | None = None, preferences: UserPreferences | None = None) -> Itinerary | None:
+    """Extracts, parses and validates an Itinerary from raw LLM text, reporting failures.
+
+    When `client` and `preferences` are given, a response that parses but fails validation
+    goes through repair_itinerary_data instead of being discarded.
+    """
     json_string = None
-    response_text = "No response received from LLM."
     itinerary_data = None
+    try:
+        logging.info("Extracting JSON from response...")
+        json_string = extract_json_string(response_text) # Will raise ValueError if not found
+
+        logging.info("Parsing JSON string...")
+        itinerary_data = json.loads(json_string) # Will raise JSONDecodeError on failure
+
+        logging.info("Validating parsed data using Pydantic model...")
+        itinerary = Itinerary(**itinerary_data) # Will raise ValidationError on failure
+
+        logging.info("Itinerary object created and validated successfully.")
+        return itinerary
+
+    # Specific error handling (JSONDecodeError and ValidationError are ValueError subclasses, so they go first)
+    except json.JSONDecodeError as jde: # From json.loads
+         logging.error(f"JSON Parsing Error: {jde}. Problematic String:\n'''{json_string}'''")
+         _report_error("Error parsing itinerary data structure.")
+         return None
+    except (ValidationError, TypeError) as pve: # From Itinerary(**itinerary_data); TypeError when the JSON is not an object
+        logging.error(f"Pydantic Validation Error: {pve}. Problematic Data:\n'''{itinerary_data}'''")
+        if client is not None and isinstance(preferences, UserPreferences) and isinstance(itinerary_data, dict):
+            itinerary = repair_itinerary_data(client, preferences, itinerary_data)
+            if itinerary: return itinerary
+        _report_error("Generated itinerary structure is invalid or missing required fields.")
+        return None
+    except ValueError as ve: # From extract_json_string
+         logging.error(f"JSON Extraction Error: {ve}. Problematic Text:\n'''{response_text}'''")
+         _report_error("Error extracting itinerary data from LLM response.")
+         return None
+
+
+def _parse_candidate(response_text: str) -> tuple[Itinerary | None, str | None]:
+    """Parses a response without reporting errors; returns (itinerary, failure reason)."""
+    try:
+        return Itinerary(**json.loads(extract_json_string(response_text))), None
+    except json.JSONDecodeError: return None, "json_error"
+    except (ValidationError, TypeError): return None, "validation_error" # TypeError: a JSON array or scalar, not an object
+    except ValueError: return None, "extraction_error"
+
+class ItineraryResponseValidator:
+    """Hedge validator for one request: True if a (non-streamed) response holds a valid Itinerary.
+
+    The itinerary it parsed is kept, so the caller reuses it via `parsed(response)` instead of
+    parsing the winning response a second time. Safe to call from the gateway's hedge threads.
+    """
+
+    def __init__(self):
+        self._parsed: dict[int, tuple[object, Itinerary]] = {}
+
+    def __call__(self, response) -> bool:
+        if not hasattr(response, 'parts') or not response.parts: return False
+        itinerary = _parse_candidate(response.text)[0]
+        if itinerary is None: return False
+        self._parsed[id(response)] = (response, itinerary) # Holding the response keeps its id unique
+        return True
+
+    def parsed(self, response) -> Itinerary | None:
+        """The itinerary validated for `response`, or None if it was not validated (no hedge) or invalid."""
+        entry = self._parsed.get(id(response))
+        return entry[1] if entry and entry[0] is response else None
+
+
+# --- Updated make_decision function for bullet points & detail ---
+def make_decision(client: genai.GenerativeModel, preferences: UserPreferences, avoid_destinations: List[str] | None = None) -> Itinerary | None:
+    """Generates a highly detailed, bulleted itinerary."""
+    logging.info("Entering 'make_decision' function (v4 - bullets & detail).")
+    if not isinstance(preferences, UserPreferences):
+        logging.error("Invalid preferences object received in make_decision.")
+        return None
+
+    cascade = get_model_cascade()
+    if cascade is not None:
+        return cascade.run(client, preferences, avoid_destinations)
+
+    prompt = build_itinerary_prompt(preferences, avoid_destinations)
+    # Initialize variables for robust error logging
+    response_text = "No response received from LLM."
     response = None # Initialize response variable
 
+    validator = ItineraryResponseValidator()
     try:
         logging.info("--- SENDING PROMPT TO LLM (v4 - bullets & detail) ---")
-        safety_settings = [ {"category": c, "threshold": "BLOCK_MEDIUM_AND_ABOVE"} for c in ["HARM_CATEGORY_HARASSMENT", "HARM_CATEGORY_HATE_SPEECH", "HARM_CATEGORY_SEXUALLY_EXPLICIT", "HARM_CATEGORY_DANGEROUS_CONTENT"]]
-        response = client.generate_content(prompt, safety_settings=safety_settings)
+        response = get_gateway().generate_hedged(client, prompt, call_site="make_decision", validate=validator, safety_settings=SAFETY_SETTINGS)
         logging.info("--- LLM RESPONSE RECEIVED (v4 - bullets & detail) ---")
 
         # It's safer to check existence before accessing .text
@@ -177,12 +312,7 @@ You are an exceptionally detailed and structured travel consultant AI. Your goal
              # Handle cases where the response might be blocked or malformed early
              feedback = getattr(response, 'prompt_feedback', 'Unknown reason')
              logging.error(f"LLM response missing text attribute. Feedback: {feedback}")
-             # Propagate error to Streamlit if possible (assuming st is available in context)
-             try:
-                 import streamlit as st
-                 st.error(f"LLM response issue. Feedback: {feedback}")
-             except ImportError:
-                 print(f"LLM response issue. Feedback: {feedback}")
+             _report_error(f"LLM response issue. Feedback: {feedback}") # Shown in Streamlit when available
              return None
 
 
@@ -190,47 +320,703 @@ You are an exceptionally detailed and structured travel consultant AI. Your goal
         if not hasattr(response, 'parts') or not response.parts:
              feedback = getattr(response, 'prompt_feedback', 'N/A')
              logging.error(f"LLM response blocked/empty. Feedback: {feedback}")
-             try: # Try to show error in Streamlit
-                 import streamlit as st
-                 st.error(f"LLM response blocked or empty. Feedback: {feedback}")
-             except ImportError: # Fallback for non-Streamlit environments
-                  print(f"LLM response blocked or empty. Feedback: {feedback}")
+             _report_error(f"LLM response blocked or empty. Feedback: {feedback}")
              return None
 
-        logging.info("Extracting JSON from response...")
-        json_string = extract_json_string(response_text) # Will raise ValueError if not found
+        itinerary = validator.parsed(response) # Already parsed while picking the hedge winner
+        if itinerary is not None: return itinerary
+        return parse_itinerary_response(response_text, client=client, preferences=preferences)
 
-        logging.info("Parsing JSON string...")
-        itinerary_data = json.loads(json_string) # Will raise JSONDecodeError on failure
+    # Catch-all for other unexpected errors (e.g., API call failures)
+    except Exception as e:
+        logging.error(f"❌ Unexpected error in make_decision: {e}. Response (if available): {response_text}")
+        # Log feedback if available from response object
+        if response and hasattr(response, 'prompt_feedback'):
+            logging.error(f"Prompt Feedback: {getattr(response, 'prompt_feedback', 'N/A')}")
+        _report_error("An unexpected error occurred while generating the itinerary.")
+        return None
 
-        logging.info("Validating parsed data using Pydantic model...")
-        itinerary = Itinerary(**itinerary_data) # Will raise ValidationError on failure
+# --- Async Variant ---
+async def make_decision_async(client: genai.GenerativeModel, preferences: UserPreferences, avoid_destinations: List[str] | None = None) -> Itinerary | None:
+    """Async counterpart of make_decision built on `generate_content_async`.
 
-        logging.info("Itinerary object created and validated successfully.")
+    The caller's thread is free while the request is in flight; parsing (and the
+    rare synchronous repair round-trip) runs in a worker thread. With a model
+    cascade configured, its tiers are tried the same way.
+    """
+    logging.info("Entering 'make_decision_async' function.")
+    if not isinstance(preferences, UserPreferences):
+        logging.error("Invalid preferences object received in make_decision_async.")
+        return None
+
+    cascade = get_model_cascade()
+    if cascade is not None:
+        return await cascade.run_async(client, preferences, avoid_destinations)
+
+    prompt = build_itinerary_prompt(preferences, avoid_destinations)
+    response_text = "No response received from LLM."
+    response = None
+    validator = ItineraryResponseValidator()
+
+    try:
+        logging.info("--- SENDING PROMPT TO LLM (async) ---")
+        response = await get_gateway().generate_hedged_async(client, prompt, call_site="make_decision_async", validate=validator, safety_settings=SAFETY_SETTINGS)
+        logging.info("--- LLM RESPONSE RECEIVED (async) ---")
+
+        if not hasattr(response, 'parts') or not response.parts:
+            feedback = getattr(response, 'prompt_feedback', 'N/A')
+            logging.error(f"LLM response blocked/empty. Feedback: {feedback}")
+            _report_error(f"LLM response blocked or empty. Feedback: {feedback}")
+            return None
+        response_text = response.text
+
+        itinerary = validator.parsed(response) # Already parsed while picking the hedge winner
+        if itinerary is not None: return itinerary
+        return await asyncio.to_thread(parse_itinerary_response, response_text, client, preferences)
+
+    except Exception as e:
+        logging.error(f"❌ Unexpected error in make_decision_async: {e}. Response (if available): {response_text}")
+        if response and hasattr(response, 'prompt_feedback'):
+            logging.error(f"Prompt Feedback: {getattr(response, 'prompt_feedback', 'N/A')}")
+        _report_error("An unexpected error occurred while generating the itinerary.")
+        return None
+
+# --- Streaming Variant ---
+class DestinationStreamParser:
+    """Incrementally scans streamed LLM text and emits each `destinations` entry once its object closes.
+
+    The scanner is string-aware (braces inside JSON strings are ignored) and keeps its
+    state between `feed` calls, so every character is inspected exactly once.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.destinations: List[DestinationDetail] = []
+        self.emitted_indices: set[int] = set() # Array positions already handed to the caller
+        self._object_index = 0
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None
+        self._array_depth = None # Depth of the `destinations` array while inside it
+        self._object_start = None
+
+    def feed(self, chunk: str) -> List[tuple[int, DestinationDetail]]:
+        """Adds a chunk of text and returns (array index, destination) for each destination completed by it."""
+        self.buffer += chunk
+        completed = []
+        text = self.buffer
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape: self._escape = False
+                elif ch == '\\': self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1: self._last_key = text[self._string_start + 1:i]
+                continue
+            if ch == '"':
+                self._in_string = True; self._string_start = i
+            elif ch == '[':
+                self._depth += 1
+                if self._depth == 2 and self._last_key == "destinations" and self._array_depth is None:
+                    self._array_depth = self._depth
+            elif ch == '{':
+                self._depth += 1
+                if self._array_depth is not None and self._depth == self._array_depth + 1:
+                    self._object_start = i
+            elif ch == '}':
+                if self._array_depth is not None and self._depth == self._array_depth + 1 and self._object_start is not None:
+                    destination = self._parse_destination(text[self._object_start:i + 1])
+                    if destination: completed.append((self._object_index, destination))
+                    self._object_index += 1
+                    self._object_start = None
+                self._depth -= 1
+            elif ch == ']':
+                if self._array_depth is not None and self._depth == self._array_depth:
+                    self._array_depth = None
+                self._depth -= 1
+        self._pos = len(text)
+        for idx, destination in completed:
+            self.destinations.append(destination); self.emitted_indices.add(idx)
+        return completed
+
+    def emit_remaining(self, itinerary: Itinerary, on_destination: Callable[[int, DestinationDetail], None]):
+        """Hands over destinations that only became valid after the final parse (e.g. repaired ones)."""
+        for idx, destination in enumerate(itinerary.destinations):
+            if idx not in self.emitted_indices:
+                on_destination(idx, destination); self.emitted_indices.add(idx)
+
+    def _parse_destination(self, object_text: str) -> DestinationDetail | None:
+        try:
+            return DestinationDetail(**json.loads(object_text))
+        except (json.JSONDecodeError, ValidationError, TypeError) as e:
+            # The full response is validated again at the end, so this is only logged
+            logging.warning(f"Streamed destination could not be validated yet: {e}")
+            return None
+
+
+def make_decision_streaming(client: genai.GenerativeModel, preferences: UserPreferences, on_destination: Callable[[int, DestinationDetail], None] | None = None, avoid_destinations: List[str] | None = None) -> Itinerary | None:
+    """Streams the itinerary response, calling `on_destination(index, destination)` as each destination completes."""
+    logging.info("Entering 'make_decision_streaming' function.")
+    if not isinstance(preferences, UserPreferences):
+        logging.error("Invalid preferences object received in make_decision_streaming.")
+        return None
+
+    prompt = build_itinerary_prompt(preferences, avoid_destinations)
+    parser = DestinationStreamParser()
+    response = None
+    start_time = time.perf_counter()
+    first_destination_at = None
+
+    try:
+        logging.info("--- STREAMING PROMPT TO LLM ---")
+        response = get_gateway().generate(client, prompt, call_site="make_decision_streaming", safety_settings=SAFETY_SETTINGS, stream=True)
+        for chunk in response:
+            try:
+                chunk_text = chunk.text
+            except ValueError: # Raised by the SDK for chunks without text parts (e.g. blocked)
+                logging.warning(f"Streamed chunk without text. Feedback: {getattr(chunk, 'prompt_feedback', 'N/A')}")
+                continue
+            for idx, destination in parser.feed(chunk_text):
+                if first_destination_at is None:
+                    first_destination_at = time.perf_counter() - start_time
+                    logging.info(f"First destination streamed after {first_destination_at:.2f}s.")
+                if on_destination:
+                    on_destination(idx, destination)
+        logging.info(f"--- LLM STREAM COMPLETE after {time.perf_counter() - start_time:.2f}s ({len(parser.destinations)} destinations streamed) ---")
+
+        if not parser.buffer.strip():
+            feedback = getattr(response, 'prompt_feedback', 'N/A')
+            logging.error(f"LLM stream blocked/empty. Feedback: {feedback}")
+            _report_error(f"LLM response blocked or empty. Feedback: {feedback}")
+            return None
+
+        itinerary = parse_itinerary_response(parser.buffer, client=client, preferences=preferences)
+        if itinerary and on_destination: parser.emit_remaining(itinerary, on_destination)
         return itinerary
 
-    # Specific error handling
-    except ValueError as ve: # From extract_json_string
-         logging.error(f"JSON Extraction Error: {ve}. Problematic Text:\n'''{response_text}'''")
-         try: import streamlit as st; st.error("Error extracting itinerary data from LLM response.")
-         except ImportError: print("Error extracting itinerary data from LLM response.")
-         return None
-    except json.JSONDecodeError as jde: # From json.loads
-         logging.error(f"JSON Parsing Error: {jde}. Problematic String:\n'''{json_string}'''")
-         try: import streamlit as st; st.error("Error parsing itinerary data structure.")
-         except ImportError: print("Error parsing itinerary data structure.")
-         return None
-    except ValidationError as pve: # From Itinerary(**itinerary_data)
-        logging.error(f"Pydantic Validation Error: {pve}. Problematic Data:\n'''{itinerary_data}'''")
-        try: import streamlit as st; st.error("Generated itinerary structure is invalid or missing required fields.")
-        except ImportError: print("Generated itinerary structure is invalid.")
+    except Exception as e:
+        logging.error(f"❌ Unexpected error in make_decision_streaming: {e}. Response so far: {parser.buffer}")
+        if response and hasattr(response, 'prompt_feedback'):
+            logging.error(f"Prompt Feedback: {getattr(response, 'prompt_feedback', 'N/A')}")
+        _report_error("An unexpected error occurred while generating the itinerary.")
+        return None
+
+
+# --- Fan-out Variant: select names first, then detail each destination in parallel ---
+class DestinationSelection(BaseModel):
+    destination_names: List[str] = Field(..., description="Exactly 3 destination names as 'City/Region, Country'")
+    overall_reasoning: str = Field(..., description="General reasoning for selecting these destinations as a group")
+
+def build_selection_prompt(preferences: UserPreferences, count: int = 3, avoid_destinations: List[str] | None = None) -> str:
+    """Short prompt that only picks destination names and the overall reasoning."""
+    return f'''
+You are a travel consultant AI. Choose exactly {count} distinct destinations that best match this profile.
+
+{format_preferences(preferences, avoid_destinations)}
+
+Respond **only** with a single valid JSON object, no extra text:
+{{"destination_names": ["City/Region, Country", ...], "overall_reasoning": "Why these destinations fit as a group (note any compromises)."}}
+'''
+
+def build_destination_prompt(preferences: UserPreferences, destination_name: str) -> str:
+    """Prompt that fills in one DestinationDetail for an already chosen destination."""
+    return f'''
+You are an exceptionally detailed and structured travel consultant AI. Provide personalized, actionable details for **{destination_name}** using bullet points for clarity.
+
+{format_preferences(preferences)}
+
+Fill in these fields, using JSON lists of strings for fields marked with "(bullet points)":
+{DESTINATION_FIELD_GUIDE}
+
+Respond **only** with a single valid JSON object for this one destination (keep `name` as "{destination_name}"). Use null where appropriate. No extra text before or after the JSON.
+'''
+
+def _generate_json(client: genai.GenerativeModel, prompt: str, call_site: str = "generate_json") -> dict:
+    """Runs one blocking generation and returns the parsed JSON object (raises on failure)."""
+    response = get_gateway().generate(client, prompt, call_site=call_site, safety_settings=SAFETY_SETTINGS)
+    if not hasattr(response, 'parts') or not response.parts:
+        raise ValueError(f"LLM response blocked or empty. Feedback: {getattr(response, 'prompt_feedback', 'N/A')}")
+    return json.loads(extract_json_string(response.text))
+
+def _detail_destination(client: genai.GenerativeModel, preferences: UserPreferences, destination_name: str) -> DestinationDetail:
+    start_time = time.perf_counter()
+    destination = DestinationDetail(**_generate_json(client, build_destination_prompt(preferences, destination_name), "parallel_destination"))
+    logging.info(f"Detailed '{destination_name}' in {time.perf_counter() - start_time:.2f}s.")
+    return destination
+
+def make_decision_parallel(client: genai.GenerativeModel, preferences: UserPreferences, on_destination: Callable[[int, DestinationDetail], None] | None = None, count: int = 3, avoid_destinations: List[str] | None = None) -> Itinerary | None:
+    """Two-stage generation: one short call picks the destinations, then each is detailed concurrently.
+
+    Wall-clock time is roughly the selection call plus the slowest single destination,
+    instead of the output time of all destinations in one response.
+    """
+    logging.info("Entering 'make_decision_parallel' function.")
+    if not isinstance(preferences, UserPreferences):
+        logging.error("Invalid preferences object received in make_decision_parallel.")
+        return None
+
+    start_time = time.perf_counter()
+    try:
+        logging.info("--- SENDING SELECTION PROMPT TO LLM ---")
+        selection = DestinationSelection(**_generate_json(client, build_selection_prompt(preferences, count, avoid_destinations), "parallel_selection"))
+        names = selection.destination_names[:count]
+        if not names: raise ValueError("LLM selected no destinations.")
+        logging.info(f"Selected destinations in {time.perf_counter() - start_time:.2f}s: {names}")
+    except (ValueError, ValidationError, TypeError) as e: # JSONDecodeError is a ValueError
+        logging.error(f"Destination selection failed: {e}")
+        _report_error("Error selecting destinations for the itinerary.")
         return None
-    # Catch-all for other unexpected errors (e.g., API call failures)
     except Exception as e:
-        logging.error(f"❌ Unexpected error in make_decision: {e}. Response (if available): {response_text}")
-        # Log feedback if available from response object
+        logging.error(f"❌ Unexpected error during destination selection: {e}")
+        _report_error("An unexpected error occurred while generating the itinerary.")
+        return None
+
+    destinations: List[DestinationDetail | None] = [None] * len(names)
+    failures = []
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        futures = {executor.submit(_detail_destination, client, preferences, name): idx for idx, name in enumerate(names)}
+        for future in as_completed(futures): # Callbacks run on this thread, so Streamlit calls are safe
+            idx = futures[future]
+            try:
+                destinations[idx] = future.result()
+                if on_destination: on_destination(idx, destinations[idx])
+            except Exception as e:
+                logging.error(f"Detailing '{names[idx]}' failed: {e}")
+                failures.append(names[idx])
+
+    if failures:
+        _report_error(f"Could not generate details for: {', '.join(failures)}.")
+        return None
+
+    itinerary = Itinerary(destinations=destinations, overall_reasoning=selection.overall_reasoning)
+    logging.info(f"Parallel itinerary assembled in {time.perf_counter() - start_time:.2f}s.")
+    return itinerary
+
+
+# --- Structured Output Variant: JSON-only response constrained by a schema derived from the models ---
+_GEMINI_SCHEMA_KEYS = {"type", "format", "description", "nullable", "enum", "required", "properties", "items"}
+
+def _to_gemini_schema(node: dict, defs: dict) -> dict:
+    """Converts one Pydantic JSON-schema node into the OpenAPI subset accepted by Gemini."""
+    if "$ref" in node:
+        return _to_gemini_schema(defs[node["$ref"].split("/")[-1]], defs)
+    if "anyOf" in node: # Optional[X] is emitted as anyOf [X, null]
+        options = [option for option in node["anyOf"] if option.get("type") != "null"]
+        converted = _to_gemini_schema(options[0], defs)
+        if len(options) < len(node["anyOf"]): converted["nullable"] = True
+        if "description" in node: converted["description"] = node["description"]
+        return converted
+    converted = {}
+    for key, value in node.items():
+        if key == "properties": converted[key] = {name: _to_gemini_schema(prop, defs) for name, prop in value.items()}
+        elif key == "items": converted[key] = _to_gemini_schema(value, defs)
+        elif key in _GEMINI_SCHEMA_KEYS: converted[key] = value
+    return converted
+
+@lru_cache(maxsize=None)
+def _cached_response_schema(model: type[BaseModel]) -> str:
+    json_schema = model.model_json_schema()
+    return json.dumps(_to_gemini_schema(json_schema, json_schema.get("$defs", {})))
+
+def build_response_schema(model: type[BaseModel]) -> dict:
+    """Returns the Gemini response schema for a Pydantic model (derived once, then cached)."""
+    return json.loads(_cached_response_schema(model))
+
+def build_structured_prompt(preferences: UserPreferences, avoid_destinations: List[str] | None = None) -> str:
+    """Itinerary prompt without the JSON example; the response schema carries the format instead."""
+    return f'''
+You are an exceptionally detailed and structured travel consultant AI. Provide personalized, highly detailed, actionable travel recommendations.
+
+{format_preferences(preferences, avoid_destinations)}
+
+**Your Task:**
+1.  **Select Destinations:** Choose exactly 3 distinct destinations matching the profile.
+2.  **Provide Structured Details:** For *each* destination, fill in every field. List fields are bullet points: one distinct point per string.
+{DESTINATION_FIELD_GUIDE}
+3.  **Overall Reasoning:** Explain why these destinations fit as a group. If perfect matches aren't found, explain compromises here or in `why_it_fits`.
+'''
+
+def make_decision_structured(client: genai.GenerativeModel, preferences: UserPreferences, on_destination: Callable[[int, DestinationDetail], None] | None = None, avoid_destinations: List[str] | None = None) -> Itinerary | None:
+    """Generates the itinerary in JSON mode with a schema derived from Itinerary and validates it directly with model_validate_json.
+
+    No example JSON is sent and no extraction step is needed. With `on_destination`, the JSON
+    response is streamed and destinations are emitted as they complete.
+    """
+    logging.info("Entering 'make_decision_structured' function.")
+    if not isinstance(preferences, UserPreferences):
+        logging.error("Invalid preferences object received in make_decision_structured.")
+        return None
+
+    generation_config = genai.GenerationConfig(response_mime_type="application/json", response_schema=build_response_schema(Itinerary))
+    prompt = build_structured_prompt(preferences, avoid_destinations)
+    response_text = ""
+    response = None
+    start_time = time.perf_counter()
+
+    try:
+        logging.info("--- SENDING STRUCTURED PROMPT TO LLM (JSON mode) ---")
+        parser = DestinationStreamParser()
+        if on_destination:
+            response = get_gateway().generate(client, prompt, call_site="make_decision_structured", generation_config=generation_config, safety_settings=SAFETY_SETTINGS, stream=True)
+            for chunk in response:
+                try: chunk_text = chunk.text
+                except ValueError: continue # Chunk without text parts
+                for idx, destination in parser.feed(chunk_text):
+                    on_destination(idx, destination)
+            response_text = parser.buffer
+        else:
+            response = get_gateway().generate(client, prompt, call_site="make_decision_structured", generation_config=generation_config, safety_settings=SAFETY_SETTINGS)
+            if hasattr(response, 'parts') and response.parts: response_text = response.text
+        logging.info(f"--- STRUCTURED RESPONSE RECEIVED after {time.perf_counter() - start_time:.2f}s ---")
+
+        if not response_text.strip():
+            feedback = getattr(response, 'prompt_feedback', 'N/A')
+            logging.error(f"LLM response blocked/empty. Feedback: {feedback}")
+            _report_error(f"LLM response blocked or empty. Feedback: {feedback}")
+            return None
+
+        try:
+            itinerary = Itinerary.model_validate_json(response_text) # Parses and validates in one pass
+            logging.info("Structured itinerary validated successfully.")
+        except ValidationError as pve: # Covers malformed JSON as well as missing fields
+            logging.error(f"Structured Validation Error: {pve}. Problematic Text:\n'''{response_text}'''")
+            try: itinerary_data = json.loads(response_text)
+            except json.JSONDecodeError: itinerary_data = None
+            itinerary = repair_itinerary_data(client, preferences, itinerary_data) if isinstance(itinerary_data, dict) else None
+            if not itinerary:
+                _report_error("Generated itinerary structure is invalid or missing required fields.")
+                return None
+        if on_destination: parser.emit_remaining(itinerary, on_destination)
+        return itinerary
+    except Exception as e:
+        logging.error(f"❌ Unexpected error in make_decision_structured: {e}. Response (if available): {response_text}")
         if response and hasattr(response, 'prompt_feedback'):
             logging.error(f"Prompt Feedback: {getattr(response, 'prompt_feedback', 'N/A')}")
-        try: import streamlit as st; st.error("An unexpected error occurred while generating the itinerary.")
-        except ImportError: print("An unexpected error occurred.")
-        return None
\ No newline at end of file
+        _report_error("An unexpected error occurred while generating the itinerary.")
+        return None
+
+
+# --- Partial Repair: keep valid destinations and re-ask only for what failed validation ---
+_LIST_FIELDS = [name for name, field in DestinationDetail.model_fields.items() if field.annotation == List[str]]
+
+def _coerce_list_fields(raw: dict):
+    """Wraps a bare string in a list for bullet-point fields (a common, free-to-fix LLM slip)."""
+    for field in _LIST_FIELDS:
+        if isinstance(raw.get(field), str): raw[field] = [raw[field]]
+
+def build_field_repair_prompt(preferences: UserPreferences, destination_name: str, field_names: List[str]) -> str:
+    """Short prompt asking only for the listed fields of one destination."""
+    guide = "\n".join(line for line in DESTINATION_FIELD_GUIDE.splitlines() if any(f"`{field}`" in line for field in field_names))
+    return f'''
+You are a travel consultant AI completing details for **{destination_name}**.
+
+{format_preferences(preferences)}
+
+Provide **only** these fields, using JSON lists of strings for fields marked with "(bullet points)":
+{guide}
+
+Respond **only** with a single valid JSON object containing exactly these keys: {", ".join(field_names)}. No extra text.
+'''
+
+def build_replacement_prompt(preferences: UserPreferences, existing_names: List[str]) -> str:
+    """Prompt for one complete destination, distinct from the ones already kept."""
+    avoid = ", ".join(existing_names) if existing_names else "none"
+    return f'''
+You are an exceptionally detailed and structured travel consultant AI. Suggest **one** destination matching this profile, different from: {avoid}.
+
+{format_preferences(preferences)}
+
+Fill in these fields, using JSON lists of strings for fields marked with "(bullet points)":
+{DESTINATION_FIELD_GUIDE}
+
+Respond **only** with a single valid JSON object for this one destination. Use null where appropriate. No extra text.
+'''
+
+def repair_itinerary_data(client: genai.GenerativeModel, preferences: UserPreferences, itinerary_data: dict) -> Itinerary | None:
+    """Repairs an itinerary that parsed but failed validation, with one short call per broken destination.
+
+    Valid destinations are kept as-is. A broken destination with a name only gets its failing
+    fields re-requested; one without a usable name is replaced entirely. A missing overall
+    reasoning is requested on its own. Returns None if the data cannot be repaired.
+    """
+    raw_destinations = itinerary_data.get("destinations")
+    if not isinstance(raw_destinations, list) or not raw_destinations:
+        logging.error("Itinerary data has no destinations list; cannot repair.")
+        return None
+
+    start_time = time.perf_counter()
+    repaired: List[DestinationDetail] = []
+    repair_calls = 0
+    try:
+        for idx, raw in enumerate(raw_destinations):
+            raw = dict(raw) if isinstance(raw, dict) else {}
+            _coerce_list_fields(raw)
+            try:
+                repaired.append(DestinationDetail(**raw)); continue
+            except ValidationError as e:
+                failing_fields = sorted({str(err['loc'][0]) for err in e.errors() if err['loc']})
+
+            name = raw.get("name")
+            if isinstance(name, str) and name.strip() and "name" not in failing_fields:
+                logging.info(f"Repairing destination {idx + 1} ('{name}'): re-requesting {failing_fields}.")
+                fixes = _generate_json(client, build_field_repair_prompt(preferences, name, failing_fields), "repair")
+                raw.update({field: value for field, value in fixes.items() if field in failing_fields})
+            else:
+                logging.info(f"Replacing destination {idx + 1}: no usable name.")
+                raw = _generate_json(client, build_replacement_prompt(preferences, [d.name for d in repaired]), "repair")
+            repair_calls += 1
+            _coerce_list_fields(raw)
+            repaired.append(DestinationDetail(**raw))
+
+        reasoning = itinerary_data.get("overall_reasoning")
+        if not isinstance(reasoning, str) or not reasoning.strip():
+            logging.info("Repairing overall_reasoning.")
+            prompt = f"{format_preferences(preferences)}\n\nIn 2-3 sentences, explain why these destinations fit the user as a group: {', '.join(d.name for d in repaired)}.\nRespond **only** with a JSON object: {{\"overall_reasoning\": \"...\"}}"
+            reasoning = _generate_json(client, prompt, "repair").get("overall_reasoning")
+            repair_calls += 1
+
+        itinerary = Itinerary(destinations=repaired, overall_reasoning=reasoning)
+    except (ValueError, ValidationError, TypeError) as e: # JSONDecodeError is a ValueError
+        logging.error(f"Itinerary repair failed: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"❌ Unexpected error while repairing itinerary: {e}")
+        return None
+
+    logging.info(f"Itinerary repaired with {repair_calls} targeted call(s) in {time.perf_counter() - start_time:.2f}s.")
+    return itinerary
+
+
+# --- Incremental Variant: after a single preference change, re-ask only the affected fields ---
+# Destination fields that depend on each preference. A change to any other preference
+# (location, climate, activities) can change which destinations fit, so it needs a full run.
+FIELDS_AFFECTED_BY = {
+    "travel_pace": ["why_it_fits", "sample_daily_focus", "suggested_duration_days"],
+    "budget": ["why_it_fits", "estimated_cost_level", "suggested_accommodation_type", "transportation_notes"],
+}
+
+def changed_preference_fields(old: UserPreferences, new: UserPreferences) -> List[str]:
+    """Names of the itinerary-shaping fields that differ (case/whitespace and activity order ignored)."""
+    def normalized(prefs: UserPreferences) -> dict:
+        return {"location": prefs.location.strip().lower(), "climate_preference": prefs.climate_preference.strip().lower(),
+                "activity_preferences": sorted({a.strip().lower() for a in prefs.activity_preferences if a.strip()}),
+                "budget": prefs.budget.strip().lower(), "travel_pace": prefs.travel_pace.strip().lower()}
+    old_values, new_values = normalized(old), normalized(new)
+    return [field for field in old_values if old_values[field] != new_values[field]]
+
+def make_decision_incremental(client: genai.GenerativeModel, old_preferences: UserPreferences, new_preferences: UserPreferences, itinerary: Itinerary, on_destination: Callable[[int, DestinationDetail], None] | None = None) -> Itinerary | None:
+    """Updates an existing itinerary for changed preferences without regenerating it.
+
+    Only the fields affected by the change are re-requested, with one short call per
+    destination run in parallel; everything else is kept. Returns None when the change
+    needs new destinations (or an update fails), so the caller can fall back to a full run.
+    """
+    if not isinstance(itinerary, Itinerary) or not itinerary.destinations: return None
+    changed = changed_preference_fields(old_preferences, new_preferences)
+    if not changed: return itinerary
+    if any(field not in FIELDS_AFFECTED_BY for field in changed):
+        logging.info(f"Incremental update not possible for changes to {changed}; full regeneration needed.")
+        return None
+    fields = sorted({f for field in changed for f in FIELDS_AFFECTED_BY[field]})
+    logging.info(f"Incremental update for changes to {changed}: re-requesting {fields} for {len(itinerary.destinations)} destinations.")
+
+    start_time = time.perf_counter()
+    def update(dest: DestinationDetail) -> DestinationDetail:
+        fixes = _generate_json(client, build_field_repair_prompt(new_preferences, dest.name, fields), "incremental")
+        updated = dest.model_dump(); updated.update({field: value for field, value in fixes.items() if field in fields})
+        _coerce_list_fields(updated)
+        return DestinationDetail(**updated)
+
+    updated: dict[int, DestinationDetail] = {}
+    try:
+        with ThreadPoolExecutor(max_workers=len(itinerary.destinations)) as executor:
+            futures = {executor.submit(update, dest): idx for idx, dest in enumerate(itinerary.destinations)}
+            for future in as_completed(futures): updated[futures[future]] = future.result()
+        result = Itinerary(destinations=[updated[idx] for idx in range(len(itinerary.destinations))], overall_reasoning=itinerary.overall_reasoning)
+    except (ValueError, ValidationError, TypeError) as e: # JSONDecodeError is a ValueError
+        logging.error(f"Incremental update failed: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"❌ Unexpected error during incremental update: {e}")
+        return None
+
+    logging.info(f"Incremental update finished with {len(itinerary.destinations)} targeted call(s) in {time.perf_counter() - start_time:.2f}s.")
+    if on_destination: # Only once everything succeeded, so a fallback run never renders duplicates
+        for idx, dest in enumerate(result.destinations): on_destination(idx, dest)
+    return result
+
+
+# --- Model Cascade: cheapest model first, escalate on failure or low quality ---
+MIN_DESTINATIONS = 3
+MIN_BULLETS = {"why_it_fits": 2, "suggested_activities": 3, "food_highlights": 2, "sample_daily_focus": 2}
+
+def itinerary_quality_issues(itinerary: Itinerary, avoid_destinations: List[str] | None = None) -> List[str]:
+    """Cheap checks for a valid but weak itinerary; an empty list means it meets the quality bar."""
+    issues = []
+    names = [d.name.strip().lower() for d in itinerary.destinations]
+    if len(names) < MIN_DESTINATIONS: issues.append("too_few_destinations")
+    if len(set(names)) < len(names): issues.append("duplicate_destinations")
+    avoided = {a.strip().lower() for a in avoid_destinations or []}
+    if avoided.intersection(names): issues.append("repeated_avoided_destination")
+    for dest in itinerary.destinations:
+        if any(len([b for b in getattr(dest, field) if b.strip()]) < minimum for field, minimum in MIN_BULLETS.items()):
+            issues.append("thin_destination_details"); break
+    if len(itinerary.overall_reasoning.strip()) < 20: issues.append("missing_reasoning")
+    return issues
+
+
+class ModelCascade:
+    """Runs make_decision on the configured models, cheapest first.
+
+    A tier's answer is accepted when it extracts, validates against `Itinerary` and passes
+    itinerary_quality_issues; otherwise the next (stronger) tier is tried. Only the last tier
+    gets the usual repair round-trip, and only when no earlier tier gave a valid answer; if no
+    tier meets the bar, the first valid answer is returned. Per-tier attempts, acceptance and
+    latency are kept for `stats()`.
+    """
+
+    def __init__(self, model_names: List[str], model_factory: Callable[[str], object]):
+        self.model_names = model_names
+        self._model_factory = model_factory
+        self._models: dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._stats = {name: {"attempts": 0, "accepted": 0, "escalations": Counter(), "latencies": deque(maxlen=500)} for name in model_names}
+
+    def _model(self, name: str, client):
+        # The caller's client serves its own tier, so replay wrappers and test doubles keep working
+        if str(getattr(client, "model_name", "")).removeprefix("models/") == name: return client
+        with self._lock:
+            if name not in self._models: self._models[name] = self._model_factory(name)
+            return self._models[name]
+
+    def _record(self, name: str, seconds: float, escalation: str | None = None):
+        with self._lock:
+            tier = self._stats[name]
+            tier["attempts"] += 1; tier["latencies"].append(seconds)
+            if escalation: tier["escalations"][escalation] += 1
+            else: tier["accepted"] += 1
+
+    def run(self, client: genai.GenerativeModel, preferences: UserPreferences, avoid_destinations: List[str] | None = None) -> Itinerary | None:
+        prompt = build_itinerary_prompt(preferences, avoid_destinations)
+        fallback, reason = None, None
+        for position, name in enumerate(self.model_names):
+            start_time = time.perf_counter()
+            model, response, error, validator = None, None, None, ItineraryResponseValidator()
+            try:
+                model = self._model(name, client)
+                response = get_gateway().generate_hedged(model, prompt, call_site=f"cascade:{name}", validate=validator, safety_settings=SAFETY_SETTINGS)
+            except Exception as e: error = e
+            itinerary, fallback, reason = self._judge(name, position, model, response, error, validator, preferences, avoid_destinations, fallback, start_time)
+            if itinerary is not None: return itinerary
+        return self._give_up(fallback, reason)
+
+    async def run_async(self, client: genai.GenerativeModel, preferences: UserPreferences, avoid_destinations: List[str] | None = None) -> Itinerary | None:
+        """Async `run`: tier requests use the gateway's async path; parsing (and repair) runs in a worker thread."""
+        prompt = build_itinerary_prompt(preferences, avoid_destinations)
+        fallback, reason = None, None
+        for position, name in enumerate(self.model_names):
+            start_time = time.perf_counter()
+            model, response, error, validator = None, None, None, ItineraryResponseValidator()
+            try:
+                model = self._model(name, client)
+                response = await get_gateway().generate_hedged_async(model, prompt, call_site=f"cascade:{name}", validate=validator, safety_settings=SAFETY_SETTINGS)
+            except Exception as e: error = e
+            itinerary, fallback, reason = await asyncio.to_thread(self._judge, name, position, model, response, error, validator, preferences, avoid_destinations, fallback, start_time)
+            if itinerary is not None: return itinerary
+        return self._give_up(fallback, reason)
+
+    def _judge(self, name: str, position: int, model, response, error: Exception | None, validator: ItineraryResponseValidator,
+               preferences: UserPreferences, avoid_destinations: List[str] | None, fallback: Itinerary | None, start_time: float) -> tuple[Itinerary | None, Itinerary | None, str | None]:
+        """Scores one tier's answer; returns (accepted itinerary or None, first valid itinerary so far, rejection reason)."""
+        last = position == len(self.model_names) - 1
+        itinerary, reason = None, None
+        try:
+            if error is not None: raise error
+            response_text = response.text if hasattr(response, 'parts') and response.parts else ""
+            if not response_text: reason = "blocked_or_empty"
+            else:
+                itinerary = validator.parsed(response) # Already parsed while picking the hedge winner
+                if itinerary is None:
+                    if last and fallback is None: itinerary = parse_itinerary_response(response_text, client=model, preferences=preferences) # Repairs and reports
+                    else: itinerary, reason = _parse_candidate(response_text)
+        except Exception as e:
+            logging.error(f"Cascade tier {name} failed: {e}")
+            reason = "api_error"
+        if itinerary is not None:
+            issues = itinerary_quality_issues(itinerary, avoid_destinations)
+            if not issues:
+                self._record(name, time.perf_counter() - start_time)
+                logging.info(f"Cascade tier {name} accepted after {time.perf_counter() - start_time:.2f}s.")
+                return itinerary, fallback, None
+            reason = f"quality:{issues[0]}"
+            if fallback is None: fallback = itinerary
+        elif last and reason is None: reason = "invalid_after_repair"
+        self._record(name, time.perf_counter() - start_time, reason)
+        logging.warning(f"Cascade tier {name} rejected ({reason}){'' if last else '; escalating'}.")
+        return None, fallback, reason
+
+    def _give_up(self, fallback: Itinerary | None, reason: str | None) -> Itinerary | None:
+        if fallback is not None: logging.info("No cascade tier met the quality bar; returning the best valid itinerary.")
+        elif reason in ("api_error", "blocked_or_empty"): _report_error("No model in the cascade produced a valid itinerary.") # Parse failures were already reported
+        return fallback
+
+    def stats(self) -> dict:
+        """Per-tier attempts, acceptance rate, escalation reasons and latency (seconds)."""
+        with self._lock:
+            result = {}
+            for name, tier in self._stats.items():
+                latencies = sorted(tier["latencies"])
+                result[name] = {"attempts": tier["attempts"], "accepted": tier["accepted"],
+                                "success_rate": (tier["accepted"] / tier["attempts"]) if tier["attempts"] else 0.0,
+                                "escalations": dict(tier["escalations"]),
+                                "latency_mean": (sum(latencies) / len(latencies)) if latencies else 0.0,
+                                "latency_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+                                "latency_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0}
+            return result
+
+
+_default_cascade: ModelCascade | None = None
+_default_cascade_loaded = False
+_default_cascade_lock = threading.Lock()
+
+def get_model_cascade() -> ModelCascade | None:
+    """Returns the process-wide cascade, or None unless ITINERARY_MODEL_CASCADE lists two or more models."""
+    global _default_cascade, _default_cascade_loaded
+    with _default_cascade_lock:
+        if not _default_cascade_loaded:
+            _default_cascade_loaded = True
+            from src.config import get_model_cascade_names, create_model_client
+            names = get_model_cascade_names()
+            if len(names) >= 2:
+                _default_cascade = ModelCascade(names, create_model_client)
+                logging.info(f"Model cascade initialized: {' -> '.join(names)}.")
+        return _default_cascade
+
+
+# --- Mode Dispatch ---
+def generate_itinerary(client: genai.GenerativeModel, preferences: UserPreferences, on_destination: Callable[[int, DestinationDetail], None] | None = None, mode: str | None = None, avoid_destinations: List[str] | None = None) -> Itinerary | None:
+    """Generates an itinerary with the configured mode ("auto", "single", "stream", "parallel" or "structured").
+
+    "auto" streams when a destination callback is given and otherwise makes a single blocking call;
+    with a model cascade configured it always uses the cascade (destinations are emitted once validated).
+    `avoid_destinations` asks the model for places other than the ones listed.
+    """
+    if mode is None:
+        from src.config import get_generation_mode
+        mode = get_generation_mode()
+    if mode == "auto" and on_destination and get_model_cascade() is not None:
+        itinerary = make_decision(client, preferences, avoid_destinations=avoid_destinations)
+        if itinerary:
+            for idx, destination in enumerate(itinerary.destinations): on_destination(idx, destination)
+        return itinerary
+    if mode == "structured":
+        return make_decision_structured(client, preferences, on_destination=on_destination, avoid_destinations=avoid_destinations)
+    if mode == "parallel":
+        return make_decision_parallel(client, preferences, on_destination=on_destination, avoid_destinations=avoid_destinations)
+    if mode == "stream" or (mode == "auto" and on_destination):
+        return make_decision_streaming(client, preferences, on_destination=on_destination, avoid_destinations=avoid_destinations)
+    return make_decision(client, preferences, avoid_destinations=avoid_destinations)
@@ -0,0 +1,70 @@
+# email_delivery.py
+# In-process Gmail sending for the travel app. "Send Email" used to run gmail/client.py in a
+# subprocess, which started server.py, reloaded the OAuth token, rebuilt the Gmail API client,
+# listed the MCP tools and ran an LLM loop only to call send-email with a recipient, subject and
+# body the app already had. Here one GmailService (token, API discovery, profile) is built per
+# process on first use, and each email is a single messages.send call. client.py remains the
+# entry point for free-form requests ("read my unread emails", drafts that need clarification).
+import asyncio
+import logging
+import threading
+import time
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class GmailSender:
+    """Long-lived GmailService shared by all sends; calls are serialized (the API client is not thread-safe).
+
+    The service never starts the interactive OAuth flow: without a usable token.json a send
+    fails straight away with a message saying how to authorize Gmail from a terminal.
+    """
+
+    def __init__(self, creds_file_path: str, token_path: str):
+        self.creds_file_path = creds_file_path
+        self.token_path = token_path
+        self._service = None
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+
+    def _get_service(self):
+        if self._service is None:
+            from src.gmail_mcp_server.gmail.server import GmailService # google-api-python-client, only needed once email is used
+            start = time.perf_counter()
+            self._service = GmailService(self.creds_file_path, self.token_path, interactive=False) # A server process can't open a browser
+            logging.info(f"Gmail service ready for {self._service.user_email} in {time.perf_counter() - start:.2f}s.")
+        return self._service
+
+    def send(self, recipient: str, subject: str, body: str) -> dict:
+        """Sends one email: {"status": "success", "message_id": ...} or {"status": "error", "error_message": ...}."""
+        with self._lock:
+            start = time.perf_counter()
+            try:
+                result = asyncio.run(self._get_service().send_email(recipient, subject, body))
+            except Exception as e: # Missing or unrefreshable token, or a network failure
+                logging.exception("Gmail send failed.")
+                self._service = None # Rebuilt (token reloaded) on the next attempt
+                result = {"status": "error", "error_message": str(e) or type(e).__name__}
+            if result.get("status") == "success":
+                self.sent += 1
+                logging.info(f"Email to {recipient} sent in {time.perf_counter() - start:.2f}s (message {result.get('message_id')}).")
+            else:
+                self.failed += 1
+                logging.error(f"Email to {recipient} failed: {result.get('error_message')}")
+            return result
+
+
+# --- Shared Default Sender ---
+_default_sender: GmailSender | None = None
+_default_sender_lock = threading.Lock()
+
+def get_gmail_sender() -> GmailSender:
+    """Returns the process-wide Gmail sender, built from config on first use."""
+    global _default_sender
+    with _default_sender_lock:
+        if _default_sender is None:
+            from src.config import get_gmail_settings
+            _default_sender = GmailSender(**get_gmail_settings())
+        return _default_sender
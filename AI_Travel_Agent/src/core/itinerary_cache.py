@@ -0,0 +1,428 @@
+# itinerary_cache.py
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable
+
+from pydantic import ValidationError
+import google.generativeai as genai # Import library for potential type hinting
+
+from src.core.perception import UserPreferences, preferences_fingerprint
+from src.core.decision_making import DestinationDetail, Itinerary, generate_itinerary, make_decision_async, make_decision_incremental, report_to_user
+from src.core.memory import get_user_memory, get_itinerary_from_history, get_itinerary_history, record_itinerary
+from src.core.preference_index import get_default_index
+from gemini_gateway import get_gateway
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class ItineraryCache:
+    """LRU + TTL cache of validated itineraries keyed by preference fingerprint.
+
+    Entries live in memory first; when `cache_dir` is set they are also written
+    to disk as JSON so they survive restarts and can be shared between processes.
+    Disk entries keep the preferences they were generated for, so the similarity
+    index can be rebuilt from them (see stored_profiles).
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 21600, cache_dir: str | None = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = cache_dir
+        self._entries: OrderedDict[str, tuple[float, Itinerary]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        logging.info(f"Itinerary cache initialized (max_entries={self.max_entries}, ttl={self.ttl_seconds}s, dir={self.cache_dir}).")
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and (time.time() - created_at) > self.ttl_seconds
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    # --- Disk Backend ---
+    def _read_from_disk(self, key: str) -> tuple[float, Itinerary] | None:
+        if not self.cache_dir: return None
+        path = self._disk_path(key)
+        if not os.path.exists(path): return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            created_at = float(payload["created_at"])
+            if self._is_expired(created_at):
+                os.remove(path)
+                return None
+            return created_at, Itinerary(**payload["itinerary"])
+        except (OSError, KeyError, ValueError, ValidationError) as e:
+            logging.warning(f"Discarding unreadable cache file {path}: {e}")
+            try: os.remove(path)
+            except OSError: pass
+            return None
+
+    def _write_to_disk(self, key: str, created_at: float, itinerary: Itinerary, preferences: UserPreferences | None = None):
+        if not self.cache_dir: return
+        path = self._disk_path(key); tmp_path = f"{path}.tmp"
+        payload = {"created_at": created_at, "itinerary": itinerary.model_dump()}
+        if preferences is not None: payload["preferences"] = preferences.model_dump()
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, path) # Atomic swap so readers never see a partial file
+        except OSError as e:
+            logging.error(f"Error writing itinerary cache file {path}: {e}")
+
+    # --- Public API ---
+    def get(self, key: str) -> Itinerary | None:
+        """Returns the cached itinerary for `key`, or None on a miss/expiry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self._is_expired(entry[0]):
+                del self._entries[key]; entry = None
+            if entry is None:
+                entry = self._read_from_disk(key)
+                if entry: self._store_in_memory(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, key: str) -> bool:
+        """True if `key` has a live entry; unlike get, doesn't count as a hit/miss or refresh recency."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not self._is_expired(entry[0]): return True
+            return self._read_from_disk(key) is not None
+
+    def set(self, key: str, itinerary: Itinerary, preferences: UserPreferences | None = None):
+        """Stores a validated itinerary under `key` (`preferences`: the profile it was generated for)."""
+        if not isinstance(itinerary, Itinerary): return
+        created_at = time.time()
+        with self._lock:
+            self._store_in_memory(key, (created_at, itinerary))
+            self._write_to_disk(key, created_at, itinerary, preferences)
+
+    def stored_profiles(self, limit: int) -> list[tuple[UserPreferences, Itinerary]]:
+        """Up to `limit` live disk entries generated for a plain profile (no avoided destinations), newest first."""
+        if not self.cache_dir: return []
+        with os.scandir(self.cache_dir) as entries:
+            files = sorted((e for e in entries if e.name.endswith(".json")), key=lambda e: e.stat().st_mtime, reverse=True)
+        profiles = []
+        for entry in files:
+            if len(profiles) >= limit: break
+            try:
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    payload = json.load(f)
+                if "preferences" not in payload or self._is_expired(float(payload["created_at"])): continue
+                preferences = UserPreferences(**payload["preferences"])
+                if preferences_fingerprint(preferences) != entry.name[:-len(".json")]: continue # Keyed with avoided destinations
+                profiles.append((preferences, Itinerary(**payload["itinerary"])))
+            except (OSError, KeyError, ValueError, ValidationError) as e:
+                logging.warning(f"Skipping unreadable cache file {entry.path}: {e}")
+        return profiles
+
+    def _store_in_memory(self, key: str, entry: tuple[float, Itinerary]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            logging.info(f"Evicted itinerary {evicted_key[:12]} from in-memory cache (LRU).")
+
+    def clear(self):
+        """Drops all in-memory entries and resets the counters (disk files are kept)."""
+        with self._lock:
+            self._entries.clear(); self.hits = 0; self.misses = 0
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the current hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": (self.hits / lookups) if lookups else 0.0, "size": len(self._entries)}
+
+
+# --- Shared Default Cache ---
+_default_cache: ItineraryCache | None = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache() -> ItineraryCache:
+    """Returns the process-wide cache, built from config on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            from src.config import get_itinerary_cache_settings
+            _default_cache = ItineraryCache(**get_itinerary_cache_settings())
+        return _default_cache
+
+
+# --- In-flight Coalescing ---
+class SingleFlight:
+    """Lets concurrent callers with the same key share one in-flight computation.
+
+    The first caller (the leader) runs the work; callers arriving before it finishes
+    wait on the leader's Future instead of issuing their own request. Futures are
+    thread-safe, so sync callers from different Streamlit sessions and async callers
+    on different event loops can all share the same flight.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def _claim(self, key: str) -> tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def _finish(self, key: str, future: Future, result=None, error: BaseException | None = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None: future.set_exception(error)
+        else: future.set_result(result)
+
+    def do(self, key: str, fn: Callable[[], object]) -> tuple[object, bool]:
+        """Runs `fn` once per key among concurrent callers. Returns (result, shared)."""
+        future, is_leader = self._claim(key)
+        if not is_leader:
+            logging.info(f"Joining in-flight request for {key[:12]}.")
+            return future.result(), True
+        try: result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e); raise
+        self._finish(key, future, result)
+        return result, False
+
+    async def do_async(self, key: str, coro_fn: Callable[[], object]) -> tuple[object, bool]:
+        """Async form of `do`: followers await the leader without holding a thread."""
+        future, is_leader = self._claim(key)
+        if not is_leader:
+            logging.info(f"Joining in-flight request for {key[:12]} (async).")
+            return await asyncio.wrap_future(future), True
+        try: result = await coro_fn()
+        except BaseException as e:
+            self._finish(key, future, error=e); raise
+        self._finish(key, future, result)
+        return result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+# Shared by the sync and async entry points so both kinds of caller coalesce together
+_in_flight = SingleFlight()
+
+def get_in_flight() -> SingleFlight:
+    """Returns the process-wide single-flight registry."""
+    return _in_flight
+
+
+def cache_key(preferences: UserPreferences, avoid_destinations: list[str] | None = None) -> str:
+    """Cache key for a profile; asking to avoid places makes it a different request."""
+    key = preferences_fingerprint(preferences)
+    if not avoid_destinations: return key
+    avoided = sorted({name.strip().lower() for name in avoid_destinations if name.strip()})
+    return hashlib.sha256(json.dumps([key, avoided]).encode("utf-8")).hexdigest()
+
+
+def make_decision_cached(client: genai.GenerativeModel, preferences: UserPreferences, cache: ItineraryCache | None = None, on_destination: Callable[[int, DestinationDetail], None] | None = None, avoid_destinations: list[str] | None = None, base: tuple[UserPreferences, Itinerary] | None = None, user_id: str | None = None, degraded: bool = False) -> Itinerary | None:
+    """Cache-aware front for itinerary generation: identical profiles skip the LLM call.
+
+    Misses go through generate_itinerary (configured mode), and concurrent misses for
+    the same profile share one request. When `on_destination` is given, hits and
+    joined requests replay the finished destinations through the same callback.
+    `base` is the (previous preferences, previous itinerary) pair the user just edited;
+    when the edit allows it, a miss only updates the affected fields of that itinerary.
+    While the Gemini circuit breaker is open a miss returns None, or with `degraded` is
+    answered by serve_degraded (`user_id` enables its fall back to that user's last itinerary).
+    Only interactive callers should ask for the stand-in: it was generated for another profile.
+    """
+    return _make_decision_cached(client, preferences, cache, on_destination, avoid_destinations, base, user_id, degraded)[0]
+
+
+def _make_decision_cached(client: genai.GenerativeModel, preferences: UserPreferences, cache: ItineraryCache | None, on_destination: Callable[[int, DestinationDetail], None] | None, avoid_destinations: list[str] | None, base: tuple[UserPreferences, Itinerary] | None, user_id: str | None, degraded: bool) -> tuple[Itinerary | None, bool]:
+    # Returns (itinerary, served_degraded) so callers never re-check the breaker, which can change state in between
+    if not isinstance(preferences, UserPreferences):
+        logging.error("Invalid preferences object received in make_decision_cached.")
+        return None, False
+    cache = cache or get_default_cache()
+    key = cache_key(preferences, avoid_destinations)
+
+    itinerary = cache.get(key)
+    stats = cache.stats()
+    if itinerary:
+        logging.info(f"Itinerary cache HIT for {key[:12]} (hit rate {stats['hit_rate']:.0%}, {stats['hits']}/{stats['hits'] + stats['misses']}).")
+        _replay(itinerary, on_destination)
+        return itinerary, False
+
+    # Near-duplicate profiles ("hiking, food" vs "food, trekking") reuse a stored itinerary
+    index = get_default_index() if not avoid_destinations else None
+    if index is not None:
+        similar = index.lookup(preferences)
+        if similar:
+            itinerary, score = similar
+            logging.info(f"Similar-preference HIT for {key[:12]} (similarity {score:.3f}). Reusing stored itinerary.")
+            cache.set(key, itinerary)
+            _replay(itinerary, on_destination)
+            return itinerary, False
+
+    if llm_unavailable(): # Fail fast instead of queueing behind a doomed call
+        return _unavailable(preferences, on_destination, user_id, degraded)
+
+    logging.info(f"Itinerary cache MISS for {key[:12]} (hit rate {stats['hit_rate']:.0%}). Calling LLM.")
+    def generate() -> Itinerary | None:
+        result = None
+        if base and not avoid_destinations:
+            from src.config import get_incremental_regeneration
+            if get_incremental_regeneration():
+                result = make_decision_incremental(client, base[0], preferences, base[1], on_destination=on_destination)
+        if result is None:
+            result = generate_itinerary(client, preferences, on_destination=on_destination, avoid_destinations=avoid_destinations)
+        if result:
+            cache.set(key, result, preferences if not avoid_destinations else None)
+            if index is not None: index.add(preferences, result, key=key)
+        return result
+
+    itinerary, shared = _in_flight.do(key, generate)
+    if shared: _replay(itinerary, on_destination)
+    if itinerary is None and llm_unavailable(): # The breaker opened during this request
+        return _unavailable(preferences, on_destination, user_id, degraded)
+    return itinerary, False
+
+
+async def make_decision_cached_async(client: genai.GenerativeModel, preferences: UserPreferences, cache: ItineraryCache | None = None, degraded: bool = False) -> Itinerary | None:
+    """Async counterpart of make_decision_cached built on make_decision_async.
+
+    Shares the cache and the in-flight registry with the sync path, so a burst of
+    identical requests from any mix of sync and async callers costs one LLM call.
+    `degraded` opts into serve_degraded while the circuit breaker is open, as for the sync path.
+    """
+    if not isinstance(preferences, UserPreferences):
+        logging.error("Invalid preferences object received in make_decision_cached_async.")
+        return None
+    cache = cache or get_default_cache()
+    key = preferences_fingerprint(preferences)
+
+    itinerary = cache.get(key)
+    if itinerary:
+        logging.info(f"Itinerary cache HIT for {key[:12]} (async).")
+        return itinerary
+
+    index = get_default_index()
+    similar = index.lookup(preferences) if index is not None else None
+    if similar:
+        logging.info(f"Similar-preference HIT for {key[:12]} (similarity {similar[1]:.3f}, async).")
+        cache.set(key, similar[0])
+        return similar[0]
+
+    if llm_unavailable(): return _unavailable(preferences, degraded=degraded)[0]
+
+    logging.info(f"Itinerary cache MISS for {key[:12]} (async). Calling LLM.")
+    async def generate() -> Itinerary | None:
+        result = await make_decision_async(client, preferences)
+        if result:
+            cache.set(key, result, preferences)
+            if index is not None: index.add(preferences, result, key=key)
+        return result
+
+    itinerary, _ = await _in_flight.do_async(key, generate)
+    if itinerary is None and llm_unavailable(): return _unavailable(preferences, degraded=degraded)[0]
+    return itinerary
+
+
+def make_decision_for_user(client: genai.GenerativeModel, user_id: str | None, preferences: UserPreferences, on_destination: Callable[[int, DestinationDetail], None] | None = None, suggest_new: bool = False, base: tuple[UserPreferences, Itinerary] | None = None) -> Itinerary | None:
+    """History-aware front used by the CLI and the app.
+
+    Unchanged preferences are served from the user's saved history. With `suggest_new`,
+    the user's recent destinations are passed to the prompt so the model picks other
+    places. `base` (the itinerary being modified) enables incremental regeneration.
+    Every generated itinerary is recorded in the history. While the LLM is unavailable a
+    stand-in from serve_degraded is returned, but not recorded.
+    """
+    record_usage(preferences)
+    if user_id and not suggest_new:
+        itinerary = get_itinerary_from_history(user_id, preferences)
+        if itinerary:
+            logging.info(f"Serving itinerary for {user_id} from history (preferences unchanged).")
+            _replay(itinerary, on_destination)
+            return itinerary
+
+    avoid_destinations = None
+    if user_id and suggest_new:
+        memory = get_user_memory(user_id)
+        avoid_destinations = memory.recent_destinations if memory else None
+    itinerary, served_degraded = _make_decision_cached(client, preferences, None, on_destination, avoid_destinations, base, user_id, degraded=True)
+    if itinerary and user_id and not served_degraded: record_itinerary(user_id, preferences, itinerary) # Stand-ins are not history
+    return itinerary
+
+
+# --- Degraded Mode (Gemini circuit breaker open) ---
+def llm_unavailable() -> bool:
+    """True while the shared Gemini gateway's circuit breaker rejects calls."""
+    return get_gateway().breaker.is_open()
+
+def _unavailable(preferences: UserPreferences, on_destination: Callable[[int, DestinationDetail], None] | None = None, user_id: str | None = None, degraded: bool = False) -> tuple[Itinerary | None, bool]:
+    if degraded:
+        itinerary = serve_degraded(preferences, on_destination, user_id)
+        return itinerary, itinerary is not None
+    logging.warning(f"LLM unavailable (circuit open for another {get_gateway().breaker.retry_after():.0f}s); not generating.")
+    return None, False
+
+def serve_degraded(preferences: UserPreferences, on_destination: Callable[[int, DestinationDetail], None] | None = None, user_id: str | None = None) -> Itinerary | None:
+    """Stand-in while the LLM is unavailable: the closest stored itinerary for the same location
+    and climate, else the user's most recent one. Never cached or recorded under this profile."""
+    index = get_default_index()
+    similar = index.closest(preferences) if index is not None else None
+    if similar:
+        itinerary = similar[0]
+        logging.info(f"LLM unavailable; serving the closest stored itinerary (activity similarity {similar[1]:.2f}).")
+    else:
+        history = get_itinerary_history(user_id, limit=1) if user_id else []
+        itinerary = history[0].itinerary if history else None
+        if itinerary: logging.info(f"LLM unavailable; serving {user_id}'s most recent itinerary.")
+    if itinerary is None:
+        logging.warning("LLM unavailable and no stored itinerary to fall back on.")
+        _report_degraded(f"The itinerary service is temporarily unavailable. Please try again in about {get_gateway().breaker.retry_after():.0f}s.")
+        return None
+    _report_degraded("The itinerary service is temporarily unavailable, so this is a saved itinerary for similar preferences. Regenerate later for a tailored one.")
+    _replay(itinerary, on_destination)
+    return itinerary
+
+def _report_degraded(message: str):
+    report_to_user(message, "warning")
+
+
+# --- Usage Log (input for the cache warmer) ---
+_usage_log_lock = threading.Lock()
+
+def record_usage(preferences: UserPreferences):
+    """Appends the requested profile to ITINERARY_USAGE_LOG (if set) so popular profiles can be pre-generated."""
+    from src.config import get_usage_log_path
+    path = get_usage_log_path()
+    if not path or not isinstance(preferences, UserPreferences): return
+    record = {"ts": time.time(), **preferences.model_dump(exclude={"name"})}
+    try:
+        with _usage_log_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        logging.warning(f"Could not append to usage log {path}: {e}")
+
+
+def _replay(itinerary: Itinerary | None, on_destination: Callable[[int, DestinationDetail], None] | None):
+    if itinerary and on_destination:
+        for idx, dest in enumerate(itinerary.destinations): on_destination(idx, dest)
@@ -1,41 +1,491 @@
-from pydantic import BaseModel
-from src.core.perception import UserPreferences # Make sure UserPreferences is importable
+from pydantic import BaseModel, ValidationError
+from src.core.perception import UserPreferences, preferences_fingerprint # Make sure UserPreferences is importable
+from src.core.decision_making import Itinerary
+from abc import ABC, abstractmethod
+from collections import OrderedDict, Counter
+import atexit
+import hashlib
+import json
 import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class UserMemory(BaseModel):
     preferences: UserPreferences
-    recent_destinations: list = [] # Could be used later
+    recent_destinations: list = [] # Destination names from this user's itineraries, most recent first
 
-# Using a simple dictionary for in-memory storage
-user_memory_store = {}
-logging.info("In-memory user store initialized.")
+# How many past destination names are kept per user (and passed to the prompt as "already suggested")
+RECENT_DESTINATIONS_LIMIT = 15
+
+
+class HistoryEntry(BaseModel):
+    """One generated itinerary kept in a user's history."""
+    content_hash: str
+    fingerprint: str
+    itinerary: Itinerary
+    created_at: float
+
+
+# --- Storage Backends ---
+class MemoryBackend(ABC):
+    """Interface for durable user memory storage. Implementations must be thread-safe."""
+
+    @abstractmethod
+    def get(self, user_id: str) -> UserMemory | None: ...
+    @abstractmethod
+    def put_many(self, items: list[tuple[str, UserMemory]]): ...
+    @abstractmethod
+    def recent(self, limit: int) -> list[tuple[str, UserMemory]]: ...
+    def prune(self, max_users: int) -> int: return 0 # Drops users beyond the cap together with their history
+    def close(self): pass
+
+    # Itinerary history: one row per (user, content hash), indexed by user and by destination name
+    @abstractmethod
+    def add_itinerary(self, user_id: str, entry: HistoryEntry) -> bool: ...
+    @abstractmethod
+    def latest_itinerary(self, user_id: str, fingerprint: str) -> HistoryEntry | None: ...
+    @abstractmethod
+    def user_history(self, user_id: str, limit: int) -> list[HistoryEntry]: ...
+    @abstractmethod
+    def find_by_destination(self, destination: str, limit: int) -> list[tuple[str, HistoryEntry]]: ...
+
+
+class InMemoryBackend(MemoryBackend):
+    """Plain dict backend: nothing survives a restart (the original behaviour)."""
+
+    def __init__(self):
+        self._data: dict[str, tuple[float, UserMemory]] = {}
+        self._history: dict[str, dict[str, HistoryEntry]] = {} # user_id -> content_hash -> entry
+        self._by_destination: dict[str, set[tuple[str, str]]] = {} # lower-cased name -> {(user_id, content_hash)}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> UserMemory | None:
+        with self._lock:
+            entry = self._data.get(user_id)
+            return entry[1] if entry else None
+
+    def put_many(self, items: list[tuple[str, UserMemory]]):
+        now = time.time()
+        with self._lock:
+            for user_id, memory in items: self._data[user_id] = (now, memory)
+
+    def recent(self, limit: int) -> list[tuple[str, UserMemory]]:
+        with self._lock:
+            ordered = sorted(self._data.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+            return [(user_id, memory) for user_id, (_, memory) in ordered]
+
+    def prune(self, max_users: int) -> int:
+        with self._lock:
+            excess = len(self._data) - max_users
+            if excess <= 0: return 0
+            for user_id, _ in sorted(self._data.items(), key=lambda item: item[1][0])[:excess]:
+                del self._data[user_id]
+                for entry in self._history.pop(user_id, {}).values():
+                    for dest in entry.itinerary.destinations:
+                        refs = self._by_destination.get(dest.name.strip().lower())
+                        if refs is None: continue
+                        refs.discard((user_id, entry.content_hash))
+                        if not refs: del self._by_destination[dest.name.strip().lower()]
+            return excess
+
+    def add_itinerary(self, user_id: str, entry: HistoryEntry) -> bool:
+        with self._lock:
+            entries = self._history.setdefault(user_id, {})
+            is_new = entry.content_hash not in entries
+            entries[entry.content_hash] = entry # A repeat refreshes created_at so it becomes the latest
+            for dest in entry.itinerary.destinations:
+                self._by_destination.setdefault(dest.name.strip().lower(), set()).add((user_id, entry.content_hash))
+            return is_new
+
+    def latest_itinerary(self, user_id: str, fingerprint: str) -> HistoryEntry | None:
+        with self._lock:
+            matches = [e for e in self._history.get(user_id, {}).values() if e.fingerprint == fingerprint]
+            return max(matches, key=lambda e: e.created_at) if matches else None
+
+    def user_history(self, user_id: str, limit: int) -> list[HistoryEntry]:
+        with self._lock:
+            return sorted(self._history.get(user_id, {}).values(), key=lambda e: e.created_at, reverse=True)[:limit]
+
+    def find_by_destination(self, destination: str, limit: int) -> list[tuple[str, HistoryEntry]]:
+        with self._lock:
+            found = [(user_id, self._history[user_id][content_hash]) for user_id, content_hash in self._by_destination.get(destination.strip().lower(), ())]
+            return sorted(found, key=lambda item: item[1].created_at, reverse=True)[:limit]
+
+
+class SQLiteBackend(MemoryBackend):
+    """Single-table SQLite store; lookups are primary-key reads, writes are batched per transaction."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL") # Readers in other processes don't block the writer
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS user_memory (user_id TEXT PRIMARY KEY, memory TEXT NOT NULL, updated_at REAL NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_user_memory_updated ON user_memory(updated_at)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS itinerary_history (user_id TEXT NOT NULL, content_hash TEXT NOT NULL, fingerprint TEXT NOT NULL, itinerary TEXT NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (user_id, content_hash))")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_history_user_fingerprint ON itinerary_history(user_id, fingerprint, created_at)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS itinerary_destinations (destination TEXT NOT NULL, user_id TEXT NOT NULL, content_hash TEXT NOT NULL, PRIMARY KEY (destination, user_id, content_hash))")
+        logging.info(f"SQLite user memory store opened at {db_path}.")
+
+    def get(self, user_id: str) -> UserMemory | None:
+        with self._lock:
+            row = self._conn.execute("SELECT memory FROM user_memory WHERE user_id = ?", (user_id,)).fetchone()
+        if not row: return None
+        try: return UserMemory.model_validate_json(row[0])
+        except ValidationError as e:
+            logging.error(f"Discarding unreadable memory row for user_id {user_id}: {e}")
+            return None
+
+    def put_many(self, items: list[tuple[str, UserMemory]]):
+        if not items: return
+        now = time.time()
+        rows = [(user_id, memory.model_dump_json(), now) for user_id, memory in items]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO user_memory (user_id, memory, updated_at) VALUES (?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK"); raise
+
+    def recent(self, limit: int) -> list[tuple[str, UserMemory]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id, memory FROM user_memory ORDER BY updated_at DESC LIMIT ?", (limit,)).fetchall()
+        result = []
+        for user_id, raw in rows:
+            try: result.append((user_id, UserMemory.model_validate_json(raw)))
+            except ValidationError: continue
+        return result
+
+    def prune(self, max_users: int) -> int:
+        """Deletes the least recently updated users beyond `max_users`, with their itinerary history."""
+        with self._lock:
+            victims = self._conn.execute("SELECT user_id FROM user_memory ORDER BY updated_at DESC LIMIT -1 OFFSET ?", (max_users,)).fetchall()
+            if not victims: return 0
+            self._conn.execute("BEGIN")
+            try:
+                for table in ("user_memory", "itinerary_history", "itinerary_destinations"):
+                    self._conn.executemany(f"DELETE FROM {table} WHERE user_id = ?", victims)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK"); raise
+            return len(victims)
+
+    def add_itinerary(self, user_id: str, entry: HistoryEntry) -> bool:
+        destinations = {(dest.name.strip().lower(), user_id, entry.content_hash) for dest in entry.itinerary.destinations}
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                cursor = self._conn.execute("UPDATE itinerary_history SET created_at = ?, fingerprint = ? WHERE user_id = ? AND content_hash = ?",
+                                            (entry.created_at, entry.fingerprint, user_id, entry.content_hash))
+                is_new = cursor.rowcount == 0
+                if is_new:
+                    self._conn.execute("INSERT INTO itinerary_history (user_id, content_hash, fingerprint, itinerary, created_at) VALUES (?, ?, ?, ?, ?)",
+                                       (user_id, entry.content_hash, entry.fingerprint, entry.itinerary.model_dump_json(), entry.created_at))
+                    self._conn.executemany("INSERT OR IGNORE INTO itinerary_destinations (destination, user_id, content_hash) VALUES (?, ?, ?)", destinations)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK"); raise
+        return is_new
+
+    def _rows_to_entries(self, rows) -> list[HistoryEntry]:
+        entries = []
+        for content_hash, fingerprint, raw, created_at in rows:
+            try: entries.append(HistoryEntry(content_hash=content_hash, fingerprint=fingerprint, itinerary=Itinerary.model_validate_json(raw), created_at=created_at))
+            except ValidationError as e: logging.error(f"Skipping unreadable history row {content_hash[:12]}: {e}")
+        return entries
+
+    def latest_itinerary(self, user_id: str, fingerprint: str) -> HistoryEntry | None:
+        with self._lock:
+            rows = self._conn.execute("SELECT content_hash, fingerprint, itinerary, created_at FROM itinerary_history WHERE user_id = ? AND fingerprint = ? ORDER BY created_at DESC LIMIT 1",
+                                      (user_id, fingerprint)).fetchall()
+        entries = self._rows_to_entries(rows)
+        return entries[0] if entries else None
+
+    def user_history(self, user_id: str, limit: int) -> list[HistoryEntry]:
+        with self._lock:
+            rows = self._conn.execute("SELECT content_hash, fingerprint, itinerary, created_at FROM itinerary_history WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+                                      (user_id, limit)).fetchall()
+        return self._rows_to_entries(rows)
+
+    def find_by_destination(self, destination: str, limit: int) -> list[tuple[str, HistoryEntry]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT h.user_id, h.content_hash, h.fingerprint, h.itinerary, h.created_at FROM itinerary_destinations d "
+                "JOIN itinerary_history h ON h.user_id = d.user_id AND h.content_hash = d.content_hash "
+                "WHERE d.destination = ? ORDER BY h.created_at DESC LIMIT ?", (destination.strip().lower(), limit)).fetchall()
+        user_ids = [row[0] for row in rows]
+        return list(zip(user_ids, self._rows_to_entries([row[1:] for row in rows])))
+
+    def close(self):
+        with self._lock: self._conn.close()
+
+
+# --- Read-through / Write-behind Front ---
+class MemoryStore:
+    """Bounded in-process cache in front of a MemoryBackend.
+
+    Reads hit the cache first and fall through to the backend; writes land in the
+    cache and a dirty set immediately and are flushed to the backend in batches by a
+    background thread. Read-modify-write changes go through `update`, which
+    serializes them so concurrent sessions don't lose each other's changes. `eviction` picks which cached entry goes when the cache is
+    full: "lru" (least recently used) or "lfu" (least frequently used). `max_users`
+    optionally caps the backend itself, dropping the least recently updated users.
+    """
+
+    def __init__(self, backend: MemoryBackend, max_entries: int = 10000, eviction: str = "lru",
+                 flush_interval: float = 2.0, flush_batch_size: int = 500, max_users: int = 0):
+        if eviction not in ("lru", "lfu"):
+            logging.warning(f"Unknown eviction policy '{eviction}'. Using 'lru'.")
+            eviction = "lru"
+        self.backend = backend
+        self.max_entries = max(1, max_entries)
+        self.eviction = eviction
+        self.flush_interval = flush_interval
+        self.flush_batch_size = max(1, flush_batch_size)
+        self.max_users = max_users
+        self._cache: OrderedDict[str, UserMemory] = OrderedDict()
+        self._uses: Counter = Counter()
+        self._dirty: dict[str, UserMemory] = {}
+        self._in_flight: dict[str, UserMemory] = {} # The batch being written; still newer than the backend
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="memory-write-behind", daemon=True)
+        self._flusher.start()
+
+    def get(self, user_id: str) -> UserMemory | None:
+        with self._lock:
+            memory = self._cache.get(user_id)
+            if memory is not None:
+                self._touch(user_id)
+                return memory
+            memory = self._dirty.get(user_id) or self._in_flight.get(user_id) # Evicted from the cache before its write landed
+            if memory is not None:
+                self._admit(user_id, memory)
+                return memory
+        memory = self.backend.get(user_id)
+        if memory is not None:
+            with self._lock:
+                if user_id not in self._cache: self._admit(user_id, memory) # A concurrent put wins
+                else: memory = self._cache[user_id]
+        return memory
+
+    def put(self, user_id: str, memory: UserMemory):
+        with self._lock:
+            if user_id in self._cache: self._cache[user_id] = memory; self._touch(user_id)
+            else: self._admit(user_id, memory)
+            self._dirty.pop(user_id, None); self._dirty[user_id] = memory # Keeps _dirty in update order
+            pending = len(self._dirty)
+        if pending >= self.flush_batch_size: self._wake.set()
+
+    def update(self, user_id: str, change: Callable[[UserMemory | None], UserMemory]) -> UserMemory:
+        """Atomically replaces the user's memory with `change(current memory or None)`."""
+        with self._update_lock:
+            memory = change(self.get(user_id))
+            self.put(user_id, memory)
+            return memory
+
+    def recent(self, limit: int = 20) -> list[tuple[str, UserMemory]]:
+        """Most recently updated users: pending writes (newest first), then the backend's."""
+        with self._lock:
+            in_flight = [(user_id, memory) for user_id, memory in reversed(self._in_flight.items()) if user_id not in self._dirty]
+            pending = (list(reversed(self._dirty.items())) + in_flight)[:limit]
+        pending_ids = {user_id for user_id, _ in pending}
+        stored = [(user_id, memory) for user_id, memory in self.backend.recent(limit + len(pending)) if user_id not in pending_ids]
+        return (pending + stored)[:limit]
+
+    def flush(self) -> int:
+        """Writes all pending changes to the backend in one batch. Returns the number written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._dirty = list(self._dirty.items()), {}
+                self._in_flight = dict(batch) # Readers see it until the backend has it
+            if not batch: return 0
+            try:
+                self.backend.put_many(batch)
+            except Exception as e:
+                logging.error(f"Error flushing {len(batch)} user memory records: {e}")
+                with self._lock: # Re-queue anything not overwritten since, so it is retried
+                    for user_id, memory in batch: self._dirty.setdefault(user_id, memory)
+                    self._in_flight = {}
+                return 0
+            with self._lock: self._in_flight = {}
+            if self.max_users > 0:
+                pruned = self.backend.prune(self.max_users)
+                if pruned: logging.info(f"Pruned {pruned} least recently updated users from memory store.")
+            return len(batch)
+
+    def close(self):
+        if self._closed: return
+        self._closed = True; self._wake.set()
+        self._flusher.join(timeout=5)
+        self.flush(); self.backend.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"cached": len(self._cache), "pending_writes": len(self._dirty) + len(self._in_flight), "eviction": self.eviction}
+
+    # --- Internals (call with self._lock held) ---
+    def _touch(self, user_id: str):
+        if self.eviction == "lru": self._cache.move_to_end(user_id)
+        else: self._uses[user_id] += 1
+
+    def _admit(self, user_id: str, memory: UserMemory):
+        while len(self._cache) >= self.max_entries:
+            if self.eviction == "lru": victim, _ = self._cache.popitem(last=False)
+            else:
+                victim = min(self._cache, key=lambda uid: self._uses[uid])
+                del self._cache[victim]
+            self._uses.pop(victim, None)
+        self._cache[user_id] = memory
+        self._uses[user_id] = 1
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval); self._wake.clear()
+            self.flush()
+
+
+def create_memory_store(settings: dict) -> MemoryStore:
+    """Builds a MemoryStore from the dict returned by config.get_user_memory_settings()."""
+    backend = SQLiteBackend(settings["db_path"]) if settings["backend"] == "sqlite" else InMemoryBackend()
+    return MemoryStore(backend, max_entries=settings["cache_entries"], eviction=settings["eviction"],
+                       flush_interval=settings["flush_interval"], flush_batch_size=settings["flush_batch_size"],
+                       max_users=settings["max_users"])
+
+
+# --- Shared Store ---
+# One store per process, shared by the CLI and every Streamlit session
+_memory_store: MemoryStore | None = None
+_memory_store_lock = threading.Lock()
+
+def get_memory_store() -> MemoryStore:
+    """Returns the process-wide memory store, built from config on first use."""
+    global _memory_store
+    with _memory_store_lock:
+        if _memory_store is None:
+            from src.config import get_user_memory_settings
+            _memory_store = create_memory_store(get_user_memory_settings())
+            atexit.register(_memory_store.close) # Don't lose the last write-behind batch on exit
+            logging.info("User memory store initialized.")
+        return _memory_store
 
 def store_user_preferences(user_id: str, prefs: UserPreferences):
-    """Stores user preferences in the in-memory dictionary."""
+    """Stores user preferences in the shared memory store."""
     logging.info(f"Attempting to store preferences for user_id: {user_id}")
     if not isinstance(prefs, UserPreferences):
          logging.error(f"Invalid data type for prefs: {type(prefs)}. Expected UserPreferences.")
          return
     try:
-        user_memory_store[user_id] = UserMemory(preferences=prefs)
+        get_memory_store().update(user_id, lambda existing: UserMemory(preferences=prefs, recent_destinations=existing.recent_destinations if existing else []))
         logging.info(f"Preferences successfully stored for user_id: {user_id}")
     except Exception as e:
         logging.error(f"Error storing preferences for user_id {user_id}: {e}")
 
+def get_user_memory(user_id: str) -> UserMemory | None:
+    """Retrieves the full memory record (preferences and history) for a user."""
+    try:
+        return get_memory_store().get(user_id)
+    except Exception as e:
+        logging.error(f"Error retrieving memory for user_id {user_id}: {e}")
+        return None
+
 def get_user_preferences(user_id: str) -> UserPreferences | None:
-    """Retrieves user preferences from the in-memory dictionary."""
+    """Retrieves user preferences from the shared memory store."""
     logging.info(f"Attempting to retrieve preferences for user_id: {user_id}")
+    memory = get_user_memory(user_id)
+    if memory and isinstance(memory, UserMemory):
+        logging.info(f"Preferences found and retrieved for user_id: {user_id}")
+        return memory.preferences
+    logging.warning(f"No preferences found or invalid data for user_id: {user_id}")
+    return None
+
+def list_recent_users(limit: int = 20) -> list[tuple[str, UserMemory]]:
+    """Returns the most recently updated users as (user_id, UserMemory) pairs."""
     try:
-        memory = user_memory_store.get(user_id)
-        if memory and isinstance(memory, UserMemory):
-            logging.info(f"Preferences found and retrieved for user_id: {user_id}")
-            return memory.preferences
-        else:
-            logging.warning(f"No preferences found or invalid data for user_id: {user_id}")
-            return None
+        return get_memory_store().recent(limit)
+    except Exception as e:
+        logging.error(f"Error listing users from memory store: {e}")
+        return []
+
+def list_profile_itineraries(limit: int = 1000) -> list[tuple[UserPreferences, Itinerary]]:
+    """(saved preferences, latest itinerary for them) of the most recently updated users, newest first."""
+    store = get_memory_store()
+    profiles = []
+    for user_id, memory in store.recent(limit):
+        entry = store.backend.latest_itinerary(user_id, preferences_fingerprint(memory.preferences))
+        if entry: profiles.append((memory.preferences, entry.itinerary))
+    return profiles
+
+
+# --- Itinerary History ---
+def itinerary_content_hash(itinerary: Itinerary) -> str:
+    """Stable hash of an itinerary's content, used to de-duplicate history entries."""
+    canonical = json.dumps(itinerary.model_dump(), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _merge_recent_destinations(new_names: list[str], previous: list) -> list[str]:
+    merged, seen = [], set()
+    for name in list(new_names) + list(previous):
+        key = str(name).strip().lower()
+        if key and key not in seen: seen.add(key); merged.append(str(name).strip())
+    return merged[:RECENT_DESTINATIONS_LIMIT]
+
+def record_itinerary(user_id: str, preferences: UserPreferences, itinerary: Itinerary) -> bool:
+    """Saves a generated itinerary to the user's history and updates recent_destinations.
+
+    Returns True when the itinerary was new, False when an identical one was already stored.
+    """
+    if not user_id or not isinstance(itinerary, Itinerary): return False
+    try:
+        store = get_memory_store()
+        entry = HistoryEntry(content_hash=itinerary_content_hash(itinerary), fingerprint=preferences_fingerprint(preferences), itinerary=itinerary, created_at=time.time())
+        is_new = store.backend.add_itinerary(user_id, entry)
+        names = [d.name for d in itinerary.destinations]
+        # Keep the saved profile: the CLI can regenerate with temporarily modified preferences
+        store.update(user_id, lambda existing: UserMemory(preferences=existing.preferences if existing else preferences,
+                                                          recent_destinations=_merge_recent_destinations(names, existing.recent_destinations if existing else [])))
+        logging.info(f"{'Saved' if is_new else 'Refreshed duplicate'} itinerary {entry.content_hash[:12]} in history for user_id: {user_id}")
+        return is_new
+    except Exception as e:
+        logging.error(f"Error recording itinerary for user_id {user_id}: {e}")
+        return False
+
+def get_itinerary_from_history(user_id: str, preferences: UserPreferences) -> Itinerary | None:
+    """Returns the user's most recent itinerary generated for these exact preferences, if any."""
+    if not user_id: return None
+    try:
+        entry = get_memory_store().backend.latest_itinerary(user_id, preferences_fingerprint(preferences))
+        return entry.itinerary if entry else None
+    except Exception as e:
+        logging.error(f"Error reading itinerary history for user_id {user_id}: {e}")
+        return None
+
+def get_itinerary_history(user_id: str, limit: int = 20) -> list[HistoryEntry]:
+    """Returns the user's saved itineraries, newest first."""
+    try:
+        return get_memory_store().backend.user_history(user_id, limit)
+    except Exception as e:
+        logging.error(f"Error reading itinerary history for user_id {user_id}: {e}")
+        return []
+
+def find_itineraries_by_destination(destination: str, limit: int = 20) -> list[tuple[str, HistoryEntry]]:
+    """Returns (user_id, entry) pairs for saved itineraries that include `destination` (case-insensitive)."""
+    try:
+        return get_memory_store().backend.find_by_destination(destination, limit)
     except Exception as e:
-        logging.error(f"Error retrieving preferences for user_id {user_id}: {e}")
-        return None
\ No newline at end of file
+        logging.error(f"Error searching itinerary history for {destination}: {e}")
+        return []
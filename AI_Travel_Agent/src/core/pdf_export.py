@@ -0,0 +1,220 @@
+# pdf_export.py
+# Bulk PDF export: renders many stored itineraries on a process pool and streams each PDF into a
+# ZIP archive or one merged PDF as soon as it is ready. At most a small window of documents is in
+# flight, so memory stays flat whether a run exports a dozen itineraries or several thousand.
+# Every document has a time budget; one that overruns it is skipped and reported, not fatal.
+import json
+import logging
+import os
+import re
+import signal
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from src.core.perception import UserPreferences
+from src.core.decision_making import Itinerary
+from src.core.render import build_document, emit_pdf
+from src.core.pdf_service import warm_pdf_worker
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+EXPORT_FORMATS = ("zip", "pdf")
+
+
+class ExportItem(NamedTuple):
+    name: str # File name stem inside the archive
+    itinerary: Itinerary
+    preferences: UserPreferences | None = None
+
+
+class RenderTimeout(TimeoutError):
+    """A document took longer than its time budget to render."""
+
+
+# --- Sources ---
+def iter_batch_output(path: str) -> Iterator[ExportItem]:
+    """Streams the itineraries written by batch.py (one JSON record per line)."""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip(): continue
+            try:
+                record = json.loads(line)
+                preferences = UserPreferences(**record["preferences"]) if record.get("preferences") else None
+                yield ExportItem(str(record.get("id") or line_number), Itinerary(**record["itinerary"]), preferences)
+            except (ValueError, KeyError, TypeError) as e: # Includes pydantic's ValidationError and a torn last line
+                logging.error(f"Skipping line {line_number} of {path}: {e}")
+
+def iter_user_histories(user_ids: Iterable[str], per_user: int = 1) -> Iterator[ExportItem]:
+    """Streams the latest `per_user` saved itineraries of each user, rendered with the user's saved preferences."""
+    from src.core.memory import get_itinerary_history, get_user_preferences
+    for user_id in user_ids:
+        preferences = get_user_preferences(user_id)
+        for n, entry in enumerate(get_itinerary_history(user_id, per_user)):
+            yield ExportItem(user_id if n == 0 else f"{user_id}_{n + 1}", entry.itinerary, preferences)
+
+def count_lines(path: str) -> int:
+    with open(path, "rb") as f: return sum(1 for line in f if line.strip())
+
+
+# --- Worker ---
+_WORKER_TIMER = hasattr(signal, "setitimer") # POSIX: the worker interrupts itself when over budget
+
+def _on_budget_exceeded(signum, frame):
+    raise RenderTimeout("Time budget exceeded.")
+
+def _render_export_item(item: ExportItem, time_budget: float) -> bytes:
+    # Runs in a pool process (its main thread), so the interval timer only affects this document
+    if _WORKER_TIMER and time_budget > 0:
+        signal.signal(signal.SIGALRM, _on_budget_exceeded); signal.setitimer(signal.ITIMER_REAL, time_budget)
+    try:
+        return emit_pdf(build_document(item.itinerary, item.preferences, key=item.name))
+    finally:
+        if _WORKER_TIMER and time_budget > 0: signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+# --- Sinks ---
+class ZipSink:
+    """Writes each PDF as its own archive member; only the central directory stays in memory."""
+
+    def __init__(self, path: str):
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) # PDF streams are already compressed
+        self._names: set[str] = set()
+
+    def add(self, name: str, pdf_bytes: bytes):
+        stem = re.sub(r"[^\w.-]+", "_", name).strip("._") or "itinerary"
+        member, n = f"{stem}.pdf", 1
+        while member in self._names: n += 1; member = f"{stem}_{n}.pdf"
+        self._names.add(member)
+        self._zip.writestr(member, pdf_bytes)
+
+    def close(self):
+        self._zip.close()
+
+
+class MergedPdfSink:
+    """Concatenates PDFs into one file while streaming them to disk.
+
+    Each input's objects are copied through with renumbered references (stream bodies are copied
+    as-is, located via their /Length), and its page tree becomes a child of the merged one, so
+    inherited page attributes keep working. Only object offsets are kept in memory. Inputs must be
+    classic-xref PDFs with direct stream lengths, which is what fpdf2 writes.
+    """
+
+    _OBJECT = re.compile(rb"(\d+) 0 obj\s*")
+    _STREAM = re.compile(rb">>\s*stream\r?\n")
+    _REF = re.compile(rb"(\d+) 0 R\b")
+    _LENGTH = re.compile(rb"/Length (\d+)\b")
+    ROOT_PAGES, CATALOG = 1, 2
+
+    def __init__(self, path: str):
+        self._file = open(path, "wb")
+        self._file.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        self._offsets: dict[int, int] = {}
+        self._next = 3
+        self._kids: list[int] = []
+        self._page_count = 0
+
+    def _objects(self, pdf: bytes) -> Iterator[tuple[int, bytes, bytes | None]]:
+        pos = 0
+        while True:
+            match = self._OBJECT.search(pdf, pos)
+            if not match: return
+            start = match.end(); end = pdf.find(b"endobj", start)
+            stream = self._STREAM.search(pdf, start, end)
+            if stream is None:
+                yield int(match.group(1)), pdf[start:end].rstrip(), None; pos = end + 6
+                continue
+            header = pdf[start:stream.start() + 2]
+            length = self._LENGTH.search(header)
+            if length is None: raise ValueError(f"Object {match.group(1).decode()} has no direct stream /Length.")
+            data_end = stream.end() + int(length.group(1))
+            yield int(match.group(1)), header, pdf[stream.end():data_end]
+            pos = pdf.find(b"endobj", data_end) + 6
+
+    def add(self, name: str, pdf_bytes: bytes):
+        trailer = pdf_bytes[pdf_bytes.rfind(b"trailer"):]
+        root, info = re.search(rb"/Root (\d+) 0 R", trailer), re.search(rb"/Info (\d+) 0 R", trailer)
+        if root is None: raise ValueError(f"{name}: no document catalog.")
+        skip = {int(root.group(1))} | ({int(info.group(1))} if info else set()) # The merged file has its own catalog
+        base = self._next
+        objects = list(self._objects(pdf_bytes)) # Holds only the current document
+        catalog = next(header for number, header, _ in objects if number == int(root.group(1)))
+        pages = int(re.search(rb"/Pages (\d+) 0 R", catalog).group(1))
+        renumber = lambda m: b"%d 0 R" % (base + int(m.group(1)))
+        for number, header, data in objects:
+            if number in skip: continue
+            header = self._REF.sub(renumber, header)
+            if number == pages:
+                self._page_count += int(re.search(rb"/Count (\d+)", header).group(1))
+                header = header.replace(b"/Type /Pages", b"/Type /Pages\n/Parent %d 0 R" % self.ROOT_PAGES, 1)
+            self._write(base + number, header, data)
+        self._kids.append(base + pages)
+        self._next = base + max(number for number, _, _ in objects) + 1
+
+    def _write(self, number: int, header: bytes, data: bytes | None = None):
+        self._offsets[number] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % number + header)
+        if data is not None: self._file.write(b"\nstream\n" + data + b"\nendstream")
+        self._file.write(b"\nendobj\n")
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % kid for kid in self._kids)
+        self._write(self.ROOT_PAGES, b"<<\n/Type /Pages\n/Kids [%s]\n/Count %d\n>>" % (kids, self._page_count))
+        self._write(self.CATALOG, b"<<\n/Type /Catalog\n/Pages %d 0 R\n>>" % self.ROOT_PAGES)
+        xref_at, size = self._file.tell(), self._next
+        entries = [b"0000000000 65535 f \n"] + [b"%010d 00000 n \n" % self._offsets[n] if n in self._offsets else b"0000000000 65535 f \n" for n in range(1, size)]
+        self._file.write(b"xref\n0 %d\n" % size + b"".join(entries))
+        self._file.write(b"trailer\n<<\n/Size %d\n/Root %d 0 R\n>>\nstartxref\n%d\n%%%%EOF\n" % (size, self.CATALOG, xref_at))
+        self._file.close()
+
+
+# --- Export ---
+def export_pdfs(items: Iterable[ExportItem], output_path: str, fmt: str | None = None, max_workers: int | None = None,
+                time_budget: float = 30.0, total: int | None = None,
+                on_progress: Callable[[int, int | None, str, str | None], None] | None = None) -> dict:
+    """Renders `items` on a process pool into a ZIP (one PDF per item) or one merged PDF.
+
+    `fmt` defaults to the extension of `output_path`. Documents are written in input order; at
+    most 2 x workers are rendered or waiting at once. `time_budget` is seconds per document (0 = none).
+    `on_progress(done, total, name, error)` is called after every document.
+    """
+    fmt = fmt or os.path.splitext(output_path)[1].lstrip(".").lower()
+    if fmt not in EXPORT_FORMATS: raise ValueError(f"Unknown export format '{fmt}', expected one of {EXPORT_FORMATS}.")
+    max_workers = max(1, max_workers or os.cpu_count() or 2)
+    stats = {"exported": 0, "failed": 0, "timed_out": 0}
+    sink = ZipSink(output_path) if fmt == "zip" else MergedPdfSink(output_path)
+    start_time = time.perf_counter()
+
+    def drain(window: deque):
+        name, future = window.popleft(); error = None
+        try:
+            # Without a worker-side timer, wait at most the budget once this is the oldest document
+            pdf_bytes = future.result(timeout=None if _WORKER_TIMER or not time_budget else time_budget)
+            sink.add(name, pdf_bytes)
+            stats["exported"] += 1
+        except (RenderTimeout, FutureTimeout):
+            future.cancel(); error = f"exceeded the {time_budget:g}s time budget"; stats["timed_out"] += 1
+        except Exception as e:
+            error = str(e) or type(e).__name__; stats["failed"] += 1
+        if error: logging.error(f"Export of {name} skipped: {error}")
+        if on_progress: on_progress(stats["exported"] + stats["failed"] + stats["timed_out"], total, name, error)
+
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=warm_pdf_worker) as pool:
+            window: deque = deque()
+            for item in items:
+                window.append((item.name, pool.submit(_render_export_item, item, time_budget)))
+                if len(window) >= 2 * max_workers: drain(window)
+            while window: drain(window)
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - start_time
+    stats["elapsed_seconds"] = round(elapsed, 2)
+    stats["documents_per_second"] = round(stats["exported"] / elapsed, 2) if elapsed > 0 else 0.0
+    logging.info(f"Export to {output_path} finished: {stats}")
+    return stats
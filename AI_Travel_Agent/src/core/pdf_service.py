@@ -0,0 +1,118 @@
+# pdf_service.py
+# Renders itinerary PDFs on a worker pool instead of inside the Streamlit script. Requests are
+# keyed by document_key (itinerary content hash + preferences), so the download button and
+# "Send to Telegram" share one render, a repeat request returns cached bytes, and a request for a
+# PDF that is still rendering joins it. Workers resolve the Unicode font once per process.
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.core.perception import UserPreferences
+from src.core.decision_making import Itinerary
+from src.core.render import ItineraryDoc, emit_pdf, get_default_renderer, pdf_unicode_fonts
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def warm_pdf_worker():
+    """Pool initializer: import fpdf and resolve the PDF fonts before the first request."""
+    import fpdf # noqa: F401
+    pdf_unicode_fonts()
+
+def _render_pdf(doc: ItineraryDoc) -> bytes: # Runs in a worker; ItineraryDoc is plain tuples, so it pickles cheaply
+    return emit_pdf(doc)
+
+
+class PdfRenderService:
+    """LRU cache of rendered PDFs in front of a process (or thread) pool."""
+
+    def __init__(self, max_workers: int = 2, max_entries: int = 128, use_processes: bool = True):
+        self.max_workers = max(1, max_workers)
+        self.max_entries = max(1, max_entries)
+        self.use_processes = use_processes
+        self._executor = self._make_executor()
+        self._cache: OrderedDict[str, bytes] = OrderedDict()
+        self._in_flight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.joined = 0
+        self.renders = 0
+        self.failures = 0
+        logging.info(f"PDF render service initialized ({self.max_workers} {'processes' if self.use_processes else 'threads'}, max_entries={self.max_entries}).")
+
+    def _make_executor(self):
+        if self.use_processes:
+            # Never fork: the pool starts lazily inside the threaded Streamlit server, and a forked
+            # worker can inherit a lock (logging, the gateway, SQLite) held by another thread and hang
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            return ProcessPoolExecutor(max_workers=self.max_workers, initializer=warm_pdf_worker, mp_context=multiprocessing.get_context(method))
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pdf-render", initializer=warm_pdf_worker)
+
+    def _start(self, doc: ItineraryDoc) -> Future:
+        try:
+            return self._executor.submit(_render_pdf, doc)
+        except (BrokenProcessPool, RuntimeError) as e: # A killed worker breaks the whole process pool
+            logging.warning(f"PDF worker pool unavailable ({e}); continuing with threads.")
+            self.use_processes = False; self._executor = self._make_executor()
+            return self._executor.submit(_render_pdf, doc)
+
+    def cached(self, itinerary: Itinerary, preferences: UserPreferences | None = None) -> bytes | None:
+        """The PDF if it has already been rendered, without waiting or starting a render."""
+        key = get_default_renderer().document(itinerary, preferences).key
+        with self._lock: return self._cache.get(key)
+
+    def submit(self, itinerary: Itinerary | ItineraryDoc, preferences: UserPreferences | None = None) -> Future:
+        """Starts rendering in the background (if needed) and returns a Future of the PDF bytes."""
+        doc = itinerary if isinstance(itinerary, ItineraryDoc) else get_default_renderer().document(itinerary, preferences)
+        with self._lock:
+            pdf_bytes = self._cache.get(doc.key)
+            if pdf_bytes is not None:
+                self._cache.move_to_end(doc.key); self.hits += 1
+                done = Future(); done.set_result(pdf_bytes)
+                return done
+            future = self._in_flight.get(doc.key)
+            if future is not None: self.joined += 1; return future
+            future = self._in_flight[doc.key] = self._start(doc)
+        future.add_done_callback(lambda f, key=doc.key: self._finish(key, f))
+        return future
+
+    def _finish(self, key: str, future: Future):
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                self.failures += 1
+                logging.error(f"PDF render {key[:12]} failed: {None if future.cancelled() else future.exception()}")
+                return
+            self.renders += 1
+            self._cache[key] = future.result(); self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries: self._cache.popitem(last=False)
+
+    def render(self, itinerary: Itinerary | ItineraryDoc, preferences: UserPreferences | None = None, timeout: float | None = 60) -> bytes:
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(itinerary, preferences).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"cached": len(self._cache), "in_flight": len(self._in_flight), "hits": self.hits,
+                    "joined": self.joined, "renders": self.renders, "failures": self.failures}
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# --- Shared Default Service ---
+_default_service: PdfRenderService | None = None
+_default_service_lock = threading.Lock()
+
+def get_default_pdf_service() -> PdfRenderService:
+    """Returns the process-wide PDF render service, built from config on first use."""
+    global _default_service
+    with _default_service_lock:
+        if _default_service is None:
+            from src.config import get_pdf_render_settings
+            _default_service = PdfRenderService(**get_pdf_render_settings())
+        return _default_service
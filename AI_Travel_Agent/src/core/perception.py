@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 from typing import List
+import hashlib
+import json
 import logging
 
 # Configure basic logging (can be configured once in main.py if preferred)
@@ -13,6 +15,44 @@ class UserPreferences(BaseModel):
     budget: str
     travel_pace: str
 
+def preferences_fingerprint(preferences: UserPreferences) -> str:
+    """Returns a stable hash of the preferences that shape an itinerary.
+
+    The name is ignored (it never reaches the prompt), strings are stripped and
+    lower-cased, and activities are de-duplicated and sorted so that
+    "Food, Art" and "art, food" map to the same key.
+    """
+    normalized = {
+        "location": preferences.location.strip().lower(),
+        "climate_preference": preferences.climate_preference.strip().lower(),
+        "activity_preferences": sorted({a.strip().lower() for a in preferences.activity_preferences if a.strip()}),
+        "budget": preferences.budget.strip().lower(),
+        "travel_pace": preferences.travel_pace.strip().lower(),
+    }
+    canonical = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def preferences_from_record(record: dict, record_id: str) -> UserPreferences:
+    """Builds preferences from a JSONL/CSV record (batch input, warm profiles); `record_id` is the fallback name.
+
+    Raises ValueError when a field is missing or empty.
+    """
+    activities = record.get("activity_preferences") or []
+    if isinstance(activities, str): # CSV cells hold "hiking, food" or "hiking;food"
+        activities = activities.replace(";", ",").split(",")
+    prefs = UserPreferences(
+        name=(record.get("name") or record_id).strip(),
+        location=str(record.get("location", "")).strip(),
+        climate_preference=str(record.get("climate_preference", "")).strip().lower(),
+        activity_preferences=[str(a).strip().lower() for a in activities if str(a).strip()],
+        budget=str(record.get("budget", "")).strip().lower(),
+        travel_pace=str(record.get("travel_pace", "")).strip().lower(),
+    )
+    # Same rule as the interactive collectors: every field must be filled in
+    if not all([prefs.location, prefs.climate_preference, prefs.activity_preferences, prefs.budget, prefs.travel_pace]):
+        raise ValueError("One or more preference fields are empty.")
+    return prefs
+
 def collect_user_preferences() -> UserPreferences | None:
     logging.info("Entering 'collect_user_preferences' function.")
     try:
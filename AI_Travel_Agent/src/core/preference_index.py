@@ -0,0 +1,231 @@
+# preference_index.py
+# Near-duplicate lookup over past UserPreferences -> Itinerary pairs. Profiles are embedded
+# locally (no API call) and compared with a NumPy dot product, so "hiking, food" and
+# "food, trekking" can reuse the same itinerary.
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError: # The index is an optimisation; without NumPy every miss simply goes to the LLM
+    np = None
+
+from src.core.perception import UserPreferences, preferences_fingerprint
+from src.core.decision_making import Itinerary
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+# --- Embedding ---
+# Activity words that describe the same kind of trip; mapped to one canonical token. Only true
+# synonyms belong here: "walking" is not hiking and "swimming" can be a pool, not a beach.
+ACTIVITY_SYNONYMS = {
+    "trekking": "hiking", "trek": "hiking", "treks": "hiking", "hikes": "hiking", "hike": "hiking", "trails": "hiking",
+    "foodie": "food", "cuisine": "food", "eating": "food", "culinary": "food", "gastronomy": "food", "dining": "food", "restaurants": "food",
+    "museums": "museum", "galleries": "art", "gallery": "art", "arts": "art",
+    "beaches": "beach", "seaside": "beach",
+    "nightclubs": "nightlife", "clubbing": "nightlife", "bars": "nightlife",
+    "shops": "shopping", "markets": "shopping",
+    "historical": "history", "heritage": "history", "ruins": "history",
+    "skiing": "ski", "snowboarding": "ski", "diving": "dive", "scuba": "dive", "snorkeling": "dive", "snorkelling": "dive",
+    "wildlife": "nature", "safari": "nature", "parks": "nature", "outdoors": "nature",
+}
+
+# Location, climate, budget and pace must match exactly (they are the partition key); only the
+# free-text activities are embedded. Each canonical activity token sets two hashed buckets, so two
+# different tokens almost never end up with identical vectors.
+EMBEDDING_DIM = 128
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _buckets(token: str) -> tuple[int, int]:
+    # Stable across processes (unlike hash())
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+    first = int.from_bytes(digest[:4], "little") % EMBEDDING_DIM
+    second = int.from_bytes(digest[4:], "little") % (EMBEDDING_DIM - 1)
+    return first, second + (second >= first) # Never the same bucket twice
+
+def _canonical_word(word: str) -> str:
+    word = ACTIVITY_SYNONYMS.get(word, word)
+    if len(word) > 4 and word.endswith("s") and not word.endswith("ss"): word = ACTIVITY_SYNONYMS.get(word[:-1], word[:-1])
+    return word
+
+def _activity_tokens(activities: list[str]) -> list[str]:
+    tokens = set()
+    for activity in activities:
+        tokens.update(_canonical_word(w) for w in _WORD.findall(activity.lower()))
+    return sorted(tokens)
+
+def partition_key(preferences: UserPreferences) -> tuple[str, str, str, str]:
+    """The fields that must match exactly for two profiles to share an itinerary."""
+    return (preferences.location.strip().lower(), preferences.climate_preference.strip().lower(),
+            preferences.budget.strip().lower(), preferences.travel_pace.strip().lower())
+
+def embed_preferences(preferences: UserPreferences):
+    """Returns the unit-length float32 embedding of a profile's activities."""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for token in _activity_tokens(preferences.activity_preferences):
+        for bucket in _buckets(token): vector[bucket] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+# --- Index ---
+class _Partition:
+    """Contiguous float32 rows for one partition key; grows by doubling, removes by swapping in the last row."""
+
+    def __init__(self):
+        self.vectors = np.zeros((8, EMBEDDING_DIM), dtype=np.float32)
+        self.keys: list[str] = []
+
+    def append(self, key: str, vector) -> int:
+        row = len(self.keys)
+        if row == len(self.vectors):
+            grown = np.zeros((len(self.vectors) * 2, EMBEDDING_DIM), dtype=np.float32)
+            grown[:row] = self.vectors; self.vectors = grown
+        self.vectors[row] = vector; self.keys.append(key)
+        return row
+
+    def remove(self, row: int) -> str | None:
+        """Removes `row`; returns the key that moved into it (if any)."""
+        last = len(self.keys) - 1
+        moved = None
+        if row != last:
+            self.vectors[row] = self.vectors[last]; self.keys[row] = self.keys[last]; moved = self.keys[row]
+        self.keys.pop()
+        return moved
+
+
+class PreferenceIndex:
+    """Cosine nearest-neighbour index over activity embeddings, partitioned by the exact fields.
+
+    A search is one matrix-vector product over the (small) partition that shares the
+    query's location, climate, budget and pace. Re-adding a profile with the same
+    fingerprint replaces its entry; past `max_entries` the oldest entry is dropped.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 50000):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self._partitions: dict[tuple, _Partition] = {}
+        self._locations: dict[str, tuple[tuple, int]] = {} # key -> (partition key, row)
+        self._items: OrderedDict[str, Itinerary | None] = OrderedDict() # Insertion order = eviction order
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def nbytes(self) -> int:
+        return sum(p.vectors.nbytes for p in self._partitions.values())
+
+    def add(self, preferences: UserPreferences, itinerary: Itinerary | None, key: str | None = None):
+        """Stores an itinerary under the preference embedding (`key` defaults to the fingerprint)."""
+        key = key or preferences_fingerprint(preferences)
+        part_key, vector = partition_key(preferences), embed_preferences(preferences)
+        with self._lock:
+            if key in self._items: self._remove(key)
+            while len(self._items) >= self.max_entries: self._remove(next(iter(self._items)))
+            partition = self._partitions.setdefault(part_key, _Partition())
+            self._locations[key] = (part_key, partition.append(key, vector))
+            self._items[key] = itinerary
+
+    def _remove(self, key: str):
+        part_key, row = self._locations.pop(key)
+        del self._items[key]
+        partition = self._partitions[part_key]
+        moved = partition.remove(row)
+        if moved: self._locations[moved] = (part_key, row)
+        if not partition.keys: del self._partitions[part_key]
+
+    def search(self, preferences: UserPreferences, k: int = 1) -> list[tuple[float, str]]:
+        """Returns up to `k` (similarity, key) pairs from the matching partition, most similar first."""
+        query = embed_preferences(preferences)
+        with self._lock:
+            partition = self._partitions.get(partition_key(preferences))
+            if partition is None: return []
+            count = len(partition.keys)
+            scores = partition.vectors[:count] @ query
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1)[:k] if k < count else np.arange(count)
+            top = top[np.argsort(-scores[top])]
+            return [(float(scores[i]), partition.keys[i]) for i in top]
+
+    def lookup(self, preferences: UserPreferences) -> tuple[Itinerary, float] | None:
+        """Returns (itinerary, similarity) for the nearest stored profile above the threshold."""
+        matches = self.search(preferences, k=1)
+        if matches and matches[0][0] >= self.threshold:
+            score, key = matches[0]
+            with self._lock:
+                itinerary = self._items.get(key)
+                if itinerary is not None:
+                    self.hits += 1
+                    return itinerary, score
+        with self._lock: self.misses += 1
+        return None
+
+    def closest(self, preferences: UserPreferences) -> tuple[Itinerary, float] | None:
+        """Best stored itinerary for the same location and climate, ignoring the threshold,
+        budget and pace. Used as a stand-in while the LLM is unavailable."""
+        query = embed_preferences(preferences)
+        location, climate = partition_key(preferences)[:2]
+        best = None
+        with self._lock:
+            for part_key, partition in self._partitions.items():
+                if part_key[:2] != (location, climate): continue
+                scores = partition.vectors[:len(partition.keys)] @ query
+                for i in np.argsort(-scores):
+                    itinerary = self._items.get(partition.keys[i])
+                    if itinerary is None: continue
+                    if best is None or scores[i] > best[1]: best = (itinerary, float(scores[i]))
+                    break
+        return best
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": (self.hits / lookups) if lookups else 0.0, "size": len(self._items), "threshold": self.threshold}
+
+
+# --- Shared Default Index ---
+_default_index: PreferenceIndex | None = None
+_default_index_loaded = False
+_default_index_lock = threading.Lock()
+
+def get_default_index() -> PreferenceIndex | None:
+    """Returns the process-wide index, or None when disabled (threshold <= 0) or NumPy is missing."""
+    global _default_index, _default_index_loaded
+    with _default_index_lock:
+        if not _default_index_loaded:
+            _default_index_loaded = True
+            from src.config import get_similarity_settings
+            settings = get_similarity_settings()
+            if np is None:
+                logging.warning("NumPy is not installed; similar-preference reuse is disabled.")
+            elif settings["threshold"] > 0:
+                _default_index = PreferenceIndex(**settings)
+                seeded = rebuild_index(_default_index)
+                logging.info(f"Preference similarity index initialized (threshold={settings['threshold']}, max_entries={settings['max_entries']}, {seeded} stored profiles).")
+        return _default_index
+
+def rebuild_index(index: PreferenceIndex) -> int:
+    """Re-adds the profiles that outlive the process: the itinerary cache's disk entries and each
+    user's latest itinerary for their saved preferences. Returns the number of profiles added."""
+    from src.core.itinerary_cache import get_default_cache
+    from src.core.memory import list_profile_itineraries
+    added = 0
+    for name, source in (("itinerary cache", get_default_cache().stored_profiles), ("user history", list_profile_itineraries)):
+        try:
+            profiles = source(index.max_entries)
+        except Exception as e: # A broken store must not take similarity reuse down with it
+            logging.error(f"Could not load stored profiles from the {name}: {e}")
+            continue
+        for preferences, itinerary in reversed(profiles): # Oldest first, so the newest survive eviction
+            index.add(preferences, itinerary); added += 1
+    return added
@@ -0,0 +1,310 @@
+# render.py
+# One render pipeline for itineraries: an Itinerary (+ the preferences it was made for) is
+# normalized once into an ItineraryDoc of plain strings, and every output format is an
+# emitter over that document. Documents and emitter outputs are memoized by content, so
+# re-displaying or exporting the same itinerary never walks the Pydantic objects again.
+import html
+import importlib.util
+import logging
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, NamedTuple
+
+from src.core.perception import UserPreferences, preferences_fingerprint
+from src.core.decision_making import DestinationDetail, Itinerary
+from src.core.memory import itinerary_content_hash
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+NA = "N/A"
+
+
+# --- Document Model ---
+class Section(NamedTuple):
+    title: str
+    items: tuple[str, ...] # Empty when the field is missing
+    is_list: bool
+
+    def inline(self) -> str: # Single line, for formats without bullets
+        return ", ".join(item.replace("\n", " ") for item in self.items) if self.items else NA
+
+class DestinationDoc(NamedTuple):
+    number: int # 1-based
+    name: str
+    sections: tuple[Section, ...]
+
+    @property
+    def heading(self) -> str:
+        return f"Destination {self.number}: {self.name}"
+
+class ItineraryDoc(NamedTuple):
+    key: str
+    title: str | None # None when rendered without preferences (CLI)
+    preferences: tuple[tuple[str, str], ...]
+    destinations: tuple[DestinationDoc, ...]
+    reasoning: str
+
+
+def _text(value) -> tuple[str, ...]:
+    text = str(value).strip() if value is not None else ""
+    return (text,) if text else ()
+
+def _items(value) -> tuple[str, ...]:
+    if not isinstance(value, list): return _text(value)
+    return tuple(text for text in (str(item).strip() for item in value) if text)
+
+def build_destination(number: int, dest: DestinationDetail) -> DestinationDoc:
+    """Normalizes one destination; also used on its own for destinations streamed before the full itinerary."""
+    cost = _text(dest.estimated_cost_level)
+    sections = (Section("Duration", _text(dest.suggested_duration_days), False),
+                Section("Accommodation", _text(dest.suggested_accommodation_type), False),
+                Section("Cost Level", tuple(c.title() for c in cost), False),
+                Section("Why it Fits", _items(dest.why_it_fits), True),
+                Section("Activities", _items(dest.suggested_activities), True),
+                Section("Food", _items(dest.food_highlights), True),
+                Section("Transport", _items(dest.transportation_notes), True),
+                Section("Daily Focus", _items(dest.sample_daily_focus), True),
+                Section("Day Trip", _text(dest.potential_day_trip), False))
+    return DestinationDoc(number, dest.name.strip() or NA, sections)
+
+# Content hash per Itinerary object, so a rerun that redraws the same itinerary doesn't dump and hash
+# it again. Itineraries are never mutated once produced (edits build a new one), so the hash stays valid.
+_content_keys: dict[int, tuple[weakref.ref, str]] = {}
+_content_keys_lock = threading.Lock()
+
+def itinerary_key(itinerary: Itinerary) -> str:
+    """itinerary_content_hash, computed once per Itinerary object."""
+    ident = id(itinerary)
+    with _content_keys_lock:
+        entry = _content_keys.get(ident)
+        if entry is not None and entry[0]() is itinerary: return entry[1]
+    key = itinerary_content_hash(itinerary)
+    forget = lambda _, ident=ident: _content_keys.pop(ident, None) # The id may be reused once the object is gone
+    with _content_keys_lock: _content_keys[ident] = (weakref.ref(itinerary, forget), key)
+    return key
+
+def document_key(itinerary: Itinerary, preferences: UserPreferences | None = None) -> str:
+    if preferences is None: return itinerary_key(itinerary)
+    return f"{itinerary_key(itinerary)}:{preferences_fingerprint(preferences)}:{preferences.name}"
+
+def build_document(itinerary: Itinerary, preferences: UserPreferences | None = None, key: str | None = None) -> ItineraryDoc:
+    destinations = tuple(build_destination(idx, dest) for idx, dest in enumerate(itinerary.destinations, 1) if isinstance(dest, DestinationDetail))
+    prefs = () if preferences is None else (
+        ("Climate", preferences.climate_preference.title()), ("Activities", ", ".join(preferences.activity_preferences)),
+        ("Budget", preferences.budget.title()), ("Pace", preferences.travel_pace.title()))
+    return ItineraryDoc(key or document_key(itinerary, preferences), f"Itinerary for {preferences.name}" if preferences else None,
+                        prefs, destinations, (itinerary.overall_reasoning or "").strip() or NA)
+
+
+# --- Emitters ---
+# An emitter turns an ItineraryDoc into one output format; register new formats with @register_emitter.
+EMITTERS: dict[str, Callable[[ItineraryDoc], object]] = {}
+
+def register_emitter(fmt: str):
+    def decorator(emit: Callable[[ItineraryDoc], object]):
+        EMITTERS[fmt] = emit
+        return emit
+    return decorator
+
+
+TERMINAL_RULE = "-" * 50
+TERMINAL_HEADER = "\n✨ Your Personalized Detailed Travel Itinerary ✨\n" + TERMINAL_RULE
+
+def destination_terminal(dest: DestinationDoc) -> str:
+    lines = [f"\n📍 {dest.heading}"]
+    for section in dest.sections:
+        if not section.items: continue
+        if section.is_list: lines.append(f"   - {section.title}:"); lines.extend(f"       • {item}" for item in section.items)
+        else: lines.append(f"   - {section.title}: {section.items[0]}")
+    return "\n".join(lines)
+
+@register_emitter("terminal")
+def emit_terminal(doc: ItineraryDoc) -> str:
+    parts = [TERMINAL_HEADER] + [destination_terminal(dest) for dest in doc.destinations]
+    parts += [TERMINAL_RULE, "\n💡 Overall Reasoning:", doc.reasoning]
+    return "\n".join(parts)
+
+
+def destination_markdown(dest: DestinationDoc) -> str:
+    """Markdown body of one destination (without its heading); the Streamlit expanders show this."""
+    blocks = []
+    for section in dest.sections:
+        if not section.is_list:
+            if section.items or section.title != "Day Trip": blocks.append(f"**{section.title}:** {section.items[0] if section.items else NA}")
+        elif section.items: blocks.append(f"**{section.title}:**\n" + "\n".join(f"- {item}" for item in section.items))
+        else: blocks.append(f"**{section.title}:** _{NA}_")
+    return "\n\n".join(blocks)
+
+class StreamlitView(NamedTuple):
+    preferences: tuple[str, ...] # One markdown line per preference
+    destinations: tuple[tuple[str, str], ...] # (expander label, markdown body)
+    reasoning: str
+
+@register_emitter("streamlit")
+def emit_streamlit(doc: ItineraryDoc) -> StreamlitView:
+    return StreamlitView(tuple(f"**{label}:** {value}" for label, value in doc.preferences),
+                         tuple((f"📍 Dest {dest.number}: {dest.name}", destination_markdown(dest)) for dest in doc.destinations),
+                         doc.reasoning)
+
+@register_emitter("markdown")
+def emit_markdown(doc: ItineraryDoc) -> str:
+    parts = [f"# {doc.title or 'Itinerary'}"]
+    if doc.preferences: parts.append("## Preferences\n" + "\n".join(f"- **{label}:** {value}" for label, value in doc.preferences))
+    parts += [f"## 📍 {dest.heading}\n\n{destination_markdown(dest)}" for dest in doc.destinations]
+    parts.append(f"## 💡 Overall Reasoning\n\n{doc.reasoning}")
+    return "\n\n".join(parts) + "\n"
+
+
+EMAIL_RULE = "=" * 40
+
+@register_emitter("email_text")
+def emit_email_text(doc: ItineraryDoc) -> str:
+    # Every section on one line: the Gmail MCP client passes the body through a single tool argument
+    lines = [doc.title or "Itinerary", EMAIL_RULE, "\nPreferences:"]
+    lines += [f"- {label}: {value}" for label, value in doc.preferences]
+    lines.append("\n" + EMAIL_RULE + "\n")
+    for dest in doc.destinations:
+        lines += [dest.heading, "-" * len(dest.heading)]
+        for section in dest.sections:
+            if section.title == "Day Trip" and not section.items: continue
+            lines += [f"\n{section.title}:", section.inline()]
+        lines.append("\n" + EMAIL_RULE + "\n")
+    lines += ["Overall Reasoning:", doc.reasoning.replace("\n", " ")]
+    return "\n".join(lines)
+
+@register_emitter("email_html")
+def emit_email_html(doc: ItineraryDoc) -> str:
+    esc = html.escape
+    parts = [f"<h1>{esc(doc.title or 'Itinerary')}</h1>"]
+    if doc.preferences: parts.append("<ul>" + "".join(f"<li><b>{esc(label)}:</b> {esc(value)}</li>" for label, value in doc.preferences) + "</ul>")
+    for dest in doc.destinations:
+        parts.append(f"<h2>{esc(dest.heading)}</h2>")
+        for section in dest.sections:
+            if not section.items: continue
+            if section.is_list: parts.append(f"<p><b>{esc(section.title)}:</b></p><ul>" + "".join(f"<li>{esc(item)}</li>" for item in section.items) + "</ul>")
+            else: parts.append(f"<p><b>{esc(section.title)}:</b> {esc(section.items[0])}</p>")
+    parts.append(f"<h2>Overall Reasoning</h2><p>{esc(doc.reasoning)}</p>")
+    return "<html><body>" + "".join(parts) + "</body></html>"
+
+
+# --- PDF Fonts ---
+# The core PDF fonts (Helvetica) only cover Latin-1, so any other script used to be replaced with "?".
+# A Unicode TTF is embedded instead when one is found: PDF_FONT_PATH (+ PDF_FONT_BOLD_PATH), then
+# AI_Travel_Agent/fonts/, then common system locations. Fonts are resolved once per process.
+PDF_FONT_FAMILY = "ItineraryUnicode"
+_FONTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "fonts")
+PDF_FONT_CANDIDATES = [ # (regular, bold)
+    (os.path.join(_FONTS_DIR, "DejaVuSans.ttf"), os.path.join(_FONTS_DIR, "DejaVuSans-Bold.ttf")),
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+    ("/usr/share/fonts/dejavu/DejaVuSans.ttf", "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf"),
+    ("/usr/share/fonts/TTF/DejaVuSans.ttf", "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf"),
+    ("/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf", "/usr/share/fonts/truetype/noto/NotoSans-Bold.ttf"),
+    ("/Library/Fonts/Arial Unicode.ttf", None),
+    ("C:\\Windows\\Fonts\\arial.ttf", "C:\\Windows\\Fonts\\arialbd.ttf"),
+]
+
+@lru_cache(maxsize=1)
+def pdf_unicode_fonts() -> tuple[str, str] | None:
+    """(regular, bold) TTF paths used for PDFs, or None to fall back to Latin-1 Helvetica."""
+    configured = os.getenv("PDF_FONT_PATH")
+    candidates = [(configured, os.getenv("PDF_FONT_BOLD_PATH"))] if configured else PDF_FONT_CANDIDATES
+    try: # matplotlib ships DejaVu Sans; use it if installed, without importing matplotlib
+        spec = importlib.util.find_spec("matplotlib")
+        if spec and spec.origin and not configured:
+            ttf_dir = os.path.join(os.path.dirname(spec.origin), "mpl-data", "fonts", "ttf")
+            candidates = candidates + [(os.path.join(ttf_dir, "DejaVuSans.ttf"), os.path.join(ttf_dir, "DejaVuSans-Bold.ttf"))]
+    except (ImportError, ValueError): pass
+    for regular, bold in candidates:
+        if regular and os.path.isfile(regular):
+            bold = bold if bold and os.path.isfile(bold) else regular # Without a bold face, headings use the regular one
+            logging.info(f"PDF font: {regular} (bold: {bold}).")
+            return regular, bold
+    logging.warning(f"No Unicode TTF font found{f' at {configured}' if configured else ''}; PDFs use Helvetica and replace non-Latin-1 characters. Set PDF_FONT_PATH or add DejaVuSans.ttf to {_FONTS_DIR}.")
+    return None
+
+def _latin1(text: str) -> str: # The core PDF fonts only cover Latin-1
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+@register_emitter("pdf")
+def emit_pdf(doc: ItineraryDoc) -> bytes:
+    from fpdf import FPDF # Only needed when a PDF is actually exported
+    pdf = FPDF(); pdf.add_page(); pdf.set_auto_page_break(auto=True, margin=15)
+    fonts = pdf_unicode_fonts()
+    if fonts: # Registration is cheap: fpdf2 parses the TTF lazily and embeds only the used glyphs
+        pdf.add_font(PDF_FONT_FAMILY, "", fonts[0]); pdf.add_font(PDF_FONT_FAMILY, "B", fonts[1])
+        family, encode = PDF_FONT_FAMILY, str
+    else: family, encode = "Helvetica", _latin1
+    pdf.set_font(family, "B", 16); pdf.multi_cell(0, 10, encode(doc.title or "Itinerary"), align='C'); pdf.ln(5)
+    if doc.preferences:
+        pdf.set_font(family, "B", 12); pdf.write(6, "Preferences:\n"); pdf.set_font(family, size=10)
+        pdf.multi_cell(0, 5, encode("\n".join(f"- {label}: {value}" for label, value in doc.preferences))); pdf.ln(5)
+    for dest in doc.destinations:
+        pdf.set_font(family, "B", 14); pdf.write(7, encode(f"Dest {dest.number}: {dest.name}\n")); pdf.ln(1)
+        for section in dest.sections:
+            if not section.items and not section.is_list: continue
+            pdf.set_font(family, "B", 10); pdf.write(5, f"{section.title}:\n"); pdf.set_font(family, size=10)
+            body = "".join(f"- {item}\n" for item in section.items) if section.is_list else section.items[0]
+            pdf.multi_cell(0, 5, encode(body or f"- {NA}")); pdf.ln(2)
+        pdf.ln(5)
+    pdf.set_font(family, "B", 12); pdf.write(6, "Reasoning:\n"); pdf.set_font(family, size=10); pdf.multi_cell(0, 5, encode(doc.reasoning)); pdf.ln(5)
+    return bytes(pdf.output())
+
+
+# --- Renderer ---
+class ItineraryRenderer:
+    """Memoizes documents and emitter outputs (LRU) by itinerary content + preferences."""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max(1, max_entries)
+        self._docs: OrderedDict[str, ItineraryDoc] = OrderedDict()
+        self._outputs: OrderedDict[tuple[str, str], object] = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.renders = 0
+
+    def _remember(self, entries: OrderedDict, key, value, limit: int):
+        entries[key] = value; entries.move_to_end(key)
+        while len(entries) > limit: entries.popitem(last=False)
+
+    def document(self, itinerary: Itinerary, preferences: UserPreferences | None = None) -> ItineraryDoc:
+        key = document_key(itinerary, preferences)
+        with self._lock:
+            doc = self._docs.get(key)
+            if doc is not None: self._docs.move_to_end(key); return doc
+        doc = build_document(itinerary, preferences, key) # Outside the lock; a duplicate build is harmless
+        with self._lock: self.builds += 1; self._remember(self._docs, key, doc, self.max_entries)
+        return doc
+
+    def render(self, itinerary: Itinerary | ItineraryDoc, preferences: UserPreferences | None = None, fmt: str = "markdown"):
+        """Returns `itinerary` in format `fmt` (see EMITTERS); accepts a prebuilt ItineraryDoc."""
+        emit = EMITTERS.get(fmt)
+        if emit is None: raise ValueError(f"Unknown render format '{fmt}', expected one of {sorted(EMITTERS)}.")
+        doc = itinerary if isinstance(itinerary, ItineraryDoc) else self.document(itinerary, preferences)
+        with self._lock:
+            output = self._outputs.get((doc.key, fmt))
+            if output is not None: self._outputs.move_to_end((doc.key, fmt)); return output
+        output = emit(doc)
+        with self._lock: self.renders += 1; self._remember(self._outputs, (doc.key, fmt), output, self.max_entries * 4)
+        return output
+
+    def stats(self) -> dict:
+        with self._lock: return {"documents": len(self._docs), "outputs": len(self._outputs), "builds": self.builds, "renders": self.renders}
+
+
+# --- Shared Default Renderer ---
+_default_renderer: ItineraryRenderer | None = None
+_default_renderer_lock = threading.Lock()
+
+def get_default_renderer() -> ItineraryRenderer:
+    """Process-wide renderer shared by the CLI, the Streamlit app and exports."""
+    global _default_renderer
+    with _default_renderer_lock:
+        if _default_renderer is None: _default_renderer = ItineraryRenderer()
+        return _default_renderer
+
+def render_itinerary(itinerary: Itinerary, preferences: UserPreferences | None = None, fmt: str = "markdown"):
+    return get_default_renderer().render(itinerary, preferences, fmt)
@@ -0,0 +1,135 @@
+# speculation.py
+# While the modification form is open, pre-generate the variants the user is most likely to submit
+# (one step up/down in budget or pace, another climate) so "Regenerate" usually hits the cache.
+# Speculative calls go through make_decision_cached, so a Regenerate that arrives while its variant
+# is still generating joins that in-flight request instead of starting another one.
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import google.generativeai as genai # Import library for potential type hinting
+
+from src.core.perception import UserPreferences, preferences_fingerprint
+from src.core.decision_making import reports_quiet
+from src.core.itinerary_cache import get_default_cache, llm_unavailable, make_decision_cached
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Ordered options offered by the app's preference forms
+BUDGET_LEVELS = ["low", "medium", "high"]
+PACE_LEVELS = ["relaxed", "moderate", "fast"]
+CLIMATE_OPTIONS = ["cold", "moderate", "tropical"]
+
+
+def _neighbours(value: str, levels: list[str]) -> list[str]:
+    if value not in levels: return []
+    i = levels.index(value)
+    return [levels[j] for j in (i + 1, i - 1) if 0 <= j < len(levels)]
+
+def predict_variants(preferences: UserPreferences, limit: int = 4) -> list[UserPreferences]:
+    """Most likely single-field edits of `preferences`, most likely first."""
+    candidates = [("budget", v) for v in _neighbours(preferences.budget, BUDGET_LEVELS)]
+    candidates += [("travel_pace", v) for v in _neighbours(preferences.travel_pace, PACE_LEVELS)]
+    candidates += [("climate_preference", v) for v in CLIMATE_OPTIONS if v != preferences.climate_preference]
+    return [preferences.model_copy(update={field: value}) for field, value in candidates[:limit]]
+
+
+class Speculator:
+    """Runs speculative generations under a concurrency cap and an hourly call budget.
+
+    Each app session's speculations are tracked until `resolve` is called with the
+    preferences the user actually submitted (or None on cancel); the matching
+    speculation counts as used and the rest as wasted. Sessions that are never resolved
+    (a closed tab) expire after `session_ttl` seconds and count as wasted. Generation runs on
+    pool threads, which must not touch Streamlit, so their error reports are only logged.
+    """
+
+    def __init__(self, max_workers: int = 2, max_per_hour: int = 60, variants: int = 4, session_ttl: float = 3600):
+        self.max_workers = max(1, max_workers)
+        self.max_per_hour = max_per_hour
+        self.variants = variants
+        self.session_ttl = session_ttl
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="speculate", initializer=reports_quiet)
+        self._slots = threading.BoundedSemaphore(self.max_workers) # Never queue more than we can run
+        self._launched_at: deque[float] = deque()
+        self._sessions: dict[str, tuple[float, set[str]]] = {} # session_id -> (last speculated at, variant keys)
+        self._lock = threading.Lock()
+        self.stats_counters = {"launched": 0, "used": 0, "wasted": 0, "failed": 0, "skipped_budget": 0, "skipped_busy": 0}
+
+    def _within_budget(self) -> bool:
+        cutoff = time.time() - 3600
+        while self._launched_at and self._launched_at[0] < cutoff: self._launched_at.popleft()
+        return len(self._launched_at) < self.max_per_hour
+
+    def _expire_sessions(self):
+        cutoff = time.time() - self.session_ttl
+        for session_id in [sid for sid, (touched, _) in self._sessions.items() if touched < cutoff]:
+            _, started = self._sessions.pop(session_id)
+            self.stats_counters["wasted"] += len(started)
+            if started: logging.info(f"Speculation round for session {session_id[:8]} expired unresolved: 0/{len(started)} used.")
+
+    def speculate(self, client: genai.GenerativeModel, preferences: UserPreferences, session_id: str):
+        """Starts background generation for the likely variants that are not cached or speculated yet."""
+        if self.max_per_hour <= 0 or not isinstance(preferences, UserPreferences): return
+        if llm_unavailable(): return # Don't spend calls while the circuit breaker is open
+        cache = get_default_cache()
+        with self._lock: self._expire_sessions()
+        for variant in predict_variants(preferences, self.variants):
+            key = preferences_fingerprint(variant)
+            if cache.peek(key): continue # Already ready, nothing to spend
+            with self._lock:
+                started = self._sessions.setdefault(session_id, (0.0, set()))[1]
+                self._sessions[session_id] = (time.time(), started)
+                if key in started: continue
+                if not self._within_budget():
+                    self.stats_counters["skipped_budget"] += 1; return
+                if not self._slots.acquire(blocking=False):
+                    self.stats_counters["skipped_busy"] += 1; return
+                started.add(key); self._launched_at.append(time.time())
+                self.stats_counters["launched"] += 1
+            logging.info(f"Speculatively generating variant {key[:12]} for session {session_id[:8]}.")
+            self._executor.submit(self._run, client, variant)
+
+    def _run(self, client: genai.GenerativeModel, variant: UserPreferences):
+        try:
+            if make_decision_cached(client, variant) is None:
+                with self._lock: self.stats_counters["failed"] += 1
+        except Exception as e:
+            logging.error(f"Speculative generation failed: {e}")
+            with self._lock: self.stats_counters["failed"] += 1
+        finally:
+            self._slots.release()
+
+    def resolve(self, session_id: str, chosen: UserPreferences | None):
+        """Closes a session's speculation round: the submitted variant is used, the rest wasted."""
+        chosen_key = preferences_fingerprint(chosen) if chosen else None
+        with self._lock:
+            _, started = self._sessions.pop(session_id, (0.0, set()))
+            used = 1 if chosen_key in started else 0
+            self.stats_counters["used"] += used
+            self.stats_counters["wasted"] += len(started) - used
+        if started: logging.info(f"Speculation round for session {session_id[:8]}: {used}/{len(started)} used.")
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.stats_counters)
+            resolved = counters["used"] + counters["wasted"]
+            counters["hit_rate"] = (counters["used"] / resolved) if resolved else 0.0
+            return counters
+
+
+# --- Shared Default Speculator ---
+_default_speculator: Speculator | None = None
+_default_speculator_lock = threading.Lock()
+
+def get_speculator() -> Speculator:
+    """Returns the process-wide speculator, built from config on first use."""
+    global _default_speculator
+    with _default_speculator_lock:
+        if _default_speculator is None:
+            from src.config import get_speculation_settings
+            _default_speculator = Speculator(**get_speculation_settings())
+        return _default_speculator
@@ -0,0 +1,157 @@
+# telegram_delivery.py
+# Outbound Telegram queue: "Send to Telegram" enqueues the PDF and returns at once; background
+# workers send it over one pooled requests.Session (connections and TLS sessions are reused across
+# sends) and retry with backoff, waiting exactly `retry_after` seconds when Telegram rate-limits.
+# The app polls the delivery's status instead of blocking the script on the upload.
+import logging
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import NamedTuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+TELEGRAM_API = "https://api.telegram.org"
+PENDING_STATES = ("queued", "sending", "retrying")
+
+
+class Delivery(NamedTuple):
+    delivery_id: str
+    pdf: bytes | Future # A Future (e.g. from the PDF render service) is resolved by the worker
+    caption: str
+    file_name: str
+
+
+class TelegramDelivery:
+    """Queue of PDF documents to send to one chat, drained by background worker threads."""
+
+    def __init__(self, bot_token: str, chat_id: str, workers: int = 2, max_retries: int = 4,
+                 retry_base_seconds: float = 1.0, retry_max_seconds: float = 60.0, timeout: float = 30.0, max_statuses: int = 1000):
+        self.bot_token = bot_token
+        self.chat_id = chat_id
+        self.max_retries = max(0, max_retries)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.timeout = timeout
+        self.max_statuses = max(1, max_statuses)
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max(1, workers))) # One host, one connection per worker
+        self._queue: queue.Queue[Delivery | None] = queue.Queue()
+        self._statuses: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.stats_counters = {"sent": 0, "failed": 0, "retries": 0, "rate_limited": 0}
+        self._workers = [threading.Thread(target=self._worker_loop, name=f"telegram-{n}", daemon=True) for n in range(max(1, workers))]
+        for worker in self._workers: worker.start()
+        logging.info(f"Telegram delivery started ({len(self._workers)} workers, max_retries={self.max_retries}).")
+
+    # --- Public API ---
+    def enqueue(self, pdf: bytes | Future, caption: str, file_name: str = "itinerary.pdf") -> str:
+        """Queues a document and returns its delivery id; never blocks on the network."""
+        delivery = Delivery(uuid.uuid4().hex, pdf, caption, file_name)
+        self._set_status(delivery.delivery_id, state="queued", attempts=0, error=None)
+        self._queue.put(delivery)
+        return delivery.delivery_id
+
+    def status(self, delivery_id: str) -> dict | None:
+        """{"state": queued|sending|retrying|sent|failed, "attempts", "error", "retry_at", "updated_at"} or None if unknown."""
+        with self._lock:
+            status = self._statuses.get(delivery_id)
+            return dict(status) if status else None
+
+    def stats(self) -> dict:
+        with self._lock: return dict(self.stats_counters, queued=self._queue.qsize())
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stops the workers after their current send; queued documents are dropped."""
+        self._stop.set()
+        for _ in self._workers: self._queue.put(None)
+        for worker in self._workers: worker.join(timeout)
+        self.session.close()
+
+    # --- Workers ---
+    def _set_status(self, delivery_id: str, **fields):
+        with self._lock:
+            status = self._statuses.setdefault(delivery_id, {"retry_at": None})
+            status.update(fields, updated_at=time.time()); self._statuses.move_to_end(delivery_id)
+            while len(self._statuses) > self.max_statuses: self._statuses.popitem(last=False)
+
+    def _count(self, counter: str):
+        with self._lock: self.stats_counters[counter] += 1
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            delivery = self._queue.get()
+            if delivery is None: break
+            try: self._deliver(delivery)
+            except Exception as e: # Never let one document kill the worker
+                logging.exception(f"Telegram delivery {delivery.delivery_id[:8]} crashed.")
+                self._set_status(delivery.delivery_id, state="failed", error=f"Unexpected error: {e}"); self._count("failed")
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * (2 ** attempt)))
+
+    def _deliver(self, delivery: Delivery):
+        try:
+            pdf_bytes = delivery.pdf.result(timeout=120) if isinstance(delivery.pdf, Future) else delivery.pdf
+        except Exception as e:
+            self._set_status(delivery.delivery_id, state="failed", error=f"PDF not available: {e}"); self._count("failed"); return
+
+        for attempt in range(self.max_retries + 1):
+            self._set_status(delivery.delivery_id, state="sending", attempts=attempt + 1, retry_at=None)
+            delay, error = self._send_once(delivery, pdf_bytes, attempt)
+            if error is None:
+                self._set_status(delivery.delivery_id, state="sent", error=None); self._count("sent")
+                logging.info(f"Sent PDF to Telegram (delivery {delivery.delivery_id[:8]}, attempt {attempt + 1}).")
+                return
+            if delay is None or attempt == self.max_retries: break # Not retryable, or out of attempts
+            self._count("retries")
+            logging.warning(f"Telegram delivery {delivery.delivery_id[:8]} attempt {attempt + 1} failed ({error}); retrying in {delay:.1f}s.")
+            self._set_status(delivery.delivery_id, state="retrying", error=error, retry_at=time.time() + delay)
+            if self._stop.wait(delay): break
+        self._set_status(delivery.delivery_id, state="failed", error=error); self._count("failed")
+        logging.error(f"Telegram delivery {delivery.delivery_id[:8]} failed: {error}")
+
+    def _send_once(self, delivery: Delivery, pdf_bytes: bytes, attempt: int) -> tuple[float | None, str | None]:
+        """One sendDocument call: (None, None) on success, else (retry delay or None if permanent, error)."""
+        url = f"{TELEGRAM_API}/bot{self.bot_token}/sendDocument"
+        try:
+            response = self.session.post(url, data={"chat_id": self.chat_id, "caption": delivery.caption},
+                                         files={"document": (delivery.file_name, pdf_bytes, "application/pdf")}, timeout=self.timeout)
+        except requests.exceptions.RequestException as e: # Connection reset, timeout, DNS...
+            return self._backoff(attempt), f"Network error: {type(e).__name__}"
+        try: body = response.json()
+        except ValueError: body = {}
+        if response.ok and body.get("ok"): return None, None
+        description = body.get("description") or f"HTTP {response.status_code}"
+        if response.status_code == 429: # Flood control: Telegram says exactly how long to wait
+            self._count("rate_limited")
+            retry_after = (body.get("parameters") or {}).get("retry_after") or response.headers.get("Retry-After")
+            try: return float(retry_after) + random.uniform(0, 0.5), description
+            except (TypeError, ValueError): return self._backoff(attempt), description
+        if response.status_code >= 500: return self._backoff(attempt), description
+        return None, description # Bad token, unknown chat, file too large: retrying cannot help
+
+
+# --- Shared Default Queue ---
+_default_delivery: TelegramDelivery | None = None
+_default_delivery_lock = threading.Lock()
+
+def get_telegram_delivery() -> TelegramDelivery | None:
+    """Returns the process-wide delivery queue, or None when Telegram is not configured."""
+    global _default_delivery
+    with _default_delivery_lock:
+        if _default_delivery is None:
+            from src.config import get_telegram_credentials, get_telegram_delivery_settings
+            bot_token, chat_id = get_telegram_credentials()
+            if not bot_token or not chat_id: return None
+            _default_delivery = TelegramDelivery(bot_token, chat_id, **get_telegram_delivery_settings())
+        return _default_delivery
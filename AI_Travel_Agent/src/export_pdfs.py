@@ -0,0 +1,64 @@
+# export_pdfs.py
+# Bulk PDF export of stored itineraries into one ZIP (a PDF per itinerary) or one merged PDF.
+# Run from the project root:
+#   python src/export_pdfs.py --batch-output itineraries.jsonl -o itineraries.zip --workers 4
+#   python src/export_pdfs.py --users alice bob -o itineraries.pdf
+#   python src/export_pdfs.py --recent-users 500 --per-user 2 -o recent.zip
+import argparse
+import logging
+import os
+import sys
+import time
+
+# --- BEGIN PATH MODIFICATION ---
+# Same as app.py: make `src.` imports work when run as `python src/export_pdfs.py`
+src_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(src_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+# --- END PATH MODIFICATION ---
+
+from src.core.pdf_export import count_lines, export_pdfs, iter_batch_output, iter_user_histories
+from src.core.memory import list_recent_users
+from src.config import load_environment
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export many stored itineraries to a ZIP of PDFs or one merged PDF.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--batch-output", help="JSONL written by batch.py")
+    source.add_argument("--users", nargs="+", help="User ids whose saved itineraries are exported")
+    source.add_argument("--recent-users", type=int, help="Export the N most recently active users")
+    parser.add_argument("--per-user", type=int, default=1, help="Latest itineraries exported per user")
+    parser.add_argument("-o", "--output", default="itineraries.zip", help="Output .zip or .pdf (merged)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Render processes")
+    parser.add_argument("--time-budget", type=float, default=30.0, help="Seconds allowed per document (0 = unlimited)")
+    args = parser.parse_args()
+
+    load_environment() # PDF_FONT_PATH and the user memory settings
+    if args.batch_output:
+        items, total = iter_batch_output(args.batch_output), count_lines(args.batch_output)
+    else:
+        user_ids = args.users or [user_id for user_id, _ in list_recent_users(limit=args.recent_users)]
+        items, total = iter_user_histories(user_ids, args.per_user), None
+
+    last_report = [0.0]
+    def on_progress(done: int, total: int | None, name: str, error: str | None):
+        now = time.monotonic()
+        if error or now - last_report[0] >= 2 or done == total:
+            last_report[0] = now
+            print(f"\r{done}/{total or '?'} exported{f' ({name}: {error})' if error else ''}   ", end="\n" if error else "", flush=True)
+
+    try:
+        stats = export_pdfs(items, args.output, max_workers=max(1, args.workers), time_budget=args.time_budget, total=total, on_progress=on_progress)
+    except ValueError as e:
+        print(f"❌ {e}"); sys.exit(2)
+    print(f"\nDone: {stats['exported']} exported to {args.output}, {stats['failed']} failed, {stats['timed_out']} over the time budget.")
+    print(f"Throughput: {stats['documents_per_second']} documents/s over {stats['elapsed_seconds']}s.")
+    sys.exit(1 if stats["failed"] or stats["timed_out"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,15 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s')
 # --- End Logging Configuration ---
 
+# --- Shared Gemini Gateway (rate limiting, retries, metrics) ---
+import sys
+SHARED_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "..", "shared"))
+if SHARED_DIR not in sys.path:
+    sys.path.insert(0, SHARED_DIR)
+from gemini_gateway import get_gateway
+from llm_replay import wrap_model # LLM_REPLAY_MODE=record/replay/auto for offline runs
+# --- End Shared Gemini Gateway ---
+
 
 # --- Configuration via Pydantic Settings ---
 # -----------
@@ -77,11 +86,10 @@ async def generate_with_timeout(prompt: str, timeout: int = settings.LLM_TIMEOUT
     """Generate content with Gemini, handling potential timeouts."""
     logging.info(f"Generating LLM response (model: {settings.LLM_MODEL})...")
     try:
-        model = genai.GenerativeModel(settings.LLM_MODEL)
+        model = wrap_model(genai.GenerativeModel(settings.LLM_MODEL))
+        # The timeout covers the gateway's rate-limit wait and retries as well as the call itself
         response = await asyncio.wait_for(
-            asyncio.to_thread(
-                model.generate_content, contents=prompt
-            ),
+            get_gateway().generate_async(model, prompt, call_site="gmail_client"),
             timeout=timeout
         )
         logging.info("LLM generation completed.")
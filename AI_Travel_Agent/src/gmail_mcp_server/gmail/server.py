@@ -16,6 +16,7 @@ from mcp.server import NotificationOptions, Server
 import mcp.server.stdio
 
 
+from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -106,11 +107,13 @@ class GmailService:
     def __init__(self,
                  creds_file_path: str,
                  token_path: str,
-                 scopes: list[str] = ['https://www.googleapis.com/auth/gmail.modify']):
+                 scopes: list[str] = ['https://www.googleapis.com/auth/gmail.modify'],
+                 interactive: bool = True):
         logger.info(f"Initializing GmailService with creds file: {creds_file_path}")
         self.creds_file_path = creds_file_path
         self.token_path = token_path
         self.scopes = scopes
+        self.interactive = interactive # False: never open the browser OAuth flow, fail instead
         self.token = self._get_token()
         logger.info("Token retrieved successfully")
         self.service = self._get_service()
@@ -119,7 +122,7 @@ class GmailService:
         logger.info(f"User email retrieved: {self.user_email}")
 
     def _get_token(self) -> Credentials:
-        """Get or refresh Google API token"""
+        """Get or refresh Google API token (non-interactive services raise ValueError instead of starting the OAuth flow)"""
 
         token = None
     
@@ -130,7 +133,15 @@ class GmailService:
         if not token or not token.valid:
             if token and token.expired and token.refresh_token:
                 logger.info('Refreshing token')
-                token.refresh(Request())
+                try:
+                    token.refresh(Request())
+                except RefreshError as error:
+                    if self.interactive: raise
+                    raise ValueError(f'Gmail token at {self.token_path} could not be refreshed ({error}). '
+                                     'Run server.py once from a terminal to authorize Gmail again.') from error
+            elif not self.interactive:
+                raise ValueError(f'No valid Gmail token at {self.token_path}. '
+                                 'Run server.py once from a terminal to authorize Gmail.')
             else:
                 logger.info('Fetching new token')
                 flow = InstalledAppFlow.from_client_secrets_file(self.creds_file_path, self.scopes)
@@ -3,8 +3,8 @@ import os
 # Removed direct imports of configure, load_dotenv, genai if only used for client init
 from src.core.perception import collect_user_preferences, UserPreferences
 from src.core.memory import store_user_preferences, get_user_preferences # Removed user_memory_store import if not directly used
-from src.core.decision_making import make_decision
-from src.core.action import present_itinerary
+from src.core.itinerary_cache import make_decision_for_user
+from src.core.action import present_destination, present_itinerary
 import logging
 import copy
 # Import from config
@@ -64,11 +64,16 @@ def run_agent_workflow(user_id: str | None = None):
     # --- End Collect Preferences ---
 
     # --- Inner Loop ---
+    suggest_new = False # Set by modification option 5: same preferences, different places
+    base = None # (previous prefs, previous itinerary) so a pace/budget edit only updates the affected fields
     while True:
         if not current_prefs: logging.error("Prefs missing."); return current_user_id
 
         logging.info(f"Making decision for {current_prefs.name}.")
-        itinerary = make_decision(client, current_prefs) # Pass initialized client
+        streamed = [] # Destinations already printed while the response streams in
+        def on_destination(idx, dest): present_destination(idx + 1, dest); streamed.append(dest)
+        itinerary = make_decision_for_user(client, current_user_id, current_prefs, on_destination=on_destination, suggest_new=suggest_new, base=base) # History first, then the shared cache, then the LLM
+        suggest_new = False; base = None
 
         if not itinerary:
             logging.error("Failed to generate itinerary.")
@@ -76,20 +81,21 @@ def run_agent_workflow(user_id: str | None = None):
             if try_again != 'y': break
         else:
             logging.info("Decision made."); logging.info(f"Presenting itinerary for {current_prefs.name}")
-            present_itinerary(itinerary); logging.info("Itinerary presented.")
+            present_itinerary(itinerary, skip_destinations=len(streamed)); logging.info("Itinerary presented.")
 
         # --- Modification Prompt ---
         modify = input("\nModify preference and regenerate? (y/n): ").lower()
         if modify != 'y': break
 
-        print("\nModify: 1.Climate 2.Activities 3.Budget 4.Pace"); choice = input("Choice(1-4): ")
+        print("\nModify: 1.Climate 2.Activities 3.Budget 4.Pace 5.Different destinations"); choice = input("Choice(1-5): ")
         modified_prefs = copy.deepcopy(current_prefs); valid_mod = False
         if choice == '1': modified_prefs.climate_preference = input("New climate: ").strip().lower(); valid_mod = True
         elif choice == '2': modified_prefs.activity_preferences = [a.strip().lower() for a in input("New activities: ").split(",")]; valid_mod = True
         elif choice == '3': modified_prefs.budget = input("New budget: ").strip().lower(); valid_mod = True
         elif choice == '4': modified_prefs.travel_pace = input("New pace: ").strip().lower(); valid_mod = True
+        elif choice == '5': suggest_new = True; valid_mod = True
         else: print("Invalid choice.")
-        if valid_mod: print("Regenerating..."); current_prefs = modified_prefs; logging.info(f"Prefs temporarily modified: {current_prefs}")
+        if valid_mod: print("Regenerating..."); base = (current_prefs, itinerary) if itinerary else None; current_prefs = modified_prefs; logging.info(f"Prefs temporarily modified: {current_prefs}")
         # --- End Modification ---
     # --- End Inner Loop ---
     logging.info("--- Workflow Cycle Finished ---")
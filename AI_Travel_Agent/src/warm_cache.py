@@ -0,0 +1,150 @@
+# warm_cache.py
+# Pre-generates itineraries for the most requested preference profiles so peak-time users get
+# cache hits. Profiles come from the usage log (ITINERARY_USAGE_LOG), a preference list file, or
+# the Streamlit form grid (3 climates x 3 budgets x 3 paces). Run from the project root, e.g.:
+#   python src/warm_cache.py --usage-log itinerary_usage.jsonl --top 50
+#   python src/warm_cache.py --grid --locations "Mumbai" --activities "food, art" "hiking, nature" --at 03:00
+# The web app only sees warmed entries through the on-disk cache, so set ITINERARY_CACHE_DIR
+# (and an ITINERARY_CACHE_TTL_SECONDS longer than the gap until peak hours).
+import argparse
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+# --- BEGIN PATH MODIFICATION ---
+# Same as app.py: make `src.` imports work when run as `python src/warm_cache.py`
+src_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(src_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+# --- END PATH MODIFICATION ---
+
+from src.core.perception import UserPreferences, preferences_fingerprint, preferences_from_record
+from src.core.itinerary_cache import get_default_cache, make_decision_cached
+from src.batch import RateLimiter, load_preference_records
+from src.config import load_environment, initialize_client
+
+# Configure basic logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Options offered by display_preference_form in app.py
+CLIMATE_OPTIONS = ["cold", "moderate", "tropical"]
+BUDGET_OPTIONS = ["low", "medium", "high"]
+PACE_OPTIONS = ["relaxed", "moderate", "fast"]
+
+
+# --- Profile Sources ---
+def profiles_from_usage_log(path: str, top: int) -> list[UserPreferences]:
+    """The `top` most frequently requested profiles in a usage log, most frequent first."""
+    counts, samples = Counter(), {}
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip(): continue
+            try: prefs = preferences_from_record(json.loads(line), "warm")
+            except ValueError as e: # Includes JSON and pydantic errors
+                logging.warning(f"Skipping usage log line {line_number}: {e}"); continue
+            key = preferences_fingerprint(prefs)
+            counts[key] += 1; samples.setdefault(key, prefs)
+    logging.info(f"Usage log {path}: {sum(counts.values())} requests over {len(counts)} distinct profiles.")
+    return [samples[key] for key, _ in counts.most_common(top)]
+
+def profiles_from_list(path: str) -> list[UserPreferences]:
+    """Profiles from a .jsonl/.csv preference file (same format as batch.py input)."""
+    profiles = []
+    for record_id, record in load_preference_records(path):
+        try: profiles.append(preferences_from_record(record, record_id))
+        except ValueError as e: logging.warning(f"Skipping record {record_id}: {e}")
+    return profiles
+
+def profiles_from_grid(locations: list[str], activity_sets: list[str]) -> list[UserPreferences]:
+    """Every climate/budget/pace combination of the Streamlit form for each location and activity set."""
+    profiles = []
+    for location, activities, climate, budget, pace in itertools.product(locations, activity_sets, CLIMATE_OPTIONS, BUDGET_OPTIONS, PACE_OPTIONS):
+        activity_list = [a.strip().lower() for a in activities.split(",") if a.strip()]
+        profiles.append(UserPreferences(name="warm", location=location.strip(), climate_preference=climate, activity_preferences=activity_list, budget=budget, travel_pace=pace))
+    return profiles
+
+
+# --- Warming ---
+def warm_cache(client, profiles: list[UserPreferences], workers: int = 4, requests_per_minute: float = 30) -> dict:
+    """Generates and caches itineraries for profiles that are not cached yet."""
+    cache = get_default_cache()
+    unique = {preferences_fingerprint(p): p for p in profiles}
+    pending = [p for key, p in unique.items() if not cache.peek(key)] # peek: checking shouldn't skew hit/miss stats or LRU order
+    stats = {"profiles": len(unique), "already_cached": len(unique) - len(pending), "warmed": 0, "failed": 0}
+    logging.info(f"Warming {len(pending)} profiles ({stats['already_cached']} already cached, workers={workers}, rpm={requests_per_minute}).")
+    if not cache.cache_dir:
+        logging.warning("ITINERARY_CACHE_DIR is not set: warmed itineraries only live in this process and won't reach the app.")
+
+    limiter = RateLimiter(requests_per_minute)
+    def generate(prefs: UserPreferences):
+        limiter.acquire()
+        return make_decision_cached(client, prefs, cache=cache)
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(generate, prefs) for prefs in pending]
+        for done, future in enumerate(as_completed(futures), 1):
+            try: ok = future.result() is not None
+            except Exception as e:
+                logging.error(f"Warming failed: {e}"); ok = False
+            stats["warmed" if ok else "failed"] += 1
+            if done % 10 == 0 or done == len(futures): logging.info(f"Warm progress: {done}/{len(futures)} ({stats['failed']} failed).")
+    stats["elapsed_seconds"] = round(time.perf_counter() - start_time, 2)
+    logging.info(f"Cache warming finished: {stats}")
+    return stats
+
+def seconds_until(hhmm: str) -> float:
+    """Seconds from now until the next local occurrence of HH:MM."""
+    hour, minute = (int(part) for part in hhmm.split(":"))
+    now = datetime.now()
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now: target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate itineraries for popular preference profiles into the itinerary cache.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--usage-log", help="JSONL usage log (ITINERARY_USAGE_LOG); the most frequent profiles are warmed")
+    source.add_argument("--list", dest="list_path", help="Preference file (.jsonl or .csv) listing the profiles to warm")
+    source.add_argument("--grid", action="store_true", help="Warm all 27 climate/budget/pace combinations of the web form")
+    parser.add_argument("--top", type=int, default=50, help="With --usage-log: how many of the most frequent profiles to warm")
+    parser.add_argument("--locations", nargs="+", default=[], help="With --grid: starting locations")
+    parser.add_argument("--activities", nargs="+", default=["food, art"], help="With --grid: comma-separated activity sets, one argument each")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum parallel LLM calls")
+    parser.add_argument("--rpm", type=float, default=30, help="Client-side limit on LLM requests per minute (0 = unlimited)")
+    parser.add_argument("--at", help="Wait until this local time (HH:MM) before warming, e.g. an off-peak hour")
+    parser.add_argument("--every-hours", type=float, default=0, help="Repeat warming at this interval (0 = run once); usually combined with --at")
+    args = parser.parse_args()
+    if args.grid and not args.locations: parser.error("--grid needs at least one --locations value")
+
+    load_environment()
+    client = initialize_client()
+    if not client:
+        print("❌ Gemini client failed to initialize. Please check API key and configuration. Exiting.")
+        sys.exit(1)
+
+    if args.at:
+        wait = seconds_until(args.at)
+        logging.info(f"Waiting {wait / 3600:.1f}h until {args.at} to start warming.")
+        time.sleep(wait)
+
+    while True:
+        # Re-read the source each round so a growing usage log picks up new popular profiles
+        if args.usage_log: profiles = profiles_from_usage_log(args.usage_log, args.top)
+        elif args.list_path: profiles = profiles_from_list(args.list_path)
+        else: profiles = profiles_from_grid(args.locations, args.activities)
+        stats = warm_cache(client, profiles, workers=max(1, args.workers), requests_per_minute=args.rpm)
+        print(f"\nWarmed {stats['warmed']} itineraries ({stats['already_cached']} already cached, {stats['failed']} failed) in {stats['elapsed_seconds']}s.")
+        if args.every_hours <= 0: break
+        time.sleep(args.every_hours * 3600)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+# Tests import the app as `src.` modules, like the entry points do when run from this folder.
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
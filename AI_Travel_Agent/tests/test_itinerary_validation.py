@@ -0,0 +1,62 @@
+import json
+
+from src.core import decision_making
+from src.core.decision_making import ItineraryResponseValidator, _parse_candidate, parse_itinerary_response
+
+DESTINATION = {"name": "Porto, Portugal", "why_it_fits": ["fits"], "suggested_activities": ["walk"], "food_highlights": ["fish"],
+               "transportation_notes": ["tram"], "sample_daily_focus": ["Day 1: Ribeira"], "estimated_cost_level": "Medium",
+               "suggested_duration_days": "3 days", "suggested_accommodation_type": "Guesthouses", "potential_day_trip": None}
+VALID = json.dumps({"destinations": [DESTINATION], "overall_reasoning": "Good food and a relaxed pace."})
+
+
+class Response:
+    def __init__(self, text: str):
+        self.text = text
+        self.parts = [text] if text else []
+
+
+def test_object_inside_an_array_is_extracted():
+    assert _parse_candidate("[" + VALID + "]")[0] is not None
+
+def test_json_array_or_scalar_is_invalid_not_an_exception(monkeypatch):
+    monkeypatch.setattr(decision_making, "extract_json_string", lambda text: text) # An extractor that lets non-objects through
+    for text in ("[1, 2]", "42", '"text"'):
+        assert _parse_candidate(text) == (None, "validation_error")
+        assert ItineraryResponseValidator()(Response(text)) is False
+
+def test_parse_itinerary_response_reports_a_non_object_instead_of_raising(monkeypatch):
+    reported = []
+    monkeypatch.setattr(decision_making, "extract_json_string", lambda text: text)
+    monkeypatch.setattr(decision_making, "_report_error", reported.append)
+    assert parse_itinerary_response("[1, 2]") is None and reported
+
+def test_validator_hands_back_the_itinerary_it_parsed(monkeypatch):
+    validator, response = ItineraryResponseValidator(), Response(VALID)
+    assert validator(response) is True
+    monkeypatch.setattr(decision_making, "_parse_candidate", lambda text: (_ for _ in ()).throw(AssertionError("parsed twice")))
+    assert validator.parsed(response).destinations[0].name == "Porto, Portugal"
+    assert validator.parsed(Response(VALID)) is None # Only the response it validated
+    assert validator(Response("")) is False
+
+def test_make_decision_async_escalates_through_the_cascade(monkeypatch):
+    import asyncio
+    from src.core.perception import UserPreferences
+
+    rich = {**DESTINATION, "why_it_fits": ["fits", "mild"], "suggested_activities": ["walk", "tram", "port"],
+            "food_highlights": ["fish", "tarts"], "sample_daily_focus": ["Day 1: Ribeira", "Day 2: Douro"]}
+    good = json.dumps({"destinations": [{**rich, "name": name} for name in ("Porto, Portugal", "Seville, Spain", "Bologna, Italy")],
+                       "overall_reasoning": "Good food and a relaxed pace."})
+
+    class Gateway:
+        async def generate_hedged_async(self, model, contents, call_site="default", validate=None, **kwargs):
+            response = Response("not json" if model == "cheap" else good)
+            validate(response)
+            return response
+
+    cascade = decision_making.ModelCascade(["cheap", "strong"], lambda name: name)
+    monkeypatch.setattr(decision_making, "get_gateway", Gateway)
+    monkeypatch.setattr(decision_making, "get_model_cascade", lambda: cascade)
+    itinerary = asyncio.run(decision_making.make_decision_async(object(), UserPreferences(name="Ann", location="Lisbon", climate_preference="moderate", activity_preferences=["food"], budget="medium", travel_pace="relaxed")))
+    assert itinerary is not None and itinerary.destinations[0].name == "Porto, Portugal"
+    stats = cascade.stats()
+    assert stats["cheap"]["escalations"] == {"extraction_error": 1} and stats["strong"]["accepted"] == 1
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from src.core.decision_making import extract_json_string, find_json_object_spans
+
+
+def spans_text(text: str) -> list[str]:
+    return [text[start:end] for start, end in find_json_object_spans(text)]
+
+
+def test_braces_inside_strings_do_not_end_the_object():
+    text = '{"a": "}{ not structure }", "b": {"c": "{"}}'
+    assert spans_text(text) == [text]
+    assert json.loads(spans_text(text)[0])["b"]["c"] == "{"
+
+def test_escaped_quotes_inside_strings_are_skipped():
+    text = r'{"quote": "she said \"}\" and left", "n": 1}'
+    assert spans_text(text) == [text]
+
+def test_escaped_backslash_before_closing_quote():
+    text = r'{"path": "C:\\", "next": "}"}'
+    assert spans_text(text) == [text]
+    assert json.loads(text)["next"] == "}"
+
+def test_quotes_in_prose_outside_objects_are_ignored():
+    text = 'He said "use {braces}" then: {"ok": true} and "done'
+    assert spans_text(text) == ["{braces}", '{"ok": true}']
+
+def test_every_top_level_object_is_found_and_nested_ones_are_not():
+    text = 'first {"a": {"b": 1}} then {"c": [{"d": 2}]}'
+    assert spans_text(text) == ['{"a": {"b": 1}}', '{"c": [{"d": 2}]}']
+
+def test_truncated_trailing_object_is_not_reported():
+    text = '{"done": 1} {"cut": "off in the mid'
+    assert spans_text(text) == ['{"done": 1}']
+
+def test_extract_json_string_prefers_the_largest_object_in_fenced_output():
+    payload = {"destinations": [{"name": "Kyoto {Japan}"}], "overall_reasoning": "braces } in text"}
+    text = 'Sure! Example: {"x": 1}\n```json\n' + json.dumps(payload) + "\n```"
+    assert json.loads(extract_json_string(text)) == payload
+
+def test_extract_json_string_raises_without_an_object():
+    with pytest.raises(ValueError):
+        extract_json_string("no json here")
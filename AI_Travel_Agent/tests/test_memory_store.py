@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from src.core.decision_making import DestinationDetail, Itinerary
+from src.core.memory import HistoryEntry, InMemoryBackend, MemoryBackend, MemoryStore, SQLiteBackend, UserMemory
+from src.core.perception import UserPreferences
+
+PREFS = UserPreferences(name="Ann", location="Lisbon", climate_preference="moderate", activity_preferences=["food"], budget="medium", travel_pace="relaxed")
+
+
+def itinerary(*names: str) -> Itinerary:
+    return Itinerary(destinations=[DestinationDetail(
+        name=name, why_it_fits=["fits"], suggested_activities=["walk"], food_highlights=["fish"], transportation_notes=["train"],
+        estimated_cost_level="medium", suggested_duration_days="3 days", suggested_accommodation_type="hotel",
+        potential_day_trip="coast", sample_daily_focus=["old town"]) for name in names], overall_reasoning="because")
+
+def memory(*recent: str) -> UserMemory:
+    return UserMemory(preferences=PREFS, recent_destinations=list(recent))
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def backend(request, tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "memory.db")) if request.param == "sqlite" else InMemoryBackend()
+    yield backend
+    backend.close()
+
+@pytest.fixture
+def store(backend):
+    store = MemoryStore(backend, flush_interval=3600) # Flush only when a test asks for it
+    yield store
+    store.close()
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        MemoryBackend()
+
+def test_writes_are_buffered_until_flush(store, backend):
+    store.put("ann", memory("Porto"))
+    assert store.get("ann").recent_destinations == ["Porto"]
+    assert backend.get("ann") is None
+    assert store.flush() == 1
+    assert backend.get("ann").recent_destinations == ["Porto"]
+    assert store.stats()["pending_writes"] == 0
+
+def test_recent_merges_pending_writes_without_flushing(store, backend):
+    store.put("ann", memory()); store.put("bob", memory()); store.flush()
+    store.put("cid", memory()); store.put("ann", memory("Porto"))
+    assert [user_id for user_id, _ in store.recent(10)] == ["ann", "cid", "bob"]
+    assert dict(store.recent(10))["ann"].recent_destinations == ["Porto"] # The pending copy, not the stored one
+    assert store.stats()["pending_writes"] == 2
+    assert [user_id for user_id, _ in store.recent(2)] == ["ann", "cid"]
+
+class BlockingBackend(InMemoryBackend):
+    """put_many waits until the test lets it write."""
+
+    def __init__(self):
+        super().__init__()
+        self.writing, self.release = threading.Event(), threading.Event()
+
+    def put_many(self, items):
+        self.writing.set(); self.release.wait(5)
+        super().put_many(items)
+
+def test_reads_see_a_batch_while_it_is_being_written():
+    backend = BlockingBackend()
+    InMemoryBackend.put_many(backend, [("ann", memory("Lisbon"))]) # The stale stored row
+    store = MemoryStore(backend, max_entries=1, flush_interval=3600)
+    store.put("ann", memory("Porto")); store.put("bob", memory()) # Evicts ann from the read cache
+    flusher = threading.Thread(target=store.flush); flusher.start()
+    try:
+        assert backend.writing.wait(5)
+        assert store.get("ann").recent_destinations == ["Porto"]
+        assert dict(store.recent(10))["ann"].recent_destinations == ["Porto"]
+        assert store.stats()["pending_writes"] == 2
+    finally:
+        backend.release.set(); flusher.join(5); store.close()
+    assert store.stats()["pending_writes"] == 0 and backend.get("ann").recent_destinations == ["Porto"]
+
+def test_concurrent_updates_are_not_lost(store):
+    store.put("ann", memory())
+    def add(n: int): store.update("ann", lambda current: memory(*current.recent_destinations, f"city {n}"))
+    threads = [threading.Thread(target=add, args=(n,)) for n in range(40)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join(5)
+    assert len(store.get("ann").recent_destinations) == 40
+
+def test_prune_drops_history_of_pruned_users(backend):
+    store = MemoryStore(backend, flush_interval=3600, max_users=1)
+    backend.add_itinerary("old", HistoryEntry(content_hash="h1", fingerprint="f", itinerary=itinerary("Rome"), created_at=1.0))
+    store.put("old", memory("Rome")); store.flush()
+    backend.add_itinerary("new", HistoryEntry(content_hash="h2", fingerprint="f", itinerary=itinerary("Rome"), created_at=2.0))
+    store.put("new", memory("Rome")); store.flush()
+
+    assert backend.get("old") is None and backend.user_history("old", 10) == []
+    assert [user_id for user_id, _ in backend.find_by_destination("rome", 10)] == ["new"]
+    assert len(backend.user_history("new", 10)) == 1
+    store.close()
+
+def test_history_deduplicates_by_content(backend):
+    entry = HistoryEntry(content_hash="h", fingerprint="f", itinerary=itinerary("Kyoto"), created_at=1.0)
+    assert backend.add_itinerary("ann", entry) is True
+    assert backend.add_itinerary("ann", entry.model_copy(update={"created_at": 5.0})) is False
+    assert [e.created_at for e in backend.user_history("ann", 10)] == [5.0]
+    assert backend.latest_itinerary("ann", "f").itinerary.destinations[0].name == "Kyoto"
@@ -0,0 +1,89 @@
+import re
+
+import pytest
+from fpdf import FPDF
+
+from src.core.pdf_export import MergedPdfSink, ZipSink
+
+
+def make_pdf(pages: int, label: str) -> bytes:
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=12)
+    for n in range(pages):
+        pdf.add_page(); pdf.cell(0, 10, f"{label} page {n + 1}")
+    return bytes(pdf.output())
+
+def read_xref(data: bytes) -> tuple[dict[int, int], int, bytes]:
+    """Offsets of in-use objects from the final xref table, its entry count, and the trailer dictionary."""
+    xref_at = int(re.search(rb"startxref\s+(\d+)\s+%%EOF\s*$", data).group(1))
+    assert data[xref_at:xref_at + 4] == b"xref"
+    header = re.compile(rb"xref\s+0 (\d+)\s+").match(data, xref_at)
+    size = int(header.group(1))
+    entries = [data[header.end() + 20 * n:header.end() + 20 * (n + 1)] for n in range(size)]
+    assert all(len(entry) == 20 for entry in entries)
+    offsets = {n: int(entry[:10]) for n, entry in enumerate(entries) if entry[17:18] == b"n"}
+    trailer = data[header.end() + 20 * size:]
+    assert trailer.startswith(b"trailer")
+    return offsets, size, trailer
+
+def obj(data: bytes, number: int, offsets: dict[int, int]) -> bytes:
+    start = offsets[number]
+    return data[start:data.index(b"endobj", start)]
+
+
+@pytest.fixture
+def merged(tmp_path):
+    path = tmp_path / "merged.pdf"
+    sink = MergedPdfSink(str(path))
+    for pages, label in ((2, "first"), (3, "second"), (1, "third")):
+        sink.add(label, make_pdf(pages, label))
+    sink.close()
+    return path.read_bytes()
+
+
+def test_xref_offsets_point_at_their_objects(merged):
+    offsets, size, trailer = read_xref(merged)
+    assert int(re.search(rb"/Size (\d+)", trailer).group(1)) == size > max(offsets)
+    for number, offset in offsets.items():
+        assert merged[offset:].startswith(b"%d 0 obj" % number), number
+
+def test_every_reference_resolves_to_an_object(merged):
+    offsets, _, _ = read_xref(merged)
+    referenced = {int(n) for n in re.findall(rb"(\d+) 0 R\b", merged)}
+    assert referenced <= set(offsets)
+
+def test_page_tree_counts_every_input_page(merged):
+    offsets, _, trailer = read_xref(merged)
+    catalog = obj(merged, int(re.search(rb"/Root (\d+) 0 R", trailer).group(1)), offsets)
+    root_pages = obj(merged, int(re.search(rb"/Pages (\d+) 0 R", catalog).group(1)), offsets)
+    assert int(re.search(rb"/Count (\d+)", root_pages).group(1)) == 6
+    kids = [int(n) for n in re.findall(rb"(\d+) 0 R", re.search(rb"/Kids \[([^\]]*)\]", root_pages).group(1))]
+    assert [int(re.search(rb"/Count (\d+)", obj(merged, kid, offsets)).group(1)) for kid in kids] == [2, 3, 1]
+    assert all(b"/Parent 1 0 R" in obj(merged, kid, offsets) for kid in kids)
+    assert len(re.findall(rb"/Type /Page\b(?!s)", merged)) == 6
+
+def test_only_the_merged_catalog_remains(merged):
+    assert merged.count(b"/Type /Catalog") == 1
+    assert merged.startswith(b"%PDF-") and merged.rstrip().endswith(b"%%EOF")
+
+def test_stream_bodies_are_copied_byte_for_byte(tmp_path):
+    source = make_pdf(1, "only")
+    path = tmp_path / "one.pdf"
+    sink = MergedPdfSink(str(path)); sink.add("only", source); sink.close()
+    streams = lambda data: re.findall(rb"stream\r?\n(.*?)\r?\nendstream", data, re.S)
+    assert streams(path.read_bytes()) == streams(source)
+
+def test_input_without_catalog_is_rejected(tmp_path):
+    sink = MergedPdfSink(str(tmp_path / "bad.pdf"))
+    with pytest.raises(ValueError):
+        sink.add("bad", b"%PDF-1.3\n1 0 obj\n<<>>\nendobj\ntrailer\n<<>>\n%%EOF\n")
+    sink.close()
+
+def test_zip_sink_deduplicates_member_names(tmp_path):
+    import zipfile
+    path = tmp_path / "out.zip"
+    sink = ZipSink(str(path))
+    for name in ("Ann Lee", "Ann Lee", "../x"):
+        sink.add(name, make_pdf(1, name))
+    sink.close()
+    assert zipfile.ZipFile(path).namelist() == ["Ann_Lee.pdf", "Ann_Lee_2.pdf", "x.pdf"]
@@ -0,0 +1,17 @@
+from src.core.decision_making import DestinationDetail, Itinerary
+from src.core.pdf_service import PdfRenderService
+
+ITINERARY = Itinerary(destinations=[DestinationDetail(name="Porto, Portugal", why_it_fits=["Mild"], suggested_activities=["Ribeira walk"], food_highlights=["Francesinha"],
+                                                      transportation_notes=["Metro"], sample_daily_focus=["Day 1: Old town"], estimated_cost_level="Medium",
+                                                      suggested_duration_days="3 days", suggested_accommodation_type="Guesthouses", potential_day_trip=None)],
+                      overall_reasoning="Good food and a relaxed pace.")
+
+
+def test_process_pool_does_not_fork_the_threaded_server():
+    service = PdfRenderService(max_workers=1, use_processes=True)
+    try:
+        assert service._executor._mp_context.get_start_method() in ("forkserver", "spawn")
+        pdf_bytes = service.submit(ITINERARY).result(timeout=60)
+        assert pdf_bytes.startswith(b"%PDF") and service.cached(ITINERARY) == pdf_bytes
+    finally:
+        service.shutdown()
@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.core import itinerary_cache, memory
+from src.core.decision_making import DestinationDetail, Itinerary
+from src.core.itinerary_cache import ItineraryCache, cache_key
+from src.core.perception import UserPreferences, preferences_fingerprint
+from src.core.preference_index import PreferenceIndex, embed_preferences, rebuild_index
+
+
+def prefs(*activities: str, location: str = "Lisbon", budget: str = "medium") -> UserPreferences:
+    return UserPreferences(name="Ann", location=location, climate_preference="moderate", activity_preferences=list(activities), budget=budget, travel_pace="relaxed")
+
+def itinerary(name: str) -> Itinerary:
+    return Itinerary(destinations=[DestinationDetail(
+        name=name, why_it_fits=["fits"], suggested_activities=["walk"], food_highlights=["fish"], transportation_notes=["train"],
+        estimated_cost_level="medium", suggested_duration_days="3 days", suggested_accommodation_type="hotel",
+        potential_day_trip="coast", sample_daily_focus=["old town"])], overall_reasoning="because")
+
+
+def test_synonyms_match_and_different_intents_do_not():
+    index = PreferenceIndex(threshold=0.92)
+    index.add(prefs("hiking", "food"), itinerary("Sintra"))
+    assert index.lookup(prefs("food", "trekking"))[0].destinations[0].name == "Sintra"
+    for other in (("walking", "food"), ("hiking", "cuisine", "nightlife")):
+        assert index.lookup(prefs(*other)) is None
+    assert (embed_preferences(prefs("swimming")) @ embed_preferences(prefs("beach"))) < 0.5
+    assert (embed_preferences(prefs("party")) @ embed_preferences(prefs("nightlife"))) < 0.5
+    assert index.stats()["hits"] == 1 and index.stats()["misses"] == 2
+
+def test_rebuild_from_disk_cache_and_history(tmp_path, monkeypatch):
+    cache = ItineraryCache(cache_dir=str(tmp_path))
+    cached = prefs("art", "museums")
+    cache.set(cache_key(cached), itinerary("Porto"), cached)
+    cache.set(cache_key(cached, ["Porto"]), itinerary("Braga"), None) # Avoid-variant entries are not profiles
+    cache.set("legacy", itinerary("Faro")) # Written before preferences were stored
+    saved = prefs("surfing", location="Peniche")
+    monkeypatch.setattr(itinerary_cache, "get_default_cache", lambda: cache)
+    monkeypatch.setattr(memory, "list_profile_itineraries", lambda limit: [(saved, itinerary("Ericeira"))])
+
+    index = PreferenceIndex(threshold=0.92)
+    assert rebuild_index(index) == 2
+    assert index.lookup(prefs("museum", "art"))[0].destinations[0].name == "Porto"
+    assert index.lookup(prefs("surfing", location="Peniche"))[0].destinations[0].name == "Ericeira"
+    assert index.closest(prefs("opera", budget="high"))[0].destinations[0].name == "Porto" # The degraded-mode stand-in
+
+def test_rebuild_survives_a_broken_source(tmp_path, monkeypatch):
+    def broken(limit): raise OSError("database is locked")
+    cache = ItineraryCache(cache_dir=str(tmp_path))
+    cache.set(preferences_fingerprint(prefs("art")), itinerary("Porto"), prefs("art"))
+    monkeypatch.setattr(itinerary_cache, "get_default_cache", lambda: cache)
+    monkeypatch.setattr(memory, "list_profile_itineraries", broken)
+    index = PreferenceIndex()
+    assert rebuild_index(index) == 1 and len(index) == 1
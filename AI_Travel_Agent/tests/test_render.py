@@ -0,0 +1,24 @@
+import gc
+
+from src.core import render
+from src.core.decision_making import Itinerary
+from src.core.memory import itinerary_content_hash
+from src.core.render import document_key, get_default_renderer, itinerary_key
+
+
+def make_itinerary(reasoning: str = "Good food and a relaxed pace.") -> Itinerary:
+    return Itinerary(destinations=[], overall_reasoning=reasoning)
+
+
+def test_content_hash_is_computed_once_per_itinerary(monkeypatch):
+    hashed = []
+    monkeypatch.setattr(render, "itinerary_content_hash", lambda itinerary: hashed.append(itinerary) or itinerary_content_hash(itinerary))
+    itinerary = make_itinerary()
+    for _ in range(3): get_default_renderer().document(itinerary)
+    assert len(hashed) == 1 and document_key(itinerary) == itinerary_content_hash(itinerary)
+
+def test_equal_itineraries_share_a_key_and_dead_ones_are_forgotten():
+    first, second = make_itinerary(), make_itinerary()
+    assert itinerary_key(first) == itinerary_key(second) != itinerary_key(make_itinerary("Other reasoning entirely."))
+    ident = id(first); del first; gc.collect()
+    assert ident not in render._content_keys
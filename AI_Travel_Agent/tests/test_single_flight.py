@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from src.core.itinerary_cache import SingleFlight
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_concurrent_callers_share_one_call():
+    flight, release, calls, results = SingleFlight(), threading.Event(), [], []
+
+    def work():
+        calls.append(1); release.wait(5)
+        return "itinerary"
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", work))) for _ in range(5)]
+    threads[0].start(); wait_until(lambda: calls)
+    for thread in threads[1:]: thread.start()
+    wait_until(lambda: flight.coalesced == 4)
+    release.set()
+    for thread in threads: thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results, key=lambda r: r[1]) == [("itinerary", False)] + [("itinerary", True)] * 4
+    assert flight.in_flight() == 0
+
+def test_followers_receive_the_leaders_error():
+    flight, release, errors = SingleFlight(), threading.Event(), []
+
+    def work():
+        release.wait(5); raise RuntimeError("LLM failed")
+
+    def call():
+        try: flight.do("key", work)
+        except RuntimeError as e: errors.append(e)
+
+    leader = threading.Thread(target=call); leader.start()
+    wait_until(lambda: flight.in_flight() == 1)
+    follower = threading.Thread(target=call); follower.start()
+    wait_until(lambda: flight.coalesced == 1)
+    release.set(); leader.join(5); follower.join(5)
+
+    assert len(errors) == 2 and errors[0] is errors[1]
+    assert flight.in_flight() == 0
+
+def test_a_finished_flight_is_not_reused():
+    flight = SingleFlight()
+    assert flight.do("key", lambda: 1) == (1, False)
+    assert flight.do("key", lambda: 2) == (2, False)
+    assert flight.coalesced == 0
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: "a")[0] == "a" and flight.do("b", lambda: "b")[0] == "b"
+
+@pytest.mark.parametrize("followers", [1, 3])
+def test_async_followers_join_a_sync_leader(followers):
+    import asyncio
+    flight, release, calls = SingleFlight(), threading.Event(), []
+
+    def work():
+        calls.append(1); release.wait(5)
+        return "shared"
+
+    leader_result = []
+    leader = threading.Thread(target=lambda: leader_result.append(flight.do("key", work))); leader.start()
+    wait_until(lambda: calls)
+
+    async def follow():
+        async def never_called(): raise AssertionError("follower ran its own call")
+        return await asyncio.gather(*(flight.do_async("key", never_called) for _ in range(followers)))
+
+    loop_results = []
+    follower = threading.Thread(target=lambda: loop_results.extend(asyncio.run(follow()))); follower.start()
+    wait_until(lambda: flight.coalesced == followers)
+    release.set(); leader.join(5); follower.join(5)
+    assert leader_result == [("shared", False)] and loop_results == [("shared", True)] * followers
@@ -0,0 +1,48 @@
+import threading
+
+from src.core import decision_making, speculation
+from src.core.perception import UserPreferences
+from src.core.speculation import Speculator
+
+PREFS = UserPreferences(name="Ann", location="Lisbon", climate_preference="moderate", activity_preferences=["food"], budget="medium", travel_pace="relaxed")
+
+
+class EmptyCache:
+    def peek(self, key): return None
+
+
+def speculator(monkeypatch, generate, **kwargs) -> Speculator:
+    monkeypatch.setattr(speculation, "get_default_cache", EmptyCache)
+    monkeypatch.setattr(speculation, "llm_unavailable", lambda: False)
+    monkeypatch.setattr(speculation, "make_decision_cached", generate)
+    return Speculator(**kwargs)
+
+
+def test_unresolved_sessions_expire_as_wasted(monkeypatch):
+    spec = speculator(monkeypatch, lambda client, variant: None, max_workers=4, variants=2, session_ttl=60)
+    clock = [1000.0]
+    monkeypatch.setattr(speculation.time, "time", lambda: clock[0])
+    spec.speculate(None, PREFS, "closed-tab")
+    clock[0] += 61
+    spec.speculate(None, PREFS.model_copy(update={"climate_preference": "cold"}), "other")
+    assert "closed-tab" not in spec._sessions and spec.stats()["wasted"] == 2
+
+def test_start_over_resolution_counts_the_round_as_wasted(monkeypatch):
+    spec = speculator(monkeypatch, lambda client, variant: None, max_workers=4, variants=2)
+    spec.speculate(None, PREFS, "session")
+    spec.resolve("session", None)
+    assert spec._sessions == {} and spec.stats()["wasted"] == 2
+
+def test_background_reports_never_reach_streamlit(monkeypatch):
+    shown, reported, done = [], [], threading.Event()
+    monkeypatch.setattr("builtins.print", shown.append)
+
+    def generate(client, variant):
+        decision_making.report_to_user("blocked")
+        reported.append(threading.current_thread().name); done.set()
+
+    spec = speculator(monkeypatch, generate, max_workers=1, variants=1)
+    spec.speculate(None, PREFS, "session")
+    assert done.wait(5) and reported[0].startswith("speculate") and shown == []
+    decision_making.report_to_user("shown") # The caller's thread still reports
+    assert shown == ["shown"]
@@ -0,0 +1,23 @@
+import pytest
+
+from src import warm_cache
+from src.core.itinerary_cache import ItineraryCache
+from src.core.perception import preferences_fingerprint, preferences_from_record
+
+RECORD = {"location": " Lisbon ", "climate_preference": "Moderate", "activity_preferences": "Food; art", "budget": "medium", "travel_pace": "relaxed"}
+
+
+def test_preferences_from_record_normalizes_csv_cells():
+    prefs = preferences_from_record(RECORD, "7")
+    assert (prefs.name, prefs.location, prefs.climate_preference, prefs.activity_preferences) == ("7", "Lisbon", "moderate", ["food", "art"])
+    with pytest.raises(ValueError): preferences_from_record({**RECORD, "budget": " "}, "8")
+
+def test_pending_check_does_not_count_as_cache_traffic(monkeypatch):
+    cache = ItineraryCache(max_entries=10, ttl_seconds=0)
+    monkeypatch.setattr(warm_cache, "get_default_cache", lambda: cache)
+    generated = []
+    monkeypatch.setattr(warm_cache, "make_decision_cached", lambda client, prefs, **kwargs: generated.append(prefs))
+    prefs = preferences_from_record(RECORD, "warm")
+    stats = warm_cache.warm_cache(None, [prefs, prefs], workers=1, requests_per_minute=0)
+    assert stats["profiles"] == 1 and len(generated) == 1 and (cache.hits, cache.misses) == (0, 0)
+    assert preferences_fingerprint(generated[0]) == preferences_fingerprint(prefs)
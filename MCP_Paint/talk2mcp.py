@@ -14,6 +14,11 @@ from google.generativeai import configure
 from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
 
+# Shared Gemini gateway (rate limiting, retries, metrics) lives in ../shared
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from gemini_gateway import get_gateway
+from llm_replay import replay_settings, wrap_model
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -21,7 +26,7 @@ load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 if not api_key:
     api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
+    if not api_key and replay_settings()["mode"] != "replay":  # Replay runs offline
         raise ValueError(
             "Neither GEMINI_API_KEY nor GOOGLE_API_KEY found in environment variables or .env file."
         )
@@ -32,8 +37,8 @@ except Exception as config_error:
     print(f"Error configuring Google AI SDK: {config_error}")
     raise
 
-# Initialize the client
-client = genai.GenerativeModel(
+# Initialize the client (wrapped for LLM_REPLAY_MODE=record/replay/auto)
+client = wrap_model(genai.GenerativeModel(
     model_name="gemini-2.0-flash",
     safety_settings={
         "HARASSMENT": "block_none",
@@ -41,7 +46,7 @@ client = genai.GenerativeModel(
         "SEXUAL": "block_none",
         "DANGEROUS": "block_none",
     },
-)
+))
 
 # Global state variables
 max_iterations = 8
@@ -81,8 +86,10 @@ async def generate_with_timeout(model_client, prompt_list, timeout=30):
             loop.run_in_executor(
                 None,
                 partial(
-                    model_client.generate_content,
-                    contents=prompt_list,
+                    get_gateway().generate,
+                    model_client,
+                    prompt_list,
+                    call_site="talk2mcp",
                     request_options={"timeout": timeout},
                 ),
             ),
@@ -614,6 +621,7 @@ IMPORTANT RULES:
         traceback.print_exc()
     finally:
         print("Cleaning up...")
+        print(f"Gemini calls:\n{get_gateway().format_metrics()}")
         print("Main execution finished.")
 
 
@@ -13,6 +13,13 @@ from config import *
 import asyncio
 import random
 import re
+import os
+import sys
+
+# Shared Gemini gateway (rate limiting, retries, metrics) lives in ../shared
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from gemini_gateway import CircuitOpenError, get_gateway
+from llm_replay import wrap_model
 
 # Configure detailed logging
 logging.basicConfig(
@@ -50,7 +57,7 @@ def log_api_call(api_name, endpoint, params=""):
 log_step("Initialization", "Initializing APIs and configurations")
 cg = CoinGeckoAPI()
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel(GEMINI_MODEL)
+model = wrap_model(genai.GenerativeModel(GEMINI_MODEL))  # LLM_REPLAY_MODE=record/replay/auto for offline runs
 logging.info("APIs initialized successfully")
 
 class BitcoinBot:
@@ -125,7 +132,7 @@ class BitcoinBot:
         2. Key technical indicators
         3. Suggested areas to investigate
         """
-        response = model.generate_content(prompt)
+        response = await get_gateway().generate_async(model, prompt, call_site="analyze_market_data")
         analysis = response.text
         self.conversation_history.append({"role": "agent1", "content": analysis})
         logging.info(f"Market analysis completed:\n{analysis}")
@@ -155,7 +162,7 @@ class BitcoinBot:
         2. Potential price impacts
         3. Key risks and opportunities
         """
-        response = model.generate_content(prompt)
+        response = await get_gateway().generate_async(model, prompt, call_site="analyze_news_impact")
         analysis = response.text
         self.conversation_history.append({"role": "agent2", "content": analysis})
         logging.info(f"News impact analysis completed:\n{analysis}")
@@ -182,7 +189,7 @@ class BitcoinBot:
         3. Recommendation
         4. Risk Factors
         """
-        response = model.generate_content(prompt)
+        response = await get_gateway().generate_async(model, prompt, call_site="final_recommendation")
         recommendation = response.text
         self.conversation_history.append({"role": "agent3", "content": recommendation})
         logging.info(f"Final recommendation generated:\n{recommendation}")
@@ -224,10 +231,25 @@ class BitcoinBot:
             log_step("Analysis Complete", "All agents have completed their analysis")
             return self.format_final_response(final_recommendation)
             
+        except CircuitOpenError as e:
+            logging.warning(f"Gemini unavailable, replying with market data only: {e}")
+            return self.market_data_only(price)
         except Exception as e:
             logging.error(f"Error in analysis workflow: {str(e)}")
             raise
 
+    def market_data_only(self, current_price):
+        """Reply used while Gemini is unavailable (circuit breaker open): figures only, no AI analysis."""
+        lines = ["⚠️ AI analysis is temporarily unavailable. Market data only:"]
+        if current_price is not None:
+            lines.append(f"Current Bitcoin Price: ${current_price:,.2f}")
+        if self.last_price and current_price is not None:
+            lines.append(f"Change since last check: {(current_price - self.last_price) / self.last_price:.2%}")
+        lines.append(f"Alert threshold: ${self.price_threshold:,.2f}")
+        retry_after = get_gateway().breaker.retry_after()
+        if retry_after: lines.append(f"AI analysis should be back in about {retry_after:.0f}s.")
+        return "\n".join(lines)
+
     def format_final_response(self, recommendation):
         """Format the final response with HTML for Telegram."""
         def format_section(text):
@@ -335,6 +357,9 @@ class BitcoinBot:
             if current_price is None:
                 await update.message.reply_text("Unable to fetch current price. Please try again later.")
                 return
+            if get_gateway().breaker.is_open(): # Fail fast instead of waiting on a doomed Gemini call
+                await update.message.reply_text(self.market_data_only(current_price))
+                return
 
             # Get historical data for analysis
             historical_data = await self.get_historical_data()
@@ -379,7 +404,7 @@ class BitcoinBot:
             Keep the response concise and easy to read. Use bullet points and emojis for better readability.
             """
 
-            response = model.generate_content(prompt)
+            response = await get_gateway().generate_async(model, prompt, call_site="suggest_threshold")
             
             # Format the response for better readability
             formatted_response = response.text
@@ -416,6 +441,8 @@ class BitcoinBot:
                     "Could not parse suggested threshold. Please set manually using /setthreshold <price>"
                 )
 
+        except CircuitOpenError:
+            await update.message.reply_text(self.market_data_only(current_price))
         except Exception as e:
             logging.error(f"Error in suggest_threshold: {e}")
             await update.message.reply_text("Error generating threshold suggestion. Please try again later.")
@@ -467,8 +494,8 @@ class BitcoinBot:
         except Exception as e:
             logging.error(f"Error sending Telegram message: {e}")
 
-    def analyze_news_impact(self, news_articles, price_data):
-        """Analyze news impact on price using Gemini AI."""
+    def summarize_news_impact(self, news_articles, price_data):
+        """Summarize news impact on price using Gemini AI (blocking; the news check runs it in a worker thread)."""
         try:
             # Format news articles for prompt
             news_summary = "\n".join([
@@ -513,7 +540,7 @@ class BitcoinBot:
             Keep each section concise and focused. Use bullet points for better readability.
             """
             
-            response = model.generate_content(prompt)
+            response = get_gateway().generate(model, prompt, call_site="news_impact_summary")
             
             # Enhanced formatting of the response
             formatted_response = response.text
@@ -546,6 +573,8 @@ class BitcoinBot:
             
             return formatted_response
 
+        except CircuitOpenError:
+            return self.market_data_only(price_data['price'].iloc[-1] if len(price_data) else None)
         except Exception as e:
             logging.error(f"Error analyzing news impact: {e}")
             return "Error analyzing news impact. Please try again later."
@@ -592,10 +621,10 @@ class BitcoinBot:
                 await self.send_telegram_message(message)
                 self.news_history.append(article)
 
-        # Analyze news impact
-        if len(self.price_history) > 0:
+        # Analyze news impact (skipped while Gemini is unavailable; off the event loop otherwise)
+        if len(self.price_history) > 0 and not get_gateway().breaker.is_open():
             price_data = pd.DataFrame(self.price_history)
-            analysis = self.analyze_news_impact(news_articles, price_data)
+            analysis = await asyncio.to_thread(self.summarize_news_impact, news_articles, price_data)
             await self.send_telegram_message(f"News Impact Analysis:\n{analysis}")
 
     async def setup_handlers(self):
@@ -0,0 +1,7 @@
+# The bot is imported by bare name like `python bitcoin_bot.py` does, so put this folder on sys.path.
+import os
+import sys
+
+session_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if session_dir not in sys.path:
+    sys.path.insert(0, session_dir)
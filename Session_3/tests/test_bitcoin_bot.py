@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+for dependency in ("telegram", "pycoingecko", "schedule", "dotenv", "pandas"):
+    pytest.importorskip(dependency)
+
+import bitcoin_bot
+from gemini_gateway import GeminiGateway
+
+
+class Response:
+    def __init__(self, text): self.text = text
+
+
+class AgentModel:
+    """Answers each agent's prompt; only the async API exists, so a sync call would fail loudly."""
+
+    def __init__(self): self.calls = 0
+
+    async def generate_content_async(self, contents, **kwargs):
+        self.calls += 1
+        return Response(f"1. Summary\nAgent answer {self.calls}")
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    bot = bitcoin_bot.BitcoinBot()
+    async def price(retries=3): return 65000.0
+    async def news(retries=3): return [{"title": "BTC is trending", "source": "CoinGecko Trends", "url": "https://example.com"}]
+    monkeypatch.setattr(bot, "get_bitcoin_price", price)
+    monkeypatch.setattr(bot, "get_bitcoin_news", news)
+    return bot
+
+def use_gateway(monkeypatch, **overrides) -> tuple[GeminiGateway, AgentModel]:
+    gateway = GeminiGateway(**{"requests_per_minute": 0, "max_retries": 0, "breaker_failures": 1, "breaker_open_seconds": 60, **overrides})
+    model = AgentModel()
+    monkeypatch.setattr(bitcoin_bot, "get_gateway", lambda: gateway)
+    monkeypatch.setattr(bitcoin_bot, "model", model)
+    return gateway, model
+
+
+def test_analyze_bitcoin_runs_all_three_agents_on_the_async_path(bot, monkeypatch):
+    gateway, model = use_gateway(monkeypatch)
+    reply = asyncio.run(bot.analyze_bitcoin("Should I buy?"))
+    assert model.calls == 3 and "AI analysis is temporarily unavailable" not in reply
+    assert [item["role"] for item in bot.conversation_history] == ["user", "agent1", "agent2", "agent3"]
+
+def test_analyze_bitcoin_replies_with_market_data_while_the_breaker_is_open(bot, monkeypatch):
+    gateway, model = use_gateway(monkeypatch)
+    gateway.breaker.record_failure() # Threshold 1: open
+    reply = asyncio.run(bot.analyze_bitcoin("Should I buy?"))
+    assert model.calls == 0
+    assert reply.startswith("⚠️ AI analysis is temporarily unavailable") and "$65,000.00" in reply
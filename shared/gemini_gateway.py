@@ -0,0 +1,489 @@
+# gemini_gateway.py
+# One gateway for every Gemini call in this repository (AI_Travel_Agent, the Gmail MCP client,
+# MCP_Paint talk2mcp.py and the Session_3 BitcoinBot). Within a process all calls share:
+#   - a token-bucket rate limiter (GEMINI_RPM requests per minute, bursts of up to GEMINI_BURST)
+#   - a global concurrency cap (GEMINI_MAX_CONCURRENCY calls in flight)
+#   - full-jitter exponential backoff on transient errors (429/5xx/timeouts, GEMINI_MAX_RETRIES)
+#   - per-call-site latency and token histograms (get_gateway().format_metrics())
+#   - a circuit breaker: after GEMINI_BREAKER_FAILURES consecutive transient failures (or calls slower
+#     than GEMINI_BREAKER_SLOW_SECONDS) calls fail fast with CircuitOpenError for
+#     GEMINI_BREAKER_OPEN_SECONDS, then a single probe call decides whether to close it again
+#   - opt-in hedging (generate_hedged): a duplicate request once the first is slower than the
+#     GEMINI_HEDGE_PERCENTILE of that call site's recent latency, capped at GEMINI_HEDGE_MAX_RATE
+# Requests that llm_replay.ReplayModel answers from disk skip the limiter and the cap.
+# Only the standard library is used; `model` is anything with `generate_content` (and optionally
+# `generate_content_async`), normally a google.generativeai.GenerativeModel.
+# The projects are not packaged together, so each one puts this folder on sys.path before
+# `from gemini_gateway import get_gateway`.
+import asyncio
+import bisect
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+# --- Configuration ---
+def _env_number(name: str, default: float, cast=float):
+    value = os.getenv(name)
+    if value is None or not value.strip(): return default
+    try:
+        return cast(value)
+    except ValueError:
+        logging.warning(f"Invalid {name} '{value}', using default {default}.")
+        return default
+
+def gateway_settings() -> dict:
+    """Gateway settings from the environment (GEMINI_RPM <= 0 disables rate limiting)."""
+    return {
+        "requests_per_minute": _env_number("GEMINI_RPM", 60.0),
+        "burst": _env_number("GEMINI_BURST", 10, int),
+        "max_concurrency": _env_number("GEMINI_MAX_CONCURRENCY", 8, int),
+        "max_retries": _env_number("GEMINI_MAX_RETRIES", 3, int),
+        "retry_base_seconds": _env_number("GEMINI_RETRY_BASE_SECONDS", 1.0),
+        "retry_max_seconds": _env_number("GEMINI_RETRY_MAX_SECONDS", 30.0),
+        "breaker_failures": _env_number("GEMINI_BREAKER_FAILURES", 8, int),
+        "breaker_open_seconds": _env_number("GEMINI_BREAKER_OPEN_SECONDS", 30.0),
+        "breaker_slow_seconds": _env_number("GEMINI_BREAKER_SLOW_SECONDS", 0.0),
+        "hedge_percentile": _env_number("GEMINI_HEDGE_PERCENTILE", 0.0),
+        "hedge_max_rate": _env_number("GEMINI_HEDGE_MAX_RATE", 0.05),
+        "hedge_min_samples": _env_number("GEMINI_HEDGE_MIN_SAMPLES", 20, int),
+    }
+
+
+# --- Transient Errors ---
+# google.api_core exception names; matched by name so this module does not import the SDK
+TRANSIENT_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway", "Aborted", "TimeoutError", "ConnectionError",
+}
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def is_transient_error(error: BaseException) -> bool:
+    """True for rate limiting, server-side and network errors that are worth retrying."""
+    if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__): return True
+    code = getattr(error, "code", None)
+    code = getattr(code, "value", code) # grpc StatusCode enums carry (number, name)
+    if isinstance(code, tuple): code = code[0]
+    return code in TRANSIENT_STATUS_CODES
+
+
+# --- Token Bucket ---
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, requests_per_minute: float, burst: int = 10):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Takes a token; returns how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1 # May go negative: later callers queue behind this one
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        if self.rate <= 0: return 0.0
+        wait = self._reserve()
+        if wait: time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        if self.rate <= 0: return 0.0
+        wait = self._reserve()
+        if wait: await asyncio.sleep(wait)
+        return wait
+
+
+# --- Circuit Breaker ---
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Gemini while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures; open -> half-open after
+    `open_seconds`, when exactly one probe call is let through. The probe's success closes the
+    breaker, its failure re-opens it. A threshold <= 0 disables the breaker."""
+
+    def __init__(self, failure_threshold: int = 8, open_seconds: float = 30.0, slow_call_seconds: float = 0.0):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None: return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.open_seconds else "open"
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected (open, or half-open with the probe already out)."""
+        state = self.state
+        return state == "open" or (state == "half_open" and self._probing)
+
+    def retry_after(self) -> float:
+        with self._lock:
+            return 0.0 if self._opened_at is None else max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        if self.failure_threshold <= 0: return True
+        with self._lock:
+            if self._opened_at is None: return True
+            if time.monotonic() - self._opened_at >= self.open_seconds and not self._probing:
+                self._probing = True # This caller is the half-open probe
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, seconds: float = 0.0):
+        if self.slow_call_seconds > 0 and seconds > self.slow_call_seconds:
+            self.record_failure(); return
+        with self._lock:
+            if self._opened_at is not None: logging.info("Gemini circuit breaker closed (probe succeeded).")
+            self._failures = 0; self._opened_at = None; self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold > 0):
+                if self._opened_at is None: self.times_opened += 1
+                logging.warning(f"Gemini circuit breaker OPEN for {self.open_seconds:.0f}s after {self._failures} consecutive failures.")
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self, seconds: float = 0.0):
+        """Ends a call that finished without a verdict (e.g. the caller was cancelled); one
+        cancelled after more than `slow_call_seconds` still counts as a slow failure."""
+        if self.slow_call_seconds > 0 and seconds > self.slow_call_seconds: self.record_failure(); return
+        with self._lock: self._probing = False
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._failures, "times_opened": self.times_opened, "rejected": self.rejected}
+
+
+# --- Metrics ---
+LATENCY_BUCKETS_MS = [100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+TOKEN_BUCKETS = [250, 500, 1000, 2000, 4000, 8000, 16000, 32000]
+
+class Histogram:
+    """Fixed-bucket histogram; the last count is the overflow bucket."""
+
+    def __init__(self, bounds: list[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value; self.count += 1
+
+    def percentile(self, p: float) -> float | None:
+        """Upper bound of the bucket holding the p-th percentile (inf for the overflow bucket)."""
+        if not self.count: return None
+        rank, seen = p / 100 * self.count, 0
+        for bound, n in zip(self.bounds + [float("inf")], self.counts):
+            seen += n
+            if seen >= rank: return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        return {"buckets": dict(zip([f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"], self.counts)),
+                "count": self.count, "mean": (self.total / self.count) if self.count else 0.0,
+                "p50": self.percentile(50), "p95": self.percentile(95)}
+
+
+class CallSiteMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.tokens = Histogram(TOKEN_BUCKETS)
+        self.recent_seconds: deque[float] = deque(maxlen=200) # Successful calls, for the hedge delay
+        self.recent_hedged: deque[bool] = deque(maxlen=200) # Whether each recent hedgeable request hedged
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+
+    def snapshot(self) -> dict:
+        return {"calls": self.calls, "errors": self.errors, "retries": self.retries,
+                "throttled_seconds": round(self.throttled_seconds, 2),
+                "hedges": self.hedges, "hedge_wins": self.hedge_wins, "hedges_skipped": self.hedges_skipped,
+                "latency_ms": self.latency_ms.snapshot(), "tokens": self.tokens.snapshot()}
+
+
+def _total_tokens(response) -> int | None:
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None)
+    return total if isinstance(total, int) and total > 0 else None
+
+
+# --- Gateway ---
+class GeminiGateway:
+    """Rate-limited, concurrency-capped, retrying front door for `generate_content` calls."""
+
+    def __init__(self, requests_per_minute: float = 60.0, burst: int = 10, max_concurrency: int = 8,
+                 max_retries: int = 3, retry_base_seconds: float = 1.0, retry_max_seconds: float = 30.0,
+                 breaker_failures: int = 8, breaker_open_seconds: float = 30.0, breaker_slow_seconds: float = 0.0,
+                 hedge_percentile: float = 0.0, hedge_max_rate: float = 0.05, hedge_min_samples: int = 20):
+        self.bucket = TokenBucket(requests_per_minute, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.breaker = CircuitBreaker(breaker_failures, breaker_open_seconds, breaker_slow_seconds)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_max_rate = hedge_max_rate
+        self.hedge_min_samples = max(1, hedge_min_samples)
+        self._hedge_pool: ThreadPoolExecutor | None = None
+        self._metrics: dict[str, CallSiteMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: concurrent callers that failed together spread out instead of retrying in lockstep
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+
+    def _record(self, call_site: str, started: float, response=None, error: BaseException | None = None, throttled: float = 0.0):
+        tokens = _total_tokens(response) if response is not None else None
+        with self._lock:
+            site = self._metrics.setdefault(call_site, CallSiteMetrics())
+            site.calls += 1; site.throttled_seconds += throttled
+            seconds = time.perf_counter() - started
+            site.latency_ms.observe(seconds * 1000)
+            if error is not None: site.errors += 1
+            else: site.recent_seconds.append(seconds)
+            if tokens: site.tokens.observe(tokens)
+
+    def _admit(self, call_site: str, last_error: BaseException | None = None):
+        """Raises CircuitOpenError while the breaker rejects calls. When it opened between retries
+        of this request, the error that made us retry is its __cause__ and part of the message."""
+        if self.breaker.allow(): return
+        message = f"Gemini circuit breaker is open; '{call_site}' rejected (retry in {self.breaker.retry_after():.0f}s)."
+        if last_error is not None:
+            raise CircuitOpenError(f"{message} Last error: {type(last_error).__name__}: {last_error}") from last_error
+        raise CircuitOpenError(message)
+
+    def _should_retry(self, call_site: str, error: BaseException, attempt: int) -> float | None:
+        if is_transient_error(error): self.breaker.record_failure()
+        else: self.breaker.record_success() # Gemini answered; the request itself was at fault
+        if attempt >= self.max_retries or not is_transient_error(error): return None
+        delay = self._backoff(attempt)
+        with self._lock: self._metrics.setdefault(call_site, CallSiteMetrics()).retries += 1
+        logging.warning(f"Gemini call '{call_site}' failed ({type(error).__name__}: {error}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s.")
+        return delay
+
+    @staticmethod
+    def _serves_offline(model, contents, kwargs: dict) -> bool:
+        check = getattr(model, "serves_offline", None)
+        return bool(check and check(contents, **kwargs))
+
+    def generate(self, model, contents, call_site: str = "default", **kwargs):
+        """Calls `model.generate_content(contents, **kwargs)` through the limiter, cap and retries.
+
+        Errors that are not transient, or still failing after the last retry, are re-raised.
+        With stream=True only opening the stream is retried and timed.
+        """
+        if self._serves_offline(model, contents, kwargs):
+            started = time.perf_counter(); response = model.generate_content(contents, **kwargs)
+            self._record(call_site, started, response); return response
+        attempt, last_error = 0, None
+        while True:
+            self._admit(call_site, last_error) # Also stops retries as soon as the breaker opens
+            throttled = self.bucket.acquire()
+            with self._slots:
+                started = time.perf_counter()
+                try:
+                    response = model.generate_content(contents, **kwargs)
+                except Exception as e:
+                    self._record(call_site, started, error=e, throttled=throttled)
+                    delay = self._should_retry(call_site, e, attempt)
+                    if delay is None: raise
+                    last_error = e
+                except BaseException:
+                    self.breaker.release(); raise
+                else:
+                    self._record(call_site, started, response, throttled=throttled)
+                    self.breaker.record_success(time.perf_counter() - started)
+                    return response
+            time.sleep(delay); attempt += 1 # Back off outside the concurrency slot
+
+    async def generate_async(self, model, contents, call_site: str = "default", **kwargs):
+        """Async `generate`; uses `generate_content_async` when the model has it, else a worker thread."""
+        if self._serves_offline(model, contents, kwargs):
+            started = time.perf_counter(); response = await model.generate_content_async(contents, **kwargs)
+            self._record(call_site, started, response); return response
+        attempt, last_error = 0, None
+        while True:
+            self._admit(call_site, last_error)
+            try:
+                throttled = await self.bucket.acquire_async()
+                # The slots are shared with sync callers; poll rather than block the event loop, and so a
+                # cancelled wait (e.g. asyncio.wait_for timing out) never takes a slot it won't release
+                while not self._slots.acquire(blocking=False): await asyncio.sleep(0.05)
+            except BaseException:
+                self.breaker.release(); raise
+            try:
+                started = time.perf_counter()
+                try:
+                    if hasattr(model, "generate_content_async"):
+                        response = await model.generate_content_async(contents, **kwargs)
+                    else:
+                        response = await asyncio.to_thread(model.generate_content, contents, **kwargs)
+                except Exception as e:
+                    self._record(call_site, started, error=e, throttled=throttled)
+                    delay = self._should_retry(call_site, e, attempt)
+                    if delay is None: raise
+                    last_error = e
+                except BaseException: # Cancelled, e.g. by the caller's asyncio.wait_for timeout
+                    self.breaker.release(time.perf_counter() - started); raise
+                else:
+                    self._record(call_site, started, response, throttled=throttled)
+                    self.breaker.record_success(time.perf_counter() - started)
+                    return response
+            finally:
+                self._slots.release()
+            await asyncio.sleep(delay); attempt += 1
+
+    # --- Hedging ---
+    def hedge_delay(self, call_site: str) -> float | None:
+        """Seconds to wait before hedging, or None when hedging is off or there is too little history."""
+        if not 0 < self.hedge_percentile < 100: return None
+        with self._lock:
+            site = self._metrics.get(call_site)
+            if site is None or len(site.recent_seconds) < self.hedge_min_samples: return None
+            ordered = sorted(site.recent_seconds)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))]
+
+    def _claim_hedge(self, call_site: str, slow: bool) -> bool:
+        """Records a hedgeable request; True if it is slow and a hedge fits under hedge_max_rate.
+
+        The rate is a budget over the full window (e.g. 0.05 x 200 = 10 hedges), not over the
+        requests seen so far, so a cold or freshly restarted call site can hedge its slow early requests.
+        """
+        with self._lock:
+            site = self._metrics.setdefault(call_site, CallSiteMetrics())
+            window = site.recent_hedged
+            allowed = slow and self.hedge_max_rate > 0 and sum(window) < max(1, int(self.hedge_max_rate * window.maxlen))
+            window.append(allowed)
+            if allowed: site.hedges += 1
+            elif slow: site.hedges_skipped += 1
+            return allowed
+
+    def _note_hedge_win(self, call_site: str):
+        with self._lock: self._metrics.setdefault(call_site, CallSiteMetrics()).hedge_wins += 1
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=self.max_concurrency * 2, thread_name_prefix="gemini-hedge")
+            return self._hedge_pool
+
+    def generate_hedged(self, model, contents, call_site: str = "default", validate=None, **kwargs):
+        """`generate` with tail-latency hedging for non-streaming calls.
+
+        If the request is still running after hedge_delay(call_site), a duplicate is sent
+        (within the hedge rate cap) and the first response that passes `validate` wins. When
+        neither is valid, the original's response (or error) is returned as `generate` would.
+        The SDK's blocking calls cannot be aborted, so the losing call is abandoned: it finishes
+        in the background and its result is dropped.
+        """
+        delay = None if kwargs.get("stream") else self.hedge_delay(call_site)
+        if delay is None: return self.generate(model, contents, call_site=call_site, **kwargs)
+
+        def attempt():
+            response = self.generate(model, contents, call_site=call_site, **kwargs)
+            return response, (validate is None or validate(response))
+
+        primary = self._pool().submit(attempt)
+        if not self._claim_hedge(call_site, slow=not wait([primary], timeout=delay).done):
+            return primary.result()[0]
+        logging.info(f"Gemini call '{call_site}' slower than {delay:.2f}s; sending a hedged duplicate.")
+        hedge = self._pool().submit(attempt)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result()[1]:
+                    for other in pending: other.cancel() # Only stops it if it has not started yet
+                    if future is hedge: self._note_hedge_win(call_site)
+                    return future.result()[0]
+        # Neither valid: prefer a response over an error, the original over the duplicate
+        return (hedge if primary.exception() is not None and hedge.exception() is None else primary).result()[0]
+
+    async def generate_hedged_async(self, model, contents, call_site: str = "default", validate=None, **kwargs):
+        """Async `generate_hedged`; the losing request is cancelled."""
+        delay = None if kwargs.get("stream") else self.hedge_delay(call_site)
+        if delay is None: return await self.generate_async(model, contents, call_site=call_site, **kwargs)
+
+        async def attempt():
+            response = await self.generate_async(model, contents, call_site=call_site, **kwargs)
+            return response, (validate is None or validate(response))
+
+        primary = asyncio.ensure_future(attempt())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if not self._claim_hedge(call_site, slow=not done): return (await primary)[0]
+        logging.info(f"Gemini call '{call_site}' slower than {delay:.2f}s; sending a hedged duplicate.")
+        hedge = asyncio.ensure_future(attempt())
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result()[1]:
+                        if task is hedge: self._note_hedge_win(call_site)
+                        return task.result()[0]
+            return (hedge if primary.exception() is not None and hedge.exception() is None else primary).result()[0]
+        finally:
+            for task in pending: task.cancel()
+
+    def snapshot(self) -> dict:
+        """Per-call-site counters and histograms."""
+        with self._lock: return {site: metrics.snapshot() for site, metrics in self._metrics.items()}
+
+    def format_metrics(self) -> str:
+        """One line per call site, for logs and status displays."""
+        lines = []
+        for site, m in sorted(self.snapshot().items()):
+            latency, tokens = m["latency_ms"], m["tokens"]
+            line = (f"{site}: {m['calls']} calls, {m['errors']} errors, {m['retries']} retries, "
+                    f"latency mean {latency['mean']:.0f}ms p50<={latency['p50']}ms p95<={latency['p95']}ms")
+            if tokens["count"]: line += f", tokens mean {tokens['mean']:.0f} p95<={tokens['p95']}"
+            if m["throttled_seconds"]: line += f", throttled {m['throttled_seconds']}s"
+            if m["hedges"] or m["hedges_skipped"]: line += f", hedged {m['hedges']} (won {m['hedge_wins']}, {m['hedges_skipped']} over cap)"
+            lines.append(line)
+        breaker = self.breaker.snapshot()
+        if breaker["times_opened"]: lines.append(f"circuit breaker: {breaker['state']}, opened {breaker['times_opened']}x, {breaker['rejected']} calls rejected")
+        return "\n".join(lines) if lines else "No Gemini calls yet."
+
+
+# --- Shared Default Gateway ---
+_default_gateway: GeminiGateway | None = None
+_default_gateway_lock = threading.Lock()
+
+def get_gateway() -> GeminiGateway:
+    """Returns the process-wide gateway, built from the environment on first use."""
+    global _default_gateway
+    with _default_gateway_lock:
+        if _default_gateway is None:
+            settings = gateway_settings()
+            _default_gateway = GeminiGateway(**settings)
+            logging.info(f"Gemini gateway initialized ({settings}).")
+        return _default_gateway
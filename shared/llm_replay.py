@@ -0,0 +1,214 @@
+# llm_replay.py
+# Record/replay cache for Gemini calls, so full agent runs can be repeated offline at CPU speed
+# (e.g. to benchmark parsing, validation and rendering reproducibly). Responses are stored
+# content-addressed on disk: one JSON file per sha256(model name + prompt + generation settings).
+#   LLM_REPLAY_MODE=record  call Gemini and save every response
+#   LLM_REPLAY_MODE=replay  serve only saved responses; a missing one raises ReplayMiss (no network)
+#   LLM_REPLAY_MODE=auto    serve saved responses, record the rest
+#   LLM_REPLAY_DIR          cache folder (default .llm_replay)
+# Each project wraps its model with `wrap_model(genai.GenerativeModel(...))`; with the mode unset
+# the model is returned unchanged. Only the standard library is used.
+import hashlib
+import json
+import logging
+import os
+import threading
+
+REPLAY_MODES = ("off", "record", "replay", "auto")
+# Arguments that do not change the generated content and are left out of the key
+_UNKEYED_ARGUMENTS = {"stream", "request_options"}
+
+
+class ReplayMiss(LookupError):
+    """Raised in replay mode when no response was recorded for a request."""
+
+
+def replay_settings() -> dict:
+    """Replay settings from the environment; an unknown mode falls back to "off"."""
+    mode = os.getenv("LLM_REPLAY_MODE", "off").strip().lower() or "off"
+    if mode not in REPLAY_MODES:
+        logging.warning(f"Invalid LLM_REPLAY_MODE '{mode}', expected one of {REPLAY_MODES}. Replay disabled.")
+        mode = "off"
+    return {"mode": mode, "cache_dir": os.getenv("LLM_REPLAY_DIR", ".llm_replay")}
+
+
+def request_key(model_name: str, contents, **kwargs) -> str:
+    """Content address of a request: sha256 over the model name, prompt and generation settings."""
+    keyed = {name: value for name, value in kwargs.items() if name not in _UNKEYED_ARGUMENTS}
+    payload = json.dumps({"model": model_name, "contents": contents, "kwargs": keyed}, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# --- Replayed Responses ---
+# Just enough of the google.generativeai response surface for the agents in this repository:
+# .text, .parts, .candidates[0].content.parts, .candidates[0].finish_reason, .prompt_feedback and
+# .usage_metadata; stream=True yields one response per recorded chunk.
+class _Obj:
+    def __init__(self, **fields): self.__dict__.update(fields)
+    def __repr__(self): return f"{type(self).__name__}({self.__dict__})"
+
+class ReplayResponse:
+    def __init__(self, text: str | None, finish_reason: str | None = "STOP", block_reason: str | None = None, total_tokens: int | None = None):
+        self.parts = [_Obj(text=text)] if text else []
+        self.candidates = [_Obj(content=_Obj(parts=self.parts), finish_reason=finish_reason)] if text else []
+        self.prompt_feedback = _Obj(block_reason=block_reason, safety_ratings=[])
+        self.usage_metadata = _Obj(total_token_count=total_tokens or 0)
+
+    @property
+    def text(self) -> str:
+        if not self.parts: raise ValueError(f"Replayed response has no text (block reason: {self.prompt_feedback.block_reason}).")
+        return self.parts[0].text
+
+    def __iter__(self): # A non-stream response iterates as a single chunk, like a resolved stream
+        yield self
+
+def _response_from_record(record: dict, stream: bool):
+    chunks = record.get("chunks") or []
+    if stream:
+        return [ReplayResponse(text, record.get("finish_reason"), record.get("block_reason"), record.get("total_tokens")) for text in chunks] \
+            or [ReplayResponse(None, None, record.get("block_reason"))]
+    return ReplayResponse("".join(c for c in chunks if c) or None, record.get("finish_reason"), record.get("block_reason"), record.get("total_tokens"))
+
+
+def _text_of(response) -> str | None:
+    try: return response.text
+    except (ValueError, AttributeError, IndexError): return None # Blocked or empty
+
+def _record_from_responses(responses: list) -> dict:
+    last = responses[-1] if responses else None
+    feedback = getattr(last, "prompt_feedback", None)
+    block_reason = getattr(feedback, "block_reason", None)
+    candidates = getattr(last, "candidates", None) or []
+    finish_reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+    usage = getattr(last, "usage_metadata", None)
+    return {"chunks": [_text_of(r) for r in responses],
+            "finish_reason": getattr(finish_reason, "name", finish_reason) if finish_reason is not None else None,
+            "block_reason": (getattr(block_reason, "name", str(block_reason)) if block_reason else None),
+            "total_tokens": getattr(usage, "total_token_count", None)}
+
+
+class _RecordingStream:
+    """Passes a live stream through and saves it once it has been fully consumed."""
+
+    def __init__(self, response, on_complete):
+        self._response = response
+        self._on_complete = on_complete
+
+    def __iter__(self):
+        chunks = []
+        for chunk in self._response:
+            chunks.append(chunk); yield chunk
+        self._on_complete(chunks)
+
+    def __getattr__(self, name): # prompt_feedback etc. come from the live response
+        return getattr(self._response, name)
+
+
+# --- Store ---
+class ReplayStore:
+    """One JSON file per request key under `cache_dir/<first two hex digits>/`."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def load(self, key: str) -> dict | None:
+        try:
+            with open(self._path(key), encoding="utf-8") as f: record = json.load(f)
+        except FileNotFoundError:
+            record = None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Unreadable replay record {key[:12]}: {e}"); record = None
+        with self._lock:
+            if record is None: self.misses += 1
+            else: self.hits += 1
+        return record
+
+    def save(self, key: str, record: dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f: json.dump(record, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path) # Readers never see a partial file
+        with self._lock: self.recorded += 1
+
+    def stats(self) -> dict:
+        with self._lock: return {"hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+# --- Model Wrapper ---
+class ReplayModel:
+    """Wraps a GenerativeModel; `generate_content(_async)` record to or replay from a ReplayStore.
+
+    `model` may be None in replay mode (nothing is ever sent), in which case `model_name`
+    must be given.
+    """
+
+    def __init__(self, model, mode: str, store: ReplayStore, model_name: str | None = None):
+        self.model = model
+        self.mode = mode
+        self.store = store
+        name = model_name or getattr(model, "model_name", None) or "unknown"
+        self.model_name = name.removeprefix("models/") # The SDK reports "models/gemini-2.0-flash"
+
+    def __getattr__(self, name): # Everything but generation goes to the wrapped model
+        model = self.__dict__.get("model")
+        if model is None: raise AttributeError(name)
+        return getattr(model, name)
+
+    def _key(self, contents, kwargs) -> str:
+        return request_key(self.model_name, contents, **kwargs)
+
+    def serves_offline(self, contents, **kwargs) -> bool:
+        """True when this request will be answered from disk (the gateway then skips rate limiting)."""
+        return self.mode in ("replay", "auto") and self.store.has(self._key(contents, kwargs))
+
+    def _lookup(self, key: str, stream: bool):
+        if self.mode in ("replay", "auto"):
+            record = self.store.load(key)
+            if record is not None: return _response_from_record(record, stream)
+            if self.mode == "replay":
+                raise ReplayMiss(f"No recorded response for {self.model_name} request {key[:12]} in {self.store.cache_dir} (LLM_REPLAY_MODE=replay).")
+        if self.model is None: raise ReplayMiss(f"No live model to record request {key[:12]} with.")
+        return None
+
+    def generate_content(self, contents, **kwargs):
+        key, stream = self._key(contents, kwargs), bool(kwargs.get("stream"))
+        replayed = self._lookup(key, stream)
+        if replayed is not None: return replayed
+        response = self.model.generate_content(contents, **kwargs)
+        if stream: return _RecordingStream(response, lambda chunks: self.store.save(key, _record_from_responses(chunks)))
+        self.store.save(key, _record_from_responses([response]))
+        return response
+
+    async def generate_content_async(self, contents, **kwargs):
+        key = self._key(contents, kwargs)
+        replayed = self._lookup(key, bool(kwargs.get("stream")))
+        if replayed is not None: return replayed
+        response = await self.model.generate_content_async(contents, **kwargs)
+        self.store.save(key, _record_from_responses([response]))
+        return response
+
+
+_stores: dict[str, ReplayStore] = {}
+_stores_lock = threading.Lock()
+
+def wrap_model(model, model_name: str | None = None, settings: dict | None = None):
+    """Returns `model` wrapped for record/replay per LLM_REPLAY_MODE, or unchanged when off."""
+    settings = settings or replay_settings()
+    if settings["mode"] == "off": return model
+    with _stores_lock:
+        store = _stores.get(settings["cache_dir"])
+        if store is None:
+            store = _stores[settings["cache_dir"]] = ReplayStore(settings["cache_dir"])
+            logging.info(f"LLM {settings['mode']} mode (cache: {os.path.abspath(settings['cache_dir'])}).")
+    return ReplayModel(model, settings["mode"], store, model_name)
@@ -0,0 +1,7 @@
+# The shared modules are imported by bare name (see gemini_gateway.py), so put this folder on sys.path.
+import os
+import sys
+
+shared_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if shared_dir not in sys.path:
+    sys.path.insert(0, shared_dir)
@@ -0,0 +1,211 @@
+import threading
+
+import pytest
+
+import gemini_gateway
+from gemini_gateway import CircuitBreaker, CircuitOpenError, GeminiGateway, TokenBucket
+
+
+class ServiceUnavailable(Exception):
+    """Matched as transient by name, like google.api_core's 503."""
+
+class InvalidArgument(Exception):
+    """Not transient: the request itself is wrong."""
+
+
+class FakeClock:
+    def __init__(self): self.now = 1000.0
+    def __call__(self): return self.now
+
+
+class FailingModel:
+    def __init__(self, *errors, response="ok"):
+        self.errors = list(errors)
+        self.response = response
+        self.calls = 0
+
+    def generate_content(self, contents, **kwargs):
+        self.calls += 1
+        if self.errors: raise self.errors.pop(0)
+        return self.response
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(gemini_gateway.time, "monotonic", clock)
+    return clock
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(gemini_gateway.time, "sleep", slept.append)
+    return slept
+
+def make_gateway(**overrides) -> GeminiGateway:
+    settings = dict(requests_per_minute=0, max_retries=3, retry_base_seconds=1.0, retry_max_seconds=4.0, breaker_failures=0)
+    return GeminiGateway(**{**settings, **overrides})
+
+
+# --- Circuit Breaker ---
+def test_breaker_opens_after_threshold_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, open_seconds=30)
+    breaker.record_failure(); breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.is_open()
+    assert not breaker.allow()
+    assert breaker.rejected == 1 and breaker.times_opened == 1
+
+def test_breaker_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, open_seconds=30)
+    breaker.record_failure(); breaker.record_success(); breaker.record_failure()
+    assert breaker.state == "closed"
+
+def test_breaker_half_open_lets_exactly_one_probe_through_and_closes_on_success(clock):
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=30)
+    breaker.record_failure()
+    clock.now += 29.9
+    assert breaker.state == "open" and not breaker.allow()
+    clock.now += 0.1
+    assert breaker.state == "half_open" and not breaker.is_open()
+    assert breaker.allow() # The probe
+    assert breaker.is_open() and not breaker.allow() # Everyone else waits for its verdict
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+def test_breaker_failed_probe_reopens_for_a_full_period(clock):
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.retry_after() == pytest.approx(30)
+    assert breaker.times_opened == 1 # Re-opening from half-open is the same outage
+
+def test_breaker_released_probe_frees_the_half_open_slot(clock):
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=30)
+    breaker.record_failure(); clock.now += 30
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+def test_breaker_counts_slow_calls_as_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2, open_seconds=30, slow_call_seconds=5)
+    breaker.record_success(6); breaker.record_success(6)
+    assert breaker.state == "open"
+
+def test_breaker_disabled_with_zero_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=0)
+    for _ in range(100): breaker.record_failure()
+    assert breaker.allow() and not breaker.is_open()
+
+
+# --- Retries ---
+def test_backoff_is_full_jitter_capped_by_retry_max():
+    gateway = make_gateway(retry_base_seconds=1.0, retry_max_seconds=4.0)
+    for attempt in range(8):
+        cap = min(4.0, 2 ** attempt)
+        delays = [gateway._backoff(attempt) for _ in range(200)]
+        assert all(0 <= d <= cap for d in delays)
+    assert max(gateway._backoff(10) for _ in range(200)) <= 4.0
+
+def test_transient_errors_are_retried_up_to_max_retries_then_reraised(sleeps):
+    gateway = make_gateway(max_retries=2)
+    error = ServiceUnavailable("503")
+    model = FailingModel(ServiceUnavailable("503"), ServiceUnavailable("503"), error)
+    with pytest.raises(ServiceUnavailable) as raised:
+        gateway.generate(model, "prompt", call_site="test")
+    assert raised.value is error
+    assert model.calls == 3 and len(sleeps) == 2
+    assert all(0 <= delay <= min(4.0, 2 ** attempt) for attempt, delay in enumerate(sleeps))
+    assert gateway.snapshot()["test"]["retries"] == 2 and gateway.snapshot()["test"]["errors"] == 3
+
+def test_retry_succeeds_after_transient_error(sleeps):
+    gateway = make_gateway()
+    model = FailingModel(ServiceUnavailable("503"))
+    assert gateway.generate(model, "prompt") == "ok"
+    assert model.calls == 2 and len(sleeps) == 1
+
+def test_non_transient_errors_are_not_retried(sleeps):
+    gateway = make_gateway()
+    model = FailingModel(InvalidArgument("bad request"))
+    with pytest.raises(InvalidArgument):
+        gateway.generate(model, "prompt")
+    assert model.calls == 1 and sleeps == []
+
+def test_errors_with_a_transient_status_code_are_retried(sleeps):
+    error = Exception("rate limited"); error.code = 429
+    gateway = make_gateway()
+    model = FailingModel(error)
+    assert gateway.generate(model, "prompt") == "ok"
+    assert model.calls == 2
+
+def test_breaker_opening_mid_retry_chains_the_underlying_error(clock, sleeps):
+    gateway = make_gateway(max_retries=5, breaker_failures=2)
+    last = ServiceUnavailable("backend overloaded")
+    model = FailingModel(ServiceUnavailable("503"), last)
+    with pytest.raises(CircuitOpenError) as raised:
+        gateway.generate(model, "prompt")
+    assert model.calls == 2
+    assert raised.value.__cause__ is last
+    assert "ServiceUnavailable: backend overloaded" in str(raised.value)
+
+def test_open_breaker_rejects_without_calling_the_model(clock):
+    gateway = make_gateway(breaker_failures=1)
+    gateway.breaker.record_failure()
+    model = FailingModel()
+    with pytest.raises(CircuitOpenError) as raised:
+        gateway.generate(model, "prompt")
+    assert model.calls == 0 and raised.value.__cause__ is None
+
+
+# --- Hedging ---
+class SlowFirstModel:
+    """The first call blocks until a later (hedged) call has answered; every other call is instant."""
+
+    def __init__(self):
+        self.calls = 0
+        self.answered = threading.Event()
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, **kwargs):
+        with self._lock: self.calls += 1; call = self.calls
+        if call == 1: self.answered.wait(5); return "primary"
+        self.answered.set(); return "hedge"
+
+def warm(gateway: GeminiGateway, call_site: str, samples: int):
+    for _ in range(samples): gateway.generate(FailingModel(), "prompt", call_site=call_site)
+
+def test_fresh_call_site_does_not_hedge_without_latency_history():
+    gateway = make_gateway(hedge_percentile=50, hedge_min_samples=3)
+    model = SlowFirstModel(); model.answered.set() # Would otherwise wait for a hedge that never comes
+    assert gateway.generate_hedged(model, "prompt", call_site="fresh") == "primary"
+    assert model.calls == 1 and gateway.hedge_delay("fresh") is None
+
+def test_first_slow_request_after_warm_up_hedges():
+    gateway = make_gateway(hedge_percentile=50, hedge_min_samples=3, hedge_max_rate=0.05)
+    warm(gateway, "site", 3)
+    assert gateway.generate_hedged(SlowFirstModel(), "prompt", call_site="site") == "hedge"
+    assert gateway.snapshot()["site"]["hedges"] == 1
+
+def test_hedges_are_capped_by_a_budget_over_the_whole_window():
+    gateway = make_gateway(hedge_percentile=50, hedge_max_rate=0.01)
+    window = 200 # CallSiteMetrics.recent_hedged: 0.01 x 200 = 2 hedges
+    assert [gateway._claim_hedge("site", slow=True) for _ in range(4)] == [True, True, False, False]
+    for _ in range(window): gateway._claim_hedge("site", slow=False)
+    assert gateway._claim_hedge("site", slow=True) # The earlier hedges have left the window
+    assert not make_gateway(hedge_percentile=50, hedge_max_rate=0)._claim_hedge("site", slow=True)
+
+
+# --- Token Bucket ---
+def test_token_bucket_allows_a_burst_then_spaces_calls(clock):
+    bucket = TokenBucket(requests_per_minute=60, burst=3)
+    assert [bucket._reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket._reserve() == pytest.approx(1.0)
+    assert bucket._reserve() == pytest.approx(2.0) # Queued behind the previous caller
+    clock.now += 10
+    assert bucket._reserve() == 0.0
+
+def test_token_bucket_disabled_with_zero_rate():
+    assert TokenBucket(requests_per_minute=0).acquire() == 0.0